@@ -0,0 +1,208 @@
+import dataclasses
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.simdata_models import (
+    DataBlockHeader,
+    DataFunctions,
+    DataSetBackend,
+    VariableInfo,
+)
+from pyvcell.simdata.zarr_storage import ZarrStorageOptions
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_zarr
+
+# ensemble field "<variable>_<field>" of each variable
+ENSEMBLE_FIELDS = ["mean", "variance", "min", "max"]
+
+
+@dataclasses.dataclass
+class WelfordAccumulator:
+    """
+    running per element count, mean, sum of squared deviations (m2), min and max of frames
+
+    frames are added one at a time with Welford's update, accumulators of disjoint sets of frames (e.g. of
+    the jobs handled by different workers) combine with merge() (Chan et al.). NaN values are skipped.
+    """
+
+    count: np.ndarray
+    mean: np.ndarray
+    m2: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+
+    @staticmethod
+    def empty(size: int) -> "WelfordAccumulator":
+        return WelfordAccumulator(
+            count=np.zeros(size, dtype=np.int64),
+            mean=np.zeros(size),
+            m2=np.zeros(size),
+            min=np.full(size, np.inf),
+            max=np.full(size, -np.inf),
+        )
+
+    def add(self, data: np.ndarray) -> None:
+        values = np.asarray(data, dtype=np.float64)
+        valid = ~np.isnan(values)
+        self.count += valid
+        delta = np.where(valid, values - self.mean, 0.0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += np.where(valid, delta * (values - self.mean), 0.0)
+        self.min = np.fmin(self.min, values)
+        self.max = np.fmax(self.max, values)
+
+    def merge(self, other: "WelfordAccumulator") -> "WelfordAccumulator":
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        weight = other.count / np.maximum(count, 1)
+        return WelfordAccumulator(
+            count=count,
+            mean=self.mean + delta * weight,
+            m2=self.m2 + other.m2 + delta * delta * self.count * weight,
+            min=np.fmin(self.min, other.min),
+            max=np.fmax(self.max, other.max),
+        )
+
+    def variance(self, ddof: int = 1) -> np.ndarray:
+        # NaN where there are not more than ddof values
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance: np.ndarray = np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+        return variance
+
+    def get_field(self, field: str, ddof: int = 1) -> np.ndarray:
+        if field == "mean":
+            return np.where(self.count > 0, self.mean, np.nan)
+        if field == "variance":
+            return self.variance(ddof)
+        if field == "min":
+            return np.where(self.count > 0, self.min, np.nan)
+        if field == "max":
+            return np.where(self.count > 0, self.max, np.nan)
+        raise ValueError(f"unknown ensemble field {field}, expected one of {ENSEMBLE_FIELDS}")
+
+
+class EnsembleDataSet:
+    """
+    per element ensemble statistics across the jobs of a stochastic or parameter scan run, as a dataset
+
+    the datasets must share their times and variables. Each variable "domain::name" yields the variables
+    "domain::name_mean", "_variance" (ddof=1 by default, the sample variance), "_min" and "_max", computed
+    when read: get_data_blocks() reads each job's frame of the timepoint once (all requested variables in
+    one pass) and accumulates it in a WelfordAccumulator, with the jobs split across workers whose partial
+    accumulators are merged. Only one frame per variable and worker is held in memory.
+
+    implements DataSetBackend, so the ensemble can be exported with write_zarr (see write_ensemble_zarr).
+    """
+
+    datasets: list[DataSetBackend]
+    workers: int
+    ddof: int
+    _source_headers: dict[str, DataBlockHeader]  # by variable name
+    _block_headers: list[DataBlockHeader]
+
+    def __init__(
+        self, datasets: list[DataSetBackend], variables: list[str] | None = None, workers: int = 1, ddof: int = 1
+    ) -> None:
+        if len(datasets) == 0:
+            raise ValueError("an ensemble needs at least one dataset")
+        times = datasets[0].times()
+        if any(dataset.times() != times for dataset in datasets[1:]):
+            raise ValueError("the datasets of an ensemble must share their times")
+        self.datasets = datasets
+        self.workers = workers
+        self.ddof = ddof
+        self._source_headers = {
+            header.var_info.var_name: header
+            for header in datasets[0].variables_block_headers()
+            if variables is None or header.var_info.var_name in variables
+        }
+        self._block_headers = []
+        for name, source_header in self._source_headers.items():
+            for field in ENSEMBLE_FIELDS:
+                block_header = DataBlockHeader()
+                block_header.var_info = VariableInfo(
+                    var_name=f"{name}_{field}", variable_type=source_header.var_info.variable_type
+                )
+                block_header.size = source_header.size
+                block_header.data_offset = 0
+                self._block_headers.append(block_header)
+
+    def times(self) -> list[float]:
+        return self.datasets[0].times()
+
+    def variables_block_headers(self) -> list[DataBlockHeader]:
+        return self._block_headers
+
+    def get_data(self, variable: VariableInfo | str, time: float) -> np.ndarray:
+        return self.get_data_blocks([variable], time)[0]
+
+    def get_data_blocks(self, variables: list[VariableInfo | str], time: float) -> list[np.ndarray]:
+        names = [variable.var_name if isinstance(variable, VariableInfo) else variable for variable in variables]
+        fields = [self._split_name(name) for name in names]
+        accumulators = self.reduce(sorted({source_name for source_name, _field in fields}), time)
+        return [accumulators[source_name].get_field(field, self.ddof) for source_name, field in fields]
+
+    def get_compact_data(self, variable: VariableInfo | str, time: float, indices: np.ndarray) -> np.ndarray:
+        compact_data: np.ndarray = self.get_data(variable, time)[indices]
+        return compact_data
+
+    def reduce(self, variables: list[str], time: float) -> dict[str, WelfordAccumulator]:
+        # accumulators of the variables at one timepoint over all datasets
+        job_groups = [group for group in np.array_split(np.arange(len(self.datasets)), self.workers) if len(group) > 0]
+        blocks: list[VariableInfo | str] = list(variables)
+
+        def accumulate(jobs: np.ndarray) -> dict[str, WelfordAccumulator]:
+            partial = {name: WelfordAccumulator.empty(self._source_headers[name].size) for name in variables}
+            for job in jobs:
+                for name, data in zip(variables, self.datasets[job].get_data_blocks(blocks, time)):
+                    partial[name].add(data)
+            return partial
+
+        if len(job_groups) == 1:
+            return accumulate(job_groups[0])
+        with ThreadPoolExecutor(max_workers=len(job_groups), thread_name_prefix="ensemble") as pool:
+            partials = list(pool.map(accumulate, job_groups))
+        accumulators = partials[0]
+        for partial in partials[1:]:
+            accumulators = {name: accumulators[name].merge(partial[name]) for name in variables}
+        return accumulators
+
+    def _split_name(self, name: str) -> tuple[str, str]:
+        # "domain::name_field" -> ("domain::name", field)
+        source_name, _, field = name.rpartition("_")
+        if source_name not in self._source_headers or field not in ENSEMBLE_FIELDS:
+            raise ValueError(f"Variable {name} not found in ensemble")
+        return source_name, field
+
+
+def write_ensemble_zarr(
+    ensemble: EnsembleDataSet,
+    mesh: CartesianMesh,
+    zarr_dir: Path,
+    compact: bool = False,
+    workers: int = 1,
+    storage: ZarrStorageOptions | None = None,
+) -> None:
+    # exports the ensemble fields as a layout v2 store (readable with ZarrDataSet), ensemble details in
+    # metadata["ensemble"]; workers pipeline timepoints, ensemble.workers split the jobs of a timepoint
+    write_zarr(
+        pde_dataset=ensemble,
+        # the ensemble fields have no functions
+        data_functions=DataFunctions(function_file=Path(os.devnull)),
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        compact=compact,
+        workers=workers,
+        layout=ZarrLayout.V2,
+        storage=storage,
+    )
+    root = zarr.open_group(str(zarr_dir.absolute()), mode="r+")
+    root.attrs["metadata"] = {
+        **root.attrs["metadata"],
+        "ensemble": {"num_jobs": len(ensemble.datasets), "fields": ENSEMBLE_FIELDS, "ddof": ensemble.ddof},
+    }
+    zarr.consolidate_metadata(root.store)
@@ -0,0 +1,100 @@
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+RawFrame = TypeVar("RawFrame")
+Frame = TypeVar("Frame")
+
+
+class ExportPipeline(Generic[RawFrame, Frame]):
+    """
+    runs read -> evaluate -> reduce -> write over a sequence of items (e.g. time indices)
+
+    with workers > 1 the stages overlap: reads (decompression) run ahead in a thread or process pool,
+    evaluation (e.g. numexpr functions) and writes (zarr compression and I/O) run in thread pools, and at
+    most queue_size items are in flight between stages. reduce() always runs on the calling thread in item
+    order, so anything accumulated there (statistics, metadata) is deterministic.
+
+    read() must be picklable when use_processes=True (e.g. a functools.partial of a module level function).
+    """
+
+    read: Callable[[int], RawFrame]
+    evaluate: Callable[[int, RawFrame], Frame]
+    reduce: Callable[[int, Frame], None]
+    write: Callable[[int, Frame], None]
+    workers: int
+    use_processes: bool
+    queue_size: int
+
+    def __init__(
+        self,
+        read: Callable[[int], RawFrame],
+        evaluate: Callable[[int, RawFrame], Frame],
+        reduce: Callable[[int, Frame], None],
+        write: Callable[[int, Frame], None],
+        workers: int = 1,
+        use_processes: bool = False,
+        queue_size: int | None = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, found {workers}")
+        self.read = read
+        self.evaluate = evaluate
+        self.reduce = reduce
+        self.write = write
+        self.workers = workers
+        self.use_processes = use_processes
+        self.queue_size = queue_size if queue_size is not None else 2 * workers
+
+    def run(self, items: list[int]) -> None:
+        if self.workers == 1:
+            for item in items:
+                frame = self.evaluate(item, self.read(item))
+                self.reduce(item, frame)
+                self.write(item, frame)
+            return
+
+        read_pool: Executor = (
+            ProcessPoolExecutor(max_workers=self.workers)
+            if self.use_processes
+            else ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-read")
+        )
+        with (
+            read_pool,
+            ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-evaluate") as evaluate_pool,
+            ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-write") as write_pool,
+        ):
+            reads: dict[int, Future[RawFrame]] = {}
+            evaluations: dict[int, Future[Frame]] = {}
+            writes: deque[Future[None]] = deque()
+            next_read = 0
+            try:
+                for position, item in enumerate(items):
+                    # keep the read stage queue_size items ahead
+                    while next_read < len(items) and next_read <= position + self.queue_size:
+                        reads[next_read] = read_pool.submit(self.read, items[next_read])
+                        next_read += 1
+                    # hand finished reads to the evaluate stage (in order, without blocking on later items)
+                    for ahead in range(position, next_read):
+                        if ahead not in evaluations and (ahead == position or reads[ahead].done()):
+                            evaluations[ahead] = evaluate_pool.submit(
+                                self._evaluate_read, items[ahead], reads.pop(ahead)
+                            )
+                        elif ahead not in evaluations:
+                            break
+                    frame = evaluations.pop(position).result()
+                    self.reduce(item, frame)
+                    writes.append(write_pool.submit(self.write, item, frame))
+                    while len(writes) > self.queue_size:
+                        writes.popleft().result()
+                while len(writes) > 0:
+                    writes.popleft().result()
+            except BaseException:
+                pending: list[Future] = [*reads.values(), *evaluations.values(), *writes]
+                for future in pending:
+                    future.cancel()
+                raise
+
+    def _evaluate_read(self, item: int, raw_frame: Future[RawFrame]) -> Frame:
+        return self.evaluate(item, raw_frame.result())
@@ -0,0 +1,132 @@
+import dataclasses
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.simdata_models import DataBlockHeader, NamedFunction
+
+
+@dataclasses.dataclass
+class ExportSelection:
+    """
+    subset of a simulation dataset to export
+
+    variables are glob patterns (fnmatch, e.g. "cytosol::*" or "Ran*") matched against the full name
+    ("domain::name") and the short name of volume variables and functions, None selects everything.
+    Timepoints within [time_start, time_end] (seconds) are selected, then every time_step-th of them.
+
+    at most one spatial crop applies: voxel ranges [[x0, x1), [y0, y1), [z0, z1)], micrometer ranges
+    [[x0, x1], [y0, y1], [z0, z1]] (voxels whose centers lie inside), or the bounding box of the voxels
+    of a volume domain. stride [sx, sy, sz] keeps every s-th voxel of the crop.
+    """
+
+    variables: list[str] | None = None
+    time_start: float | None = None
+    time_end: float | None = None
+    time_step: int = 1
+    bbox_voxels: list[tuple[int, int]] | None = None
+    bbox_um: list[tuple[float, float]] | None = None
+    crop_domain: str | None = None
+    stride: tuple[int, int, int] = (1, 1, 1)
+
+    def __post_init__(self) -> None:
+        if self.time_step < 1:
+            raise ValueError(f"time_step must be at least 1, found {self.time_step}")
+        num_crops = sum(crop is not None for crop in [self.bbox_voxels, self.bbox_um, self.crop_domain])
+        if num_crops > 1:
+            raise ValueError("only one of bbox_voxels, bbox_um and crop_domain can be given")
+
+    @property
+    def is_spatial(self) -> bool:
+        return (
+            self.bbox_voxels is not None
+            or self.bbox_um is not None
+            or self.crop_domain is not None
+            or tuple(self.stride) != (1, 1, 1)
+        )
+
+    def matches(self, name: str) -> bool:
+        if self.variables is None:
+            return True
+        short_name = name.split("::")[-1]
+        return any(fnmatchcase(name, pattern) or fnmatchcase(short_name, pattern) for pattern in self.variables)
+
+    def select_channels(
+        self, variables: list[DataBlockHeader], functions: list[NamedFunction]
+    ) -> tuple[list[DataBlockHeader], list[NamedFunction], list[DataBlockHeader]]:
+        # returns (exported variables, exported functions, variables to read), in dataset order
+        selected_variables = [v for v in variables if self.matches(v.var_info.var_name)]
+        selected_functions = [f for f in functions if self.matches(f.name)]
+        referenced = {var_name for f in selected_functions for var_name in f.variables}
+        read_variables = [
+            v for v in variables if v in selected_variables or v.var_info.var_name.split("::")[-1] in referenced
+        ]
+        if len(selected_variables) + len(selected_functions) == 0:
+            raise ValueError(f"no variables or functions match {self.variables}")
+        return selected_variables, selected_functions, read_variables
+
+    def select_times(self, times: list[float]) -> list[int]:
+        in_range = [
+            t
+            for t, time in enumerate(times)
+            if (self.time_start is None or time >= self.time_start) and (self.time_end is None or time <= self.time_end)
+        ]
+        if len(in_range) == 0:
+            raise ValueError(f"no timepoints within [{self.time_start}, {self.time_end}]")
+        return in_range[:: self.time_step]
+
+    def get_voxel_ranges(self, mesh: CartesianMesh) -> list[tuple[int, int]]:
+        # [[x0, x1), [y0, y1), [z0, z1)] of the crop, the whole mesh without one
+        if self.bbox_voxels is not None:
+            return [(int(lo), int(hi)) for lo, hi in self.bbox_voxels]
+        if self.bbox_um is not None:
+            ranges = []
+            for (lo, hi), origin, extent, size in zip(self.bbox_um, mesh.origin, mesh.extent, mesh.size):
+                voxel = extent / size
+                ranges.append((
+                    max(0, int(np.ceil((lo - origin) / voxel - 0.5))),
+                    min(size, int(np.floor((hi - origin) / voxel - 0.5)) + 1),
+                ))
+            return ranges
+        if self.crop_domain is not None:
+            num_x, num_y, num_z = mesh.size
+            k, j, i = np.unravel_index(mesh.get_volume_domain_indices(self.crop_domain), (num_z, num_y, num_x))
+            return [
+                (int(i.min()), int(i.max()) + 1),
+                (int(j.min()), int(j.max()) + 1),
+                (int(k.min()), int(k.max()) + 1),
+            ]
+        return [(0, size) for size in mesh.size]
+
+    def crop_mesh(self, mesh: CartesianMesh) -> CartesianMesh:
+        if not self.is_spatial:
+            return mesh
+        return mesh.crop(self.get_voxel_ranges(mesh), self.stride)
+
+    def get_crop(self, mesh: CartesianMesh) -> tuple[tuple[int, int, int], tuple[slice, slice, slice]] | None:
+        # ((z, y, x) shape of the full grid, (z, y, x) slices) for crop_frame(), None without a spatial selection
+        if not self.is_spatial:
+            return None
+        num_x, num_y, num_z = mesh.size
+        return (num_z, num_y, num_x), mesh.get_crop_slices(self.get_voxel_ranges(mesh), self.stride)
+
+    def metadata(self, mesh: CartesianMesh) -> dict:
+        return {
+            "variables": self.variables,
+            "time_start": self.time_start,
+            "time_end": self.time_end,
+            "time_step": self.time_step,
+            "voxel_ranges": self.get_voxel_ranges(mesh),
+            "stride": list(self.stride),
+            "source_size": list(mesh.size),
+        }
+
+
+def crop_frame(data: np.ndarray, crop: tuple[tuple[int, int, int], tuple[slice, slice, slice]] | None) -> np.ndarray:
+    # flat volume frame of the full grid -> flat frame of the crop (see ExportSelection.get_crop())
+    if crop is None:
+        return data
+    shape, slices = crop
+    cropped: np.ndarray = np.ascontiguousarray(data.reshape(shape)[slices]).ravel()
+    return cropped
@@ -1,10 +1,17 @@
 from pathlib import Path
+from typing import Optional
 
 import typer
 
+from pyvcell.simdata.ensemble import EnsembleDataSet, write_ensemble_zarr
+from pyvcell.simdata.export_selection import ExportSelection
 from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.postprocessing import PostProcessing
+from pyvcell.simdata.scan import read_scan_jobs
 from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
-from pyvcell.simdata.zarr_writer import write_zarr
+from pyvcell.simdata.zarr_codecs import DeltaMode
+from pyvcell.simdata.zarr_storage import AccessPattern, Compressor, ZarrStorageOptions
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_scan_zarr, write_zarr
 
 app = typer.Typer()
 
@@ -15,6 +22,36 @@ def n5_to_zarr(
     sim_id: int = typer.Argument(..., help="simulation id (e.g. 946368938)"),
     job_id: int = typer.Argument(..., help="job id (e.g. 0"),
     zarr_path: Path = typer.Argument(..., help="path to zarr dataset to write to"),
+    compact: bool = typer.Option(False, help="store only the values inside each variable's domain"),
+    workers: int = typer.Option(1, help="number of parallel workers per export stage"),
+    processes: bool = typer.Option(False, help="read and decompress timepoints in worker processes"),
+    layout: Optional[ZarrLayout] = typer.Option(None, help="output layout (default v1, or v2 with --compact)"),
+    access_pattern: Optional[AccessPattern] = typer.Option(None, help="plan chunks for this read access pattern"),
+    chunk_mb: float = typer.Option(8.0, help="target chunk size in MiB when planning chunks"),
+    compressor: Optional[Compressor] = typer.Option(None, help="compressor (default: zarr default)"),
+    compression_level: Optional[int] = typer.Option(None, help="compression level of the compressor"),
+    shard_mb: Optional[float] = typer.Option(None, help="shard size in MiB (requires zarr-python 3)"),
+    dtype: str = typer.Option("float64", help="dtype of the stored data (e.g. float32)"),
+    delta: Optional[DeltaMode] = typer.Option(None, help="store chunks as a keyframe and differences along time"),
+    error_bound: Optional[float] = typer.Option(None, help="absolute error bound of --delta quantize"),
+    multiscale_levels: int = typer.Option(0, help="number of downsampled OME-NGFF pyramid levels (layout v1)"),
+    resume: bool = typer.Option(False, help="only write timepoints missing from an existing export (layout v2)"),
+    variables: Optional[list[str]] = typer.Option(
+        None, "--variable", help="export variables/functions matching this pattern (repeatable, e.g. 'cytosol::*')"
+    ),
+    time_start: Optional[float] = typer.Option(None, help="first time to export (seconds)"),
+    time_end: Optional[float] = typer.Option(None, help="last time to export (seconds)"),
+    time_step: int = typer.Option(1, help="export every n-th timepoint"),
+    bbox: Optional[str] = typer.Option(None, help="voxel ranges 'x0:x1,y0:y1,z0:z1' (end exclusive)"),
+    bbox_um: Optional[str] = typer.Option(None, help="micrometer ranges 'x0:x1,y0:y1,z0:z1'"),
+    crop_domain: Optional[str] = typer.Option(None, help="crop to the bounding box of this volume domain"),
+    stride: str = typer.Option("1,1,1", help="keep every n-th voxel along x,y,z"),
+    region_statistics: bool = typer.Option(False, help="also record statistics per volume/membrane region"),
+    histograms: bool = typer.Option(False, help="record streaming histograms for quantile queries"),
+    previews: bool = typer.Option(False, help="store projection and central slice previews (layout v2)"),
+    post_processing: bool = typer.Option(
+        False, help="also store the post processing statistics and images (layout v2)"
+    ),
 ) -> None:
     pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename=f"SimID_{sim_id}_{job_id}_.log")
     pde_dataset.read()
@@ -22,8 +59,131 @@ def n5_to_zarr(
     data_functions.read()
     mesh = CartesianMesh(mesh_file=sim_data_dir / f"SimID_{sim_id}_{job_id}_.mesh")
     mesh.read()
+    post_processing_data = None
+    if post_processing:
+        post_processing_data = PostProcessing(postprocessing_hdf5_path=sim_data_dir / f"SimID_{sim_id}_{job_id}_.hdf5")
+        post_processing_data.read()
 
-    write_zarr(pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=zarr_path)
+    selection = ExportSelection(
+        variables=variables or None,
+        time_start=time_start,
+        time_end=time_end,
+        time_step=time_step,
+        bbox_voxels=[(int(lo), int(hi)) for lo, hi in _parse_ranges(bbox)] if bbox is not None else None,
+        bbox_um=_parse_ranges(bbox_um) if bbox_um is not None else None,
+        crop_domain=crop_domain,
+        stride=_parse_stride(stride),
+    )
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_path,
+        compact=compact,
+        workers=workers,
+        use_processes=processes,
+        layout=layout,
+        storage=ZarrStorageOptions(
+            access_pattern=access_pattern,
+            target_chunk_bytes=int(chunk_mb * 1024 * 1024),
+            compressor=compressor,
+            compression_level=compression_level,
+            shard_bytes=int(shard_mb * 1024 * 1024) if shard_mb is not None else None,
+            dtype=dtype,
+            delta_mode=delta,
+            error_bound=error_bound,
+        ),
+        multiscale_levels=multiscale_levels,
+        resume=resume,
+        selection=selection if selection != ExportSelection() else None,
+        region_statistics=region_statistics,
+        histograms=histograms,
+        previews=previews,
+        post_processing=post_processing_data,
+    )
+
+
+@app.command(name="vc_scan_to_zarr", help="Convert all jobs of a VCell parameter scan to one Zarr store")
+def scan_to_zarr(
+    sim_data_dir: Path = typer.Argument(..., help="path to vcell dataset directory"),
+    sim_id: int = typer.Argument(..., help="simulation id (e.g. 946368938)"),
+    zarr_path: Path = typer.Argument(..., help="path to zarr dataset to write to"),
+    job_ids: Optional[list[int]] = typer.Option(None, "--job", help="job to include (repeatable, default: all)"),
+    compact: bool = typer.Option(False, help="store only the values inside each variable's domain"),
+    workers: int = typer.Option(1, help="number of parallel workers per export stage of each job"),
+    job_workers: int = typer.Option(1, help="number of jobs converted in parallel"),
+    processes: bool = typer.Option(False, help="read and decompress timepoints in worker processes"),
+    access_pattern: Optional[AccessPattern] = typer.Option(None, help="plan chunks for this read access pattern"),
+    chunk_mb: float = typer.Option(8.0, help="target chunk size in MiB when planning chunks"),
+    compressor: Optional[Compressor] = typer.Option(None, help="compressor (default: zarr default)"),
+    dtype: str = typer.Option("float64", help="dtype of the stored data (e.g. float32)"),
+) -> None:
+    jobs = read_scan_jobs(sim_data_dir, sim_id, job_ids or None)
+    mesh = CartesianMesh(mesh_file=sim_data_dir / f"SimID_{sim_id}_{jobs[0].job_id}_.mesh")
+    mesh.read()
+    write_scan_zarr(
+        jobs=jobs,
+        mesh=mesh,
+        zarr_dir=zarr_path,
+        compact=compact,
+        workers=workers,
+        job_workers=job_workers,
+        use_processes=processes,
+        storage=ZarrStorageOptions(
+            access_pattern=access_pattern,
+            target_chunk_bytes=int(chunk_mb * 1024 * 1024),
+            compressor=compressor,
+            dtype=dtype,
+        ),
+    )
+
+
+@app.command(name="vc_ensemble_to_zarr", help="Write per element mean, variance, min and max across scan jobs to Zarr")
+def ensemble_to_zarr(
+    sim_data_dir: Path = typer.Argument(..., help="path to vcell dataset directory"),
+    sim_id: int = typer.Argument(..., help="simulation id (e.g. 946368938)"),
+    zarr_path: Path = typer.Argument(..., help="path to zarr dataset to write to"),
+    job_ids: Optional[list[int]] = typer.Option(None, "--job", help="job to include (repeatable, default: all)"),
+    variables: Optional[list[str]] = typer.Option(None, "--variable", help="variable to summarize (repeatable)"),
+    compact: bool = typer.Option(False, help="store only the values inside each variable's domain"),
+    workers: int = typer.Option(1, help="number of timepoints summarized in parallel"),
+    job_workers: int = typer.Option(1, help="number of workers splitting the jobs of a timepoint"),
+    access_pattern: Optional[AccessPattern] = typer.Option(None, help="plan chunks for this read access pattern"),
+    chunk_mb: float = typer.Option(8.0, help="target chunk size in MiB when planning chunks"),
+    compressor: Optional[Compressor] = typer.Option(None, help="compressor (default: zarr default)"),
+    dtype: str = typer.Option("float64", help="dtype of the stored data (e.g. float32)"),
+) -> None:
+    jobs = read_scan_jobs(sim_data_dir, sim_id, job_ids or None)
+    mesh = CartesianMesh(mesh_file=sim_data_dir / f"SimID_{sim_id}_{jobs[0].job_id}_.mesh")
+    mesh.read()
+    ensemble = EnsembleDataSet([job.pde_dataset for job in jobs], variables=variables or None, workers=job_workers)
+    write_ensemble_zarr(
+        ensemble,
+        mesh,
+        zarr_path,
+        compact=compact,
+        workers=workers,
+        storage=ZarrStorageOptions(
+            access_pattern=access_pattern,
+            target_chunk_bytes=int(chunk_mb * 1024 * 1024),
+            compressor=compressor,
+            dtype=dtype,
+        ),
+    )
+
+
+def _parse_ranges(text: str) -> list[tuple[float, float]]:
+    ranges = [tuple(float(value) for value in axis_range.split(":")) for axis_range in text.split(",")]
+    if len(ranges) != 3 or any(len(axis_range) != 2 for axis_range in ranges):
+        raise typer.BadParameter(f"expected 'x0:x1,y0:y1,z0:z1', found '{text}'")
+    return [(axis_range[0], axis_range[1]) for axis_range in ranges]
+
+
+def _parse_stride(text: str) -> tuple[int, int, int]:
+    values = [int(value) for value in text.split(",")]
+    if len(values) != 3:
+        raise typer.BadParameter(f"expected 'sx,sy,sz', found '{text}'")
+    return values[0], values[1], values[2]
 
 
 def main() -> None:
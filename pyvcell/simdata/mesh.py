@@ -76,6 +76,8 @@ class CartesianMesh:
     origin: list[float]  # [x, y, z]
     volume_regions: list[tuple[int, int, float, str]]  # list of tuples (vol_reg_id, subvol_id, volume, domain_name)
     membrane_regions: list[tuple[int, int, int, float]]  # list of tuples (mem_reg_id, vol_reg1, vol_reg2, surface)
+    # inside and outside volume domain names by membrane domain name, from the .subdomains file next to mesh_file
+    membrane_domains: dict[str, tuple[str, str]]
 
     # membrane_element[m,:] = [idx, vol1, vol2, conn0, conn1, conn2, conn3, mem_reg_id]
     membrane_elements: np.ndarray  # shape (num_membrane_elements, 8)
@@ -83,6 +85,9 @@ class CartesianMesh:
     # volume_region_map[m] = vol_reg_id
     volume_region_map: np.ndarray  # shape (size[0] * size[1] * size[2],)
 
+    # cache of sorted global volume element indices per volume domain, see get_volume_domain_indices()
+    _volume_domain_indices: dict[str, np.ndarray]
+
     def __init__(self, mesh_file: Path) -> None:
         self.mesh_file = mesh_file
         self.size = []
@@ -90,8 +95,10 @@ class CartesianMesh:
         self.origin = []
         self.volume_regions = []
         self.membrane_regions = []
+        self.membrane_domains = {}
         # self.membrane_elements
         self.volume_region_map = np.array([], dtype=np.uint8)
+        self._volume_domain_indices = {}
 
     @property
     def dimension(self) -> int:
@@ -103,6 +110,7 @@ class CartesianMesh:
             return 3
 
     def read(self) -> None:
+        self._volume_domain_indices = {}
         # read file as lines and parse
         with self.mesh_file.open("r") as f:
             # get line enumerator from f
@@ -196,6 +204,15 @@ class CartesianMesh:
             if set(np.unique(self.membrane_elements[:, 7])) != {v[0] for v in self.membrane_regions}:
                 raise RuntimeError("Expected volume region ids in membrane elements to match volume regions")
 
+        self.membrane_domains = {}
+        subdomains_file = self.mesh_file.with_suffix(".subdomains")
+        if subdomains_file.exists():
+            # MembraneSubDomain, name, inside compartment name, handle, outside compartment name, handle
+            for line in subdomains_file.read_text().splitlines():
+                parts = [part.strip() for part in line.split(",")]
+                if parts[0] == "MembraneSubDomain":
+                    self.membrane_domains[parts[1]] = (parts[2], parts[4])
+
     def get_volume_element_box(self, i: int, j: int, k: int) -> Box3D:
         x_lo = self.origin[0] + i * self.extent[0] / self.size[0]
         y_lo = self.origin[1] + j * self.extent[1] / self.size[1]
@@ -205,6 +222,25 @@ class CartesianMesh:
         z_hi = self.origin[2] + (k + 1) * self.extent[2] / self.size[2]
         return Box3D(x_lo, y_lo, z_lo, x_hi, y_hi, z_hi)
 
+    def get_volume_element_ijk(self, points: np.ndarray) -> np.ndarray:
+        # vectorized inverse of get_volume_element_box(), points has shape (num_points, 3) as [x, y, z]
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        if points.shape[1] != 3:
+            raise ValueError(f"Expected points of shape (num_points, 3) but found {points.shape}")
+        origin = np.array(self.origin)
+        extent = np.array(self.extent)
+        size = np.array(self.size)
+        if np.any(points < origin) or np.any(points > origin + extent):
+            raise ValueError("points must lie within the mesh extent")
+        ijk = np.floor((points - origin) * size / extent).astype(np.int64)
+        # points on the upper boundary belong to the last volume element
+        return np.minimum(ijk, size - 1)
+
+    def get_volume_element_global_index(self, ijk: np.ndarray) -> np.ndarray:
+        ijk = np.asarray(ijk, dtype=np.int64)
+        global_index: np.ndarray = ijk[..., 0] + ijk[..., 1] * self.size[0] + ijk[..., 2] * self.size[0] * self.size[1]
+        return global_index
+
     def get_membrane_region_index(self, mem_element_index: int) -> int:
         return int(self.membrane_elements[mem_element_index, 7])
 
@@ -216,9 +252,191 @@ class CartesianMesh:
             or self.volume_regions[vol_reg2][3] == volume_domain_name
         }
 
+    def get_membrane_domain_region_ids(self, membrane_domain_name: str) -> set[int]:
+        # membrane regions between the inside and outside volume domains of the membrane domain
+        if membrane_domain_name not in self.membrane_domains:
+            raise ValueError(f"membrane domain {membrane_domain_name} not found in {self.mesh_file.stem}.subdomains")
+        domain_names = set(self.membrane_domains[membrane_domain_name])
+        return {
+            mem_reg_id
+            for mem_reg_id, vol_reg1, vol_reg2, surface in self.membrane_regions
+            if {self.volume_regions[vol_reg1][3], self.volume_regions[vol_reg2][3]} == domain_names
+        }
+
+    def get_membrane_volume_indices(self, volume_domain_name: str) -> np.ndarray:
+        # per membrane element, the global index of its adjacent volume element in the domain (-1 if neither side)
+        region_ids = list(self.get_volume_region_ids(volume_domain_name))
+        if len(region_ids) == 0:
+            raise ValueError(f"volume domain {volume_domain_name} not found in mesh")
+        vol1 = self.membrane_elements[:, 1]
+        vol2 = self.membrane_elements[:, 2]
+        in_domain_1 = np.isin(self.volume_region_map[vol1], region_ids)
+        in_domain_2 = np.isin(self.volume_region_map[vol2], region_ids)
+        indices: np.ndarray = np.where(in_domain_1, vol1, np.where(in_domain_2, vol2, -1))
+        return indices
+
     def get_volume_region_ids(self, volume_domain_name: str) -> set[int]:
         return {
             vol_reg_id
             for vol_reg_id, subvol_id, volume, domain_name in self.volume_regions
             if domain_name == volume_domain_name
         }
+
+    def get_volume_domain_indices(self, volume_domain_name: str) -> np.ndarray:
+        # sorted global indices of the volume elements within the domain (all of its volume regions), cached
+        indices = self._volume_domain_indices.get(volume_domain_name)
+        if indices is None:
+            region_ids = list(self.get_volume_region_ids(volume_domain_name))
+            if len(region_ids) == 0:
+                raise ValueError(f"volume domain {volume_domain_name} not found in mesh")
+            indices = np.flatnonzero(np.isin(self.volume_region_map, region_ids))
+            indices.flags.writeable = False
+            self._volume_domain_indices[volume_domain_name] = indices
+        return indices
+
+    def compact(self, volume_data: np.ndarray, volume_domain_name: str) -> np.ndarray:
+        # keep only the values inside the volume domain, shape (len(get_volume_domain_indices()),)
+        compact_data: np.ndarray = volume_data[self.get_volume_domain_indices(volume_domain_name)]
+        return compact_data
+
+    def scatter(self, compact_data: np.ndarray, volume_domain_name: str, fill_value: float = 0.0) -> np.ndarray:
+        # inverse of compact(), rebuilds the full volume array with fill_value outside of the domain
+        indices = self.get_volume_domain_indices(volume_domain_name)
+        if compact_data.shape[-1] != indices.shape[0]:
+            raise ValueError(
+                f"Expected {indices.shape[0]} values for domain {volume_domain_name} but found {compact_data.shape[-1]}"
+            )
+        volume_data = np.full(
+            (*compact_data.shape[:-1], self.volume_region_map.shape[0]), fill_value, dtype=compact_data.dtype
+        )
+        volume_data[..., indices] = compact_data
+        return volume_data
+
+    def get_crop_slices(
+        self, ranges: list[tuple[int, int]], stride: tuple[int, int, int] = (1, 1, 1)
+    ) -> tuple[slice, slice, slice]:
+        # (z, y, x) slices of the voxel ranges [[x0, x1), [y0, y1), [z0, z1)] sampled every stride [sx, sy, sz]
+        for axis, ((lo, hi), step, size) in enumerate(zip(ranges, stride, self.size)):
+            if not 0 <= lo < hi <= size or step < 1:
+                raise ValueError(f"invalid range [{lo}, {hi}) with stride {step} for mesh axis {axis} of size {size}")
+        return (
+            slice(ranges[2][0], ranges[2][1], stride[2]),
+            slice(ranges[1][0], ranges[1][1], stride[1]),
+            slice(ranges[0][0], ranges[0][1], stride[0]),
+        )
+
+    def crop(self, ranges: list[tuple[int, int]], stride: tuple[int, int, int] = (1, 1, 1)) -> "CartesianMesh":
+        """
+        the sub grid of voxel ranges [[x0, x1), [y0, y1), [z0, z1)] sampled every stride [sx, sy, sz] voxels
+
+        a strided voxel is centered on the sampled voxel and stride times larger. Membrane elements refer to
+        volume elements of the full grid, so the cropped mesh has none (membrane regions are kept).
+        """
+        slices = self.get_crop_slices(ranges, stride)
+        num_x, num_y, num_z = self.size
+        region_map = self.volume_region_map.reshape((num_z, num_y, num_x))[slices]
+        cropped = CartesianMesh(self.mesh_file)
+        cropped.size = [region_map.shape[2], region_map.shape[1], region_map.shape[0]]
+        voxel_size = [extent / size for extent, size in zip(self.extent, self.size)]
+        cropped.origin = [
+            origin + (lo + 0.5) * voxel - 0.5 * step * voxel
+            for origin, (lo, _hi), step, voxel in zip(self.origin, ranges, stride, voxel_size)
+        ]
+        cropped.extent = [size * step * voxel for size, step, voxel in zip(cropped.size, stride, voxel_size)]
+        cropped.volume_regions = list(self.volume_regions)
+        cropped.membrane_regions = list(self.membrane_regions)
+        cropped.membrane_domains = dict(self.membrane_domains)
+        cropped.membrane_elements = np.zeros((0, 8), dtype=self.membrane_elements.dtype)
+        cropped.volume_region_map = region_map.ravel()
+        return cropped
+
+
+class MeshMetrics:
+    """
+    reads the .meshmetrics file and extracts per-membrane-element geometry (centroid, area and unit normal)
+
+    rows are ordered by membrane element index, so the arrays are aligned with CartesianMesh.membrane_elements
+
+    Example .meshmetrics file:
+    MembraneElements {
+    7817
+    Index RegionIndex                 X                         Y                         Z                      Area                        Nx                        Ny                        Nz
+    0               0        38.180571428571426        24.393142857142855                     1.625       0.48353689630963348       0.21688110693267995       0.80788190327819132       0.54798669309688752
+    1               0        39.241142857142854        24.393142857142855                     1.625       0.47515549390421596      -0.15681661911998659       0.88334195265105764       0.44171885023665625
+    ....
+    7816            4        26.514285714285712        49.846857142857139        22.208333333333332       0.85813751304005537        0.1349252545088486                         0       0.99085577946324888
+    }
+    """
+
+    mesh_metrics_file: Path
+    membrane_element_indices: np.ndarray  # shape (num_membrane_elements,)
+    membrane_region_indices: np.ndarray  # shape (num_membrane_elements,)
+    centroids: np.ndarray  # shape (num_membrane_elements, 3) as [x, y, z]
+    areas: np.ndarray  # shape (num_membrane_elements,)
+    normals: np.ndarray  # shape (num_membrane_elements, 3) as [nx, ny, nz]
+
+    def __init__(self, mesh_metrics_file: Path) -> None:
+        self.mesh_metrics_file = mesh_metrics_file
+        self.membrane_element_indices = np.array([], dtype=np.int32)
+        self.membrane_region_indices = np.array([], dtype=np.int32)
+        self.centroids = np.zeros((0, 3))
+        self.areas = np.array([], dtype=np.float64)
+        self.normals = np.zeros((0, 3))
+
+    @property
+    def num_membrane_elements(self) -> int:
+        return int(self.areas.shape[0])
+
+    def read(self) -> None:
+        with self.mesh_metrics_file.open("r") as f:
+            if f.readline().strip() != "MembraneElements {":
+                raise RuntimeError("Expected 'MembraneElements {' at the beginning of the file")
+            num_membrane_elements = int(f.readline())
+            header = f.readline().split()
+            if header[:2] != ["Index", "RegionIndex"] or len(header) != 9:
+                raise RuntimeError(f"Unexpected column header {header} in mesh metrics file")
+            # the remainder is a whitespace separated table terminated by "}", parse it in one pass
+            body = f.read().rstrip()
+        if not body.endswith("}"):
+            raise RuntimeError("Expected '}' at the end of the mesh metrics file")
+        table = np.array(body[:-1].split(), dtype=np.float64)
+        if table.shape[0] != num_membrane_elements * 9:
+            raise ValueError(f"Expected {num_membrane_elements} rows of 9 columns in mesh metrics file")
+        table = table.reshape((num_membrane_elements, 9))
+
+        self.membrane_element_indices = table[:, 0].astype(np.int32)
+        self.membrane_region_indices = table[:, 1].astype(np.int32)
+        self.centroids = np.ascontiguousarray(table[:, 2:5])
+        self.areas = np.ascontiguousarray(table[:, 5])
+        self.normals = np.ascontiguousarray(table[:, 6:9])
+        if not np.array_equal(self.membrane_element_indices, np.arange(num_membrane_elements)):
+            raise ValueError("Expected membrane elements to be listed in index order")
+
+    def check_alignment(self, mesh: CartesianMesh) -> None:
+        if mesh.membrane_elements.shape[0] != self.num_membrane_elements:
+            raise ValueError(
+                f"mesh has {mesh.membrane_elements.shape[0]} membrane elements, "
+                f"mesh metrics has {self.num_membrane_elements}"
+            )
+        if not np.array_equal(mesh.membrane_elements[:, 7], self.membrane_region_indices):
+            raise ValueError("membrane region indices in mesh metrics do not match the mesh")
+
+    def get_membrane_region_areas(self, mesh: CartesianMesh) -> np.ndarray:
+        # shape (num_membrane_regions,), indexed by membrane region id of the mesh (0 for regions without elements)
+        return np.bincount(
+            self.membrane_region_indices, weights=self.areas, minlength=_get_num_membrane_region_ids(mesh)
+        )
+
+    def integrate(self, membrane_data: np.ndarray, mesh: CartesianMesh) -> np.ndarray:
+        # area weighted integral of per-membrane-element data, one value per membrane region id of the mesh
+        if membrane_data.shape != self.areas.shape:
+            raise ValueError(f"Expected membrane data of shape {self.areas.shape} but found {membrane_data.shape}")
+        return np.bincount(
+            self.membrane_region_indices,
+            weights=membrane_data * self.areas,
+            minlength=_get_num_membrane_region_ids(mesh),
+        )
+
+
+def _get_num_membrane_region_ids(mesh: CartesianMesh) -> int:
+    return max((mem_reg_id for mem_reg_id, _vol_reg1, _vol_reg2, _surface in mesh.membrane_regions), default=-1) + 1
@@ -0,0 +1,107 @@
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh
+
+
+class RegionPooling:
+    """
+    region aware downsampling of (z, y, x) volume frames by factors (fz, fy, fx)
+
+    each output voxel pools one block of input voxels. The pooled region map holds the most frequent region
+    of each block (mode pooling, ties go to the smaller region index), and data is averaged only over the
+    block's voxels of that region (mean pooling), so values never mix across region boundaries. Blocks are
+    grouped once from the region map, each call to pool() is then a single bincount pass.
+    """
+
+    factors: tuple[int, int, int]  # (fz, fy, fx)
+    shape: tuple[int, int, int]  # downsampled (z, y, x)
+    region_map: np.ndarray  # downsampled (z, y, x) mode of the region map
+    selected_voxels: np.ndarray  # flat input voxels lying in the mode region of their block
+    selected_blocks: np.ndarray  # output voxel of each selected input voxel
+    counts: np.ndarray  # number of selected voxels per output voxel
+
+    def __init__(self, region_map: np.ndarray, factors: tuple[int, int, int]) -> None:
+        if region_map.ndim != 3:
+            raise ValueError(f"Expected a (z, y, x) region map, found shape {region_map.shape}")
+        if any(f < 1 for f in factors):
+            raise ValueError(f"pooling factors must be positive, found {factors}")
+        self.factors = factors
+        num_z, num_y, num_x = region_map.shape
+        fz, fy, fx = factors
+        self.shape = (-(-num_z // fz), -(-num_y // fy), -(-num_x // fx))
+
+        k, j, i = np.indices(region_map.shape, sparse=True)
+        block_ids = ((k // fz) * self.shape[1] + (j // fy)) * self.shape[2] + (i // fx)
+        block_ids = np.broadcast_to(block_ids, region_map.shape).ravel()
+        labels = region_map.ravel().astype(np.int64)
+
+        # mode per block: count (block, label) pairs, then take the largest count of each block
+        num_labels = int(np.max(labels, initial=0)) + 1
+        keys, key_counts = np.unique(block_ids.astype(np.int64) * num_labels + labels, return_counts=True)
+        key_blocks = keys // num_labels
+        order = np.lexsort((-key_counts, key_blocks))
+        first = np.ones(order.shape[0], dtype=bool)
+        first[1:] = key_blocks[order][1:] != key_blocks[order][:-1]
+        mode_labels = (keys % num_labels)[order][first]
+
+        self.region_map = mode_labels.reshape(self.shape).astype(region_map.dtype)
+        self.selected_voxels = np.where(labels == mode_labels[block_ids])[0]
+        self.selected_blocks = block_ids[self.selected_voxels]
+        self.counts = np.bincount(self.selected_blocks, minlength=mode_labels.shape[0])
+
+    def pool(self, data: np.ndarray) -> np.ndarray:
+        # data is a full resolution frame, (z, y, x) or flat
+        values = np.asarray(data, dtype=np.float64).ravel()
+        sums = np.bincount(self.selected_blocks, weights=values[self.selected_voxels], minlength=self.counts.shape[0])
+        pooled: np.ndarray = (sums / self.counts).reshape(self.shape)
+        return pooled
+
+
+def get_pyramid_poolings(mesh: CartesianMesh, num_levels: int) -> list[RegionPooling]:
+    # poolings of levels 1..num_levels, each level halves every axis with more than one element
+    if num_levels < 0:
+        raise ValueError(f"number of multiscale levels must not be negative, found {num_levels}")
+    num_x, num_y, num_z = mesh.size
+    region_map = mesh.volume_region_map.reshape((num_z, num_y, num_x))
+    poolings = []
+    for level in range(1, num_levels + 1):
+        factors = (2**level if num_z > 1 else 1, 2**level if num_y > 1 else 1, 2**level if num_x > 1 else 1)
+        poolings.append(RegionPooling(region_map, (factors[0], factors[1], factors[2])))
+    return poolings
+
+
+def multiscales_metadata(mesh: CartesianMesh, poolings: list[RegionPooling], name: str) -> list[dict]:
+    """
+    OME-NGFF (0.4) "multiscales" attribute for (t, c, z, y, x) levels stored at paths "0", "1", ...
+
+    scale and translation are in micrometers, translation is the center of the first voxel of each level.
+    """
+    num_x, num_y, num_z = mesh.size
+    voxel_size = [mesh.extent[2] / num_z, mesh.extent[1] / num_y, mesh.extent[0] / num_x]
+    origin = [mesh.origin[2], mesh.origin[1], mesh.origin[0]]
+    datasets = []
+    for level, factors in enumerate([(1, 1, 1)] + [pooling.factors for pooling in poolings]):
+        scale = [size * factor for size, factor in zip(voxel_size, factors)]
+        datasets.append({
+            "path": str(level),
+            "coordinateTransformations": [
+                {"type": "scale", "scale": [1.0, 1.0, *scale]},
+                {"type": "translation", "translation": [0.0, 0.0, *[o + s / 2 for o, s in zip(origin, scale)]]},
+            ],
+        })
+    return [
+        {
+            "version": "0.4",
+            "name": name,
+            "axes": [
+                {"name": "t", "type": "time", "unit": "second"},
+                {"name": "c", "type": "channel"},
+                {"name": "z", "type": "space", "unit": "micrometer"},
+                {"name": "y", "type": "space", "unit": "micrometer"},
+                {"name": "x", "type": "space", "unit": "micrometer"},
+            ],
+            "datasets": datasets,
+            "type": "region_mean",
+            "metadata": {"description": "data channels: mean within the block's mode region, region mask: mode"},
+        }
+    ]
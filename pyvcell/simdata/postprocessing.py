@@ -1,5 +1,8 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
 from enum import IntEnum
 from pathlib import Path
+from types import TracebackType
 
 import numpy as np
 from h5py import Dataset, Group
@@ -19,6 +22,7 @@ class ImageMetadata:
     extents: np.ndarray
     origin: np.ndarray
     shape: tuple[int, ...]
+    dtype: np.dtype
 
     def __init__(self, name: str, group_path: str):
         self.name = name
@@ -60,7 +64,9 @@ class ImageMetadata:
             origin_list.append(image_group.attrs["OriginZ"])
         self.extents = np.array(extents_list)
         self.origin = np.array(origin_list)
-        self.shape = self.get_dataset(f, 0).shape
+        first_ds = self.get_dataset(f, 0)
+        self.shape = first_ds.shape
+        self.dtype = first_ds.dtype
 
 
 class VariableInfo:
@@ -83,20 +89,56 @@ class VariableInfo:
 
 
 class PostProcessing:
+    """
+    the solver's post processing file: variable statistics per time and image data (e.g. fluorescence)
+
+    used as a context manager (or with open() and close()), one file handle serves read() and all image
+    reads; otherwise every read opens the file on its own.
+    """
+
     postprocessing_hdf5_path: Path
     times: np.ndarray
     variables: list[VariableInfo]
     statistics: np.ndarray  # shape (times, vars, stats) where status is average=0, total=1, min=2, max=3
     image_metadata: list[ImageMetadata]
+    _file: H5File | None
 
     def __init__(self, postprocessing_hdf5_path: Path):
         self.postprocessing_hdf5_path = postprocessing_hdf5_path
         self.variables = []
         self.image_metadata = []
+        self._file = None
+
+    def open(self) -> None:
+        if self._file is None:
+            self._file = H5File(str(self.postprocessing_hdf5_path), "r")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "PostProcessing":
+        self.open()
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        self.close()
+
+    @contextmanager
+    def _hdf5_file(self) -> Iterator[H5File]:
+        # the open handle, or the file opened for the duration of one read
+        if self._file is not None:
+            yield self._file
+        else:
+            with H5File(str(self.postprocessing_hdf5_path), "r") as file:
+                yield file
 
     def read(self) -> None:
         # read the file as hdf5
-        with H5File(name=self.postprocessing_hdf5_path, mode="r") as file:  # type: ignore[call-arg]
+        with self._hdf5_file() as file:
             # read dataset with path /PostProcessing/Times
             postprocessing_times_object = file["/PostProcessing/Times"]
             if not isinstance(postprocessing_times_object, Dataset):
@@ -157,8 +199,8 @@ class PostProcessing:
             # PostProcessing/VariableStatistics/time000003
             # PostProcessing/VariableStatistics/time000004
 
-            # we can read the data for each time point into a list of ndarrays
-            statistics_raw: np.ndarray = np.zeros((len(self.times), len(self.variables)))
+            # read the rows of all time points straight into one preallocated array
+            statistics_raw: np.ndarray = np.empty((len(self.times), len(self.variables)))
             for time_index in range(len(self.times)):
                 time_ds_object = var_stats_grp[f"time{time_index:06d}"]
                 if not isinstance(time_ds_object, Dataset):
@@ -167,7 +209,7 @@ class PostProcessing:
                         f"but found {type(time_ds_object)}"
                     )
                 time_ds: Dataset = time_ds_object
-                statistics_raw[time_index, :] = time_ds[()]
+                time_ds.read_direct(statistics_raw, dest_sel=np.s_[time_index, :])
 
             # reshape the statistics_raw into a 3D array (times, vars, stats)
             self.statistics = statistics_raw.reshape((len(self.times), len(self.variables) // 4, 4))
@@ -186,6 +228,63 @@ class PostProcessing:
                 self.image_metadata.append(metadata)
 
     def read_image_data(self, image_metadata: ImageMetadata, time_index: int) -> np.ndarray:
-        with H5File(name=self.postprocessing_hdf5_path, mode="r") as file:  # type: ignore[call-arg]
-            image_ds = image_metadata.get_dataset(hdf5_file=file, time_index=time_index)
-            return np.array(image_ds[()])
+        images = self.read_images(image_metadata, [time_index])
+        image: np.ndarray = images[0]
+        return image
+
+    def read_image_stack(self, image_metadata: ImageMetadata, time_slice: slice | None = None) -> np.ndarray:
+        # images of the selected time points (default: all), shape (times, *image shape)
+        return self.image_stack(image_metadata)[time_slice if time_slice is not None else slice(None)]
+
+    def image_stack(self, image_metadata: ImageMetadata) -> "ImageStack":
+        return ImageStack(self, image_metadata)
+
+    def read_images(
+        self, image_metadata: ImageMetadata, time_indices: list[int], image_key: tuple[int | slice, ...] = ()
+    ) -> np.ndarray:
+        # the images (or the image_key part of them) of the time points, shape (times, *selected image shape)
+        selected_shape = np.broadcast_to(np.empty((), dtype=image_metadata.dtype), image_metadata.shape)[
+            image_key
+        ].shape
+        images: np.ndarray = np.empty((len(time_indices), *selected_shape), dtype=image_metadata.dtype)
+        with self._hdf5_file() as file:
+            for i, time_index in enumerate(time_indices):
+                image_ds = image_metadata.get_dataset(hdf5_file=file, time_index=time_index)
+                image_ds.read_direct(
+                    images, source_sel=image_key or None, dest_sel=(i, *[slice(None)] * len(selected_shape))
+                )
+        return images
+
+
+class ImageStack:
+    """
+    lazy (times, *image shape) view of a post processing image, read when indexed
+
+    the first index selects time points (int or slice), further int or slice indices select part of each
+    image; only the selection is read, into one preallocated array.
+    """
+
+    post_processing: PostProcessing
+    image_metadata: ImageMetadata
+
+    def __init__(self, post_processing: PostProcessing, image_metadata: ImageMetadata):
+        self.post_processing = post_processing
+        self.image_metadata = image_metadata
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return len(self.post_processing.times), *self.image_metadata.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.image_metadata.dtype
+
+    def __len__(self) -> int:
+        return len(self.post_processing.times)
+
+    def __getitem__(self, key: int | slice | tuple[int | slice, ...]) -> np.ndarray:
+        time_key, *image_key = key if isinstance(key, tuple) else (key,)
+        times = range(len(self))
+        time_indices = list(times[time_key]) if isinstance(time_key, slice) else [times[time_key]]
+        images = self.post_processing.read_images(self.image_metadata, time_indices, tuple(image_key))
+        return images if isinstance(time_key, slice) else images[0]
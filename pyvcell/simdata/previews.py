@@ -0,0 +1,50 @@
+import numpy as np
+
+# preview "<projection>_<axis>" collapses <axis> of a (z, y, x) frame
+PREVIEW_PROJECTIONS = ["max", "mean", "slice"]
+PREVIEW_AXES = ["z", "y", "x"]
+PREVIEW_NAMES = [f"{projection}_{axis}" for projection in PREVIEW_PROJECTIONS for axis in PREVIEW_AXES]
+
+
+class PreviewProjector:
+    """
+    small 2D previews of (z, y, x) volume frames: maximum intensity and mean projections along each axis,
+    and the central slice orthogonal to each axis
+
+    only voxels inside mask (default: all) contribute, NaN values are ignored. Pixels whose ray (or slice
+    position) holds no such voxel are NaN. The mask is reduced once, each call to project() is a single
+    pass of numpy reductions over the frame.
+    """
+
+    shape: tuple[int, int, int]  # (z, y, x)
+    mask: np.ndarray  # (z, y, x) bool
+    centers: tuple[int, int, int]  # (z, y, x) index of the central slices
+
+    def __init__(self, shape: tuple[int, int, int], mask: np.ndarray | None = None) -> None:
+        self.shape = shape
+        self.mask = np.ones(shape, dtype=bool) if mask is None else np.asarray(mask, dtype=bool).reshape(shape)
+        self.centers = (shape[0] // 2, shape[1] // 2, shape[2] // 2)
+
+    def preview_shapes(self) -> dict[str, tuple[int, int]]:
+        shapes = {}
+        for name in PREVIEW_NAMES:
+            axis = PREVIEW_AXES.index(name.split("_")[1])
+            image_shape = [size for a, size in enumerate(self.shape) if a != axis]
+            shapes[name] = (image_shape[0], image_shape[1])
+        return shapes
+
+    def project(self, data: np.ndarray) -> dict[str, np.ndarray]:
+        # data is a volume frame, (z, y, x) or flat
+        frame = np.asarray(data, dtype=np.float64).reshape(self.shape)
+        valid = self.mask & ~np.isnan(frame)
+        masked_max = np.where(valid, frame, -np.inf)
+        masked_sum = np.where(valid, frame, 0.0)
+        previews = {}
+        for axis, axis_name in enumerate(PREVIEW_AXES):
+            counts = valid.sum(axis=axis)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                previews[f"max_{axis_name}"] = np.where(counts > 0, masked_max.max(axis=axis), np.nan)
+                previews[f"mean_{axis_name}"] = np.where(counts > 0, masked_sum.sum(axis=axis) / counts, np.nan)
+            center = np.take(valid, self.centers[axis], axis=axis)
+            previews[f"slice_{axis_name}"] = np.where(center, np.take(frame, self.centers[axis], axis=axis), np.nan)
+        return {name: previews[name] for name in PREVIEW_NAMES}
@@ -0,0 +1,135 @@
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.simdata_models import (
+    DataSetBackend,
+    NamedFunction,
+    VariableInfo,
+    get_function_bindings,
+)
+
+
+class VolumeProbe:
+    """
+    samples volume data at arbitrary [x, y, z] coordinates (micrometers)
+
+    the coordinates are mapped to volume element indices and weights once, so that sampling a
+    time series only gathers those indices from each frame.
+
+    with interpolate=True, the value is trilinearly interpolated between the centers of the 8 nearest
+    volume elements, using only elements in the same volume region as the element containing the point
+    (values are not mixed across membranes).
+    """
+
+    mesh: CartesianMesh
+    points: np.ndarray  # shape (num_points, 3)
+    indices: np.ndarray  # shape (num_points, num_neighbors) global volume element indices
+    weights: np.ndarray  # shape (num_points, num_neighbors), rows sum to 1
+
+    def __init__(self, mesh: CartesianMesh, points: np.ndarray, interpolate: bool = False) -> None:
+        self.mesh = mesh
+        self.points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        containing_ijk = mesh.get_volume_element_ijk(self.points)
+        containing_index = mesh.get_volume_element_global_index(containing_ijk)
+        if not interpolate:
+            self.indices = containing_index.reshape((-1, 1))
+            self.weights = np.ones(self.indices.shape, dtype=np.float64)
+            return
+
+        size = np.array(mesh.size)
+        spacing = np.array(mesh.extent) / size
+        # fractional index relative to the volume element centers
+        f = (self.points - np.array(mesh.origin)) / spacing - 0.5
+        lo = np.clip(np.floor(f).astype(np.int64), 0, np.maximum(size - 2, 0))
+        hi = np.minimum(lo + 1, size - 1)
+        t = np.where(hi > lo, np.clip(f - lo, 0.0, 1.0), 0.0)
+
+        num_points = self.points.shape[0]
+        neighbor_ijk = np.empty((num_points, 8, 3), dtype=np.int64)
+        neighbor_weights = np.ones((num_points, 8), dtype=np.float64)
+        for n in range(8):
+            upper = np.array([n & 1, (n >> 1) & 1, (n >> 2) & 1], dtype=bool)
+            neighbor_ijk[:, n, :] = np.where(upper, hi, lo)
+            neighbor_weights[:, n] = np.prod(np.where(upper, t, 1.0 - t), axis=1)
+
+        neighbor_index = mesh.get_volume_element_global_index(neighbor_ijk)
+        region_map = mesh.volume_region_map
+        same_region = region_map[neighbor_index] == region_map[containing_index][:, np.newaxis]
+        neighbor_weights = np.where(same_region, neighbor_weights, 0.0)
+        weight_sums = np.sum(neighbor_weights, axis=1)
+
+        # fall back to the containing element where no same-region neighbor carries weight
+        isolated = weight_sums == 0.0
+        neighbor_index[isolated, 0] = containing_index[isolated]
+        neighbor_weights[isolated, 0] = 1.0
+        weight_sums[isolated] = 1.0
+        self.indices = neighbor_index
+        self.weights = neighbor_weights / weight_sums[:, np.newaxis]
+
+    @property
+    def num_points(self) -> int:
+        return int(self.points.shape[0])
+
+    def sample(self, data: np.ndarray) -> np.ndarray:
+        # data is a full volume frame, shape (size[0] * size[1] * size[2],)
+        result: np.ndarray = np.sum(data[self.indices] * self.weights, axis=1)
+        return result
+
+    def time_series(
+        self,
+        pde_dataset: DataSetBackend,
+        variable: VariableInfo | str | NamedFunction,
+        times: list[float] | None = None,
+    ) -> np.ndarray:
+        # returns shape (num_times, num_points)
+        if times is None:
+            times = pde_dataset.times()
+        unique_indices, inverse = np.unique(self.indices, return_inverse=True)
+        inverse = inverse.reshape(self.indices.shape)
+        result = np.zeros((len(times), self.num_points), dtype=np.float64)
+        for t, time in enumerate(times):
+            # only the probed elements are kept from each frame (and functions are evaluated only there)
+            if isinstance(variable, NamedFunction):
+                bindings = get_function_bindings(pde_dataset, variable, time)
+                gathered = {name: data[unique_indices] for name, data in bindings.items()}
+                values = np.broadcast_to(variable.evaluate(gathered), unique_indices.shape)
+            else:
+                values = pde_dataset.get_data(variable, time)[unique_indices]
+            result[t, :] = np.sum(values[inverse] * self.weights, axis=1)
+        return result
+
+
+def line_points(start: np.ndarray | list[float], end: np.ndarray | list[float], num_points: int) -> np.ndarray:
+    # evenly spaced points from start to end (inclusive), shape (num_points, 3)
+    if num_points < 2:
+        raise ValueError("a line profile needs at least 2 points")
+    return np.linspace(np.asarray(start, dtype=np.float64), np.asarray(end, dtype=np.float64), num_points)
+
+
+def line_profile(
+    pde_dataset: DataSetBackend,
+    mesh: CartesianMesh,
+    variable: VariableInfo | str | NamedFunction,
+    time: float,
+    start: np.ndarray | list[float],
+    end: np.ndarray | list[float],
+    num_points: int,
+    interpolate: bool = True,
+) -> np.ndarray:
+    probe = VolumeProbe(mesh, line_points(start, end, num_points), interpolate=interpolate)
+    profile: np.ndarray = probe.time_series(pde_dataset, variable, times=[time])[0]
+    return profile
+
+
+def kymograph(
+    pde_dataset: DataSetBackend,
+    mesh: CartesianMesh,
+    variable: VariableInfo | str | NamedFunction,
+    start: np.ndarray | list[float],
+    end: np.ndarray | list[float],
+    num_points: int,
+    interpolate: bool = True,
+) -> np.ndarray:
+    # returns an image of shape (num_times, num_points), one line profile per time
+    probe = VolumeProbe(mesh, line_points(start, end, num_points), interpolate=interpolate)
+    return probe.time_series(pde_dataset, variable)
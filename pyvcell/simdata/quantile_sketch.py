@@ -0,0 +1,167 @@
+import numpy as np
+
+from pyvcell.simdata.region_stats import RegionSegments
+from pyvcell.simdata.simdata_models import DataSetBackend, VariableInfo
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """
+    mergeable streaming histogram of values in logarithmic bins, answering quantile queries
+
+    a value v != 0 falls into bin ceil(log(|v|) / log(gamma)) of its sign, gamma = (1 + a) / (1 - a) for the
+    relative accuracy a, so every quantile is estimated within a relative error a (DDSketch binning) and
+    clipped to the exact min and max. Only non-empty bins are stored, a sketch of any amount of data stays a
+    few thousand bins. NaN values are ignored, sketches of parts of the data merge into the sketch of the whole.
+    """
+
+    relative_accuracy: float
+    log_gamma: float
+    positive_keys: np.ndarray  # sorted bin keys of positive values
+    positive_counts: np.ndarray
+    negative_keys: np.ndarray  # sorted bin keys of the magnitude of negative values
+    negative_counts: np.ndarray
+    zero_count: int  # values of magnitude below the smallest normal float
+    min: float
+    max: float
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative accuracy must be in (0, 1), found {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.log_gamma = float(np.log((1 + relative_accuracy) / (1 - relative_accuracy)))
+        self.positive_keys = np.zeros(0, dtype=np.int64)
+        self.positive_counts = np.zeros(0, dtype=np.int64)
+        self.negative_keys = np.zeros(0, dtype=np.int64)
+        self.negative_counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> int:
+        return int(self.positive_counts.sum() + self.negative_counts.sum()) + self.zero_count
+
+    def add(self, data: np.ndarray) -> None:
+        values = np.asarray(data, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.shape[0] == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        is_zero = np.abs(values) < np.finfo(np.float64).tiny
+        self.zero_count += int(np.count_nonzero(is_zero))
+        for sign in (1, -1):
+            magnitudes = sign * values[~is_zero & (sign * values > 0)]
+            # infinities fall into the largest finite bin
+            keys = np.ceil(np.log(np.minimum(magnitudes, np.finfo(np.float64).max)) / self.log_gamma)
+            unique_keys, counts = np.unique(keys.astype(np.int64), return_counts=True)
+            self._merge_bins(sign, unique_keys, counts)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches of different relative accuracy")
+        self._merge_bins(1, other.positive_keys, other.positive_counts)
+        self._merge_bins(-1, other.negative_keys, other.negative_counts)
+        self.zero_count += other.zero_count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float | list[float] | np.ndarray) -> np.ndarray:
+        # estimated quantiles (0 <= q <= 1), NaN for an empty sketch
+        quantiles = np.asarray(q, dtype=np.float64)
+        if np.any((quantiles < 0) | (quantiles > 1)):
+            raise ValueError(f"quantiles must be within [0, 1], found {q}")
+        if self.count == 0:
+            return np.full(quantiles.shape, np.nan)
+        # bins in increasing order of value: negative (largest magnitude first), zero, positive
+        bin_values = np.concatenate([
+            -self._bin_value(self.negative_keys[::-1]),
+            np.zeros(1),
+            self._bin_value(self.positive_keys),
+        ])
+        bin_counts = np.concatenate([self.negative_counts[::-1], [self.zero_count], self.positive_counts])
+        ranks = quantiles * (self.count - 1)
+        bins = np.searchsorted(np.cumsum(bin_counts), ranks, side="right")
+        estimates = np.clip(bin_values[np.minimum(bins, bin_values.shape[0] - 1)], self.min, self.max)
+        estimates = np.where(quantiles == 0, self.min, np.where(quantiles == 1, self.max, estimates))
+        return estimates
+
+    def to_metadata(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "min": self.min if self.count > 0 else None,
+            "max": self.max if self.count > 0 else None,
+            "zero_count": self.zero_count,
+            "positive": {"keys": self.positive_keys.tolist(), "counts": self.positive_counts.tolist()},
+            "negative": {"keys": self.negative_keys.tolist(), "counts": self.negative_counts.tolist()},
+        }
+
+    @staticmethod
+    def from_metadata(metadata: dict) -> "QuantileSketch":
+        sketch = QuantileSketch(relative_accuracy=metadata["relative_accuracy"])
+        sketch.positive_keys = np.asarray(metadata["positive"]["keys"], dtype=np.int64)
+        sketch.positive_counts = np.asarray(metadata["positive"]["counts"], dtype=np.int64)
+        sketch.negative_keys = np.asarray(metadata["negative"]["keys"], dtype=np.int64)
+        sketch.negative_counts = np.asarray(metadata["negative"]["counts"], dtype=np.int64)
+        sketch.zero_count = int(metadata["zero_count"])
+        sketch.min = np.inf if metadata["min"] is None else float(metadata["min"])
+        sketch.max = -np.inf if metadata["max"] is None else float(metadata["max"])
+        return sketch
+
+    def _bin_value(self, keys: np.ndarray) -> np.ndarray:
+        # value of relative error at most relative_accuracy for every value of the bin
+        gamma = np.exp(self.log_gamma)
+        bin_value: np.ndarray = 2.0 * np.exp(keys * self.log_gamma) / (gamma + 1.0)
+        return bin_value
+
+    def _merge_bins(self, sign: int, keys: np.ndarray, counts: np.ndarray) -> None:
+        if keys.shape[0] == 0:
+            return
+        old_keys, old_counts = (
+            (self.positive_keys, self.positive_counts) if sign > 0 else (self.negative_keys, self.negative_counts)
+        )
+        merged_keys, inverse = np.unique(np.concatenate([old_keys, keys]), return_inverse=True)
+        merged_counts = np.bincount(inverse, weights=np.concatenate([old_counts, counts])).astype(np.int64)
+        if sign > 0:
+            self.positive_keys, self.positive_counts = merged_keys, merged_counts
+        else:
+            self.negative_keys, self.negative_counts = merged_keys, merged_counts
+
+
+def compute_region_sketches(
+    data: np.ndarray, segments: RegionSegments, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY
+) -> list[QuantileSketch]:
+    # one sketch per region of segments (weights are ignored)
+    values = np.asarray(data, dtype=np.float64).ravel()[segments.sorted_elements]
+    sketches = [QuantileSketch(relative_accuracy) for _ in range(segments.num_regions)]
+    ends = np.append(segments.segment_starts[1:], values.shape[0])
+    for segment, start, end in zip(segments.nonempty_segments, segments.segment_starts, ends):
+        sketches[segment].add(values[start:end])
+    return sketches
+
+
+def compute_sketches(
+    dataset: DataSetBackend,
+    variables: list[str] | None = None,
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+) -> dict[str, QuantileSketch]:
+    """
+    sketches of all timepoints of the dataset's variables (default: all of them), one pass over the data
+
+    values are taken as stored, a PdeDataSet holds volume variables on the whole mesh (see
+    write_zarr(histograms=True) for sketches restricted to each variable's domain).
+    """
+    names = [
+        header.var_info.var_name
+        for header in dataset.variables_block_headers()
+        if variables is None or header.var_info.var_name in variables
+    ]
+    sketches = {name: QuantileSketch(relative_accuracy) for name in names}
+    blocks: list[VariableInfo | str] = list(names)
+    for time in dataset.times():
+        for name, data in zip(names, dataset.get_data_blocks(blocks, time)):
+            sketches[name].add(data)
+    return sketches
@@ -0,0 +1,172 @@
+from enum import IntEnum
+
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh, MeshMetrics
+from pyvcell.simdata.simdata_models import (
+    DataSetBackend,
+    NamedFunction,
+    VariableInfo,
+    VariableType,
+    get_function_bindings,
+)
+
+
+class RegionStatistic(IntEnum):
+    # same leading order as postprocessing.StatisticType
+    AVERAGE = 0
+    TOTAL = 1
+    MIN = 2
+    MAX = 3
+    VARIANCE = 4
+
+
+NUM_REGION_STATISTICS = len(RegionStatistic)
+
+
+class RegionSegments:
+    """
+    segmented (per-region) weighted reductions of a flat data array
+
+    labels[n] is the region id of element n and weights[n] its volume (or area). The grouping is
+    computed once, each call to reduce() is then a handful of bincount / reduceat passes.
+    """
+
+    region_ids: np.ndarray  # shape (num_regions,)
+    labels: np.ndarray  # shape (num_elements,) region id per element
+    weights: np.ndarray  # shape (num_elements,)
+    segment_of_element: np.ndarray  # shape (num_elements,) position in region_ids, or -1 if not selected
+    sorted_elements: np.ndarray  # selected element indices sorted by segment
+    segment_starts: np.ndarray  # start of each non-empty segment within sorted_elements
+    nonempty_segments: np.ndarray  # segments with at least one element
+    weight_totals: np.ndarray  # shape (num_regions,)
+
+    def __init__(self, labels: np.ndarray, weights: np.ndarray, region_ids: list[int] | np.ndarray) -> None:
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), self.labels.shape)
+        self.region_ids = np.asarray(region_ids, dtype=np.int64)
+        num_regions = self.region_ids.shape[0]
+
+        lookup = np.full(max(int(np.max(self.labels, initial=0)), int(np.max(self.region_ids, initial=0))) + 1, -1)
+        lookup[self.region_ids] = np.arange(num_regions)
+        self.segment_of_element = lookup[self.labels]
+
+        selected = np.where(self.segment_of_element >= 0)[0]
+        self.sorted_elements = selected[np.argsort(self.segment_of_element[selected], kind="stable")]
+        counts = np.bincount(self.segment_of_element[selected], minlength=num_regions)
+        self.nonempty_segments = np.where(counts > 0)[0]
+        self.segment_starts = (np.cumsum(counts) - counts)[self.nonempty_segments]
+        self.weight_totals = self._segment_sum(self.weights)
+
+    @property
+    def num_regions(self) -> int:
+        return int(self.region_ids.shape[0])
+
+    def _segment_sum(self, values: np.ndarray) -> np.ndarray:
+        selected = self.sorted_elements
+        return np.bincount(self.segment_of_element[selected], weights=values[selected], minlength=self.num_regions)
+
+    def reduce(self, data: np.ndarray) -> np.ndarray:
+        # returns shape (num_regions, NUM_REGION_STATISTICS), regions without elements have zero total, NaN otherwise
+        if data.shape != self.labels.shape:
+            raise ValueError(f"Expected data of shape {self.labels.shape} but found {data.shape}")
+        data = np.asarray(data, dtype=np.float64)
+        result = np.full((self.num_regions, NUM_REGION_STATISTICS), np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            totals = self._segment_sum(data * self.weights)
+            averages = totals / self.weight_totals
+            deviations = data - averages[np.maximum(self.segment_of_element, 0)]
+            variances = self._segment_sum(deviations * deviations * self.weights) / self.weight_totals
+        result[:, RegionStatistic.TOTAL] = totals
+        result[:, RegionStatistic.AVERAGE] = averages
+        result[:, RegionStatistic.VARIANCE] = variances
+        if self.nonempty_segments.shape[0] > 0:
+            sorted_data = data[self.sorted_elements]
+            result[self.nonempty_segments, RegionStatistic.MIN] = np.minimum.reduceat(sorted_data, self.segment_starts)
+            result[self.nonempty_segments, RegionStatistic.MAX] = np.maximum.reduceat(sorted_data, self.segment_starts)
+        return result
+
+
+class RegionReducer:
+    """
+    per-region statistics (see RegionStatistic) of volume and membrane variables or functions over time
+
+    volume data is reduced per volume region (CartesianMesh.volume_region_map) weighted by volume element
+    volume, membrane data per membrane region (membrane_elements[:, 7]) weighted by membrane element area
+    when MeshMetrics are available (otherwise each membrane element has unit weight).
+    """
+
+    mesh: CartesianMesh
+    mesh_metrics: MeshMetrics | None
+    volume_segments: RegionSegments
+    membrane_segments: RegionSegments | None
+
+    def __init__(self, mesh: CartesianMesh, mesh_metrics: MeshMetrics | None = None) -> None:
+        self.mesh = mesh
+        self.mesh_metrics = mesh_metrics
+        volume_element_volume = float(np.prod(np.array(mesh.extent) / np.array(mesh.size)))
+        self.volume_segments = RegionSegments(
+            labels=mesh.volume_region_map,
+            weights=np.full(mesh.volume_region_map.shape, volume_element_volume),
+            region_ids=[vol_reg_id for vol_reg_id, _subvol_id, _volume, _domain_name in mesh.volume_regions],
+        )
+        self.membrane_segments = None
+        if mesh.membrane_elements.shape[0] > 0:
+            if mesh_metrics is not None:
+                mesh_metrics.check_alignment(mesh)
+            self.membrane_segments = RegionSegments(
+                labels=mesh.membrane_elements[:, 7],
+                weights=mesh_metrics.areas if mesh_metrics is not None else np.ones(mesh.membrane_elements.shape[0]),
+                region_ids=[mem_reg_id for mem_reg_id, _vol_reg1, _vol_reg2, _surface in mesh.membrane_regions],
+            )
+
+    def get_segments(self, variable_type: VariableType) -> RegionSegments:
+        if variable_type == VariableType.VOLUME:
+            return self.volume_segments
+        if variable_type == VariableType.MEMBRANE:
+            if self.membrane_segments is None:
+                raise ValueError("mesh has no membrane elements")
+            return self.membrane_segments
+        raise ValueError(f"region statistics are not supported for variable type {variable_type}")
+
+    def reduce(
+        self,
+        pde_dataset: DataSetBackend,
+        variables: list[VariableInfo | str | NamedFunction],
+        times: list[float] | None = None,
+    ) -> dict[str, np.ndarray]:
+        # one streamed pass over the times, returns {name: array of shape (num_times, num_regions, num_stats)}
+        if times is None:
+            times = pde_dataset.times()
+        block_headers = {bh.var_info.var_name: bh.var_info for bh in pde_dataset.variables_block_headers()}
+        resolved: list[tuple[str, VariableInfo | NamedFunction, RegionSegments]] = []
+        for variable in variables:
+            if isinstance(variable, str):
+                if variable not in block_headers:
+                    raise ValueError(f"Variable {variable} not found in dataset")
+                variable = block_headers[variable]
+            name = variable.name if isinstance(variable, NamedFunction) else variable.var_name
+            resolved.append((name, variable, self.get_segments(variable.variable_type)))
+
+        results = {
+            name: np.zeros((len(times), segments.num_regions, NUM_REGION_STATISTICS))
+            for name, _variable, segments in resolved
+        }
+        for t, time in enumerate(times):
+            for name, variable, segments in resolved:
+                if isinstance(variable, NamedFunction):
+                    bindings = get_function_bindings(pde_dataset, variable, time)
+                    data = np.broadcast_to(variable.evaluate(bindings), segments.labels.shape)
+                else:
+                    data = pde_dataset.get_data(variable, time)
+                results[name][t] = segments.reduce(data)
+        return results
+
+    def reduce_variable(
+        self,
+        pde_dataset: DataSetBackend,
+        variable: VariableInfo | str | NamedFunction,
+        times: list[float] | None = None,
+    ) -> np.ndarray:
+        # returns shape (num_times, num_regions, num_stats)
+        return next(iter(self.reduce(pde_dataset, [variable], times).values()))
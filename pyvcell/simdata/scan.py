@@ -0,0 +1,74 @@
+import dataclasses
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
+
+VCML_NAMESPACE = "{http://sourceforge.net/projects/vcell/vcml}"
+
+
+@dataclasses.dataclass
+class ScanJob:
+    """
+    one job of a parameter scan, the dataset files SimID_<sim_id>_<job_id>_.*
+
+    parameters are the job's math constants with a numeric value (from its simulation task file, empty
+    without one), see get_scan_parameters() for the constants varied by the scan.
+    """
+
+    job_id: int
+    pde_dataset: PdeDataSet
+    data_functions: DataFunctions
+    parameters: dict[str, float]
+
+
+def find_job_ids(sim_data_dir: Path, sim_id: int) -> list[int]:
+    pattern = re.compile(rf"SimID_{sim_id}_(\d+)_\.log")
+    matches = [pattern.fullmatch(path.name) for path in sim_data_dir.iterdir()]
+    return sorted(int(match.group(1)) for match in matches if match is not None)
+
+
+def read_math_constants(simtask_file: Path) -> dict[str, float]:
+    # numeric <Constant> values of the simulation task's math description (expressions are skipped)
+    # the task file is written by the VCell solver next to the dataset
+    root = ET.parse(simtask_file).getroot()  # noqa: S314
+    constants = {}
+    for constant in root.iter(f"{VCML_NAMESPACE}Constant"):
+        try:
+            constants[constant.attrib["Name"]] = float(constant.text or "")
+        except ValueError:
+            continue
+    return constants
+
+
+def read_scan_jobs(sim_data_dir: Path, sim_id: int, job_ids: list[int] | None = None) -> list[ScanJob]:
+    # reads the datasets of the jobs (default: all jobs found in sim_data_dir)
+    if job_ids is None:
+        job_ids = find_job_ids(sim_data_dir, sim_id)
+    if len(job_ids) == 0:
+        raise ValueError(f"no jobs of simulation {sim_id} found in {sim_data_dir}")
+    jobs = []
+    for job_id in job_ids:
+        pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename=f"SimID_{sim_id}_{job_id}_.log")
+        pde_dataset.read()
+        data_functions = DataFunctions(function_file=sim_data_dir / f"SimID_{sim_id}_{job_id}_.functions")
+        data_functions.read()
+        simtask_file = sim_data_dir / f"SimID_{sim_id}_{job_id}__0.simtask.xml"
+        parameters = read_math_constants(simtask_file) if simtask_file.exists() else {}
+        jobs.append(ScanJob(job_id, pde_dataset, data_functions, parameters))
+    return jobs
+
+
+def get_scan_parameters(jobs: list[ScanJob]) -> dict[str, list[float]]:
+    # values per job of the constants which differ between jobs, NaN for jobs without the constant
+    names = sorted({name for job in jobs for name in job.parameters})
+    scan_parameters = {}
+    for name in names:
+        values = [job.parameters.get(name, float("nan")) for job in jobs]
+        # NaN values compare equal, a constant that is NaN in every job is not varied
+        if np.unique(values).shape[0] > 1:
+            scan_parameters[name] = values
+    return scan_parameters
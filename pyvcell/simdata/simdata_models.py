@@ -2,7 +2,7 @@ import ast
 import dataclasses
 from enum import Enum
 from pathlib import Path
-from typing import IO, Literal, Optional
+from typing import IO, Literal, Optional, Protocol
 from zipfile import ZipFile
 
 import numexpr as ne  # type: ignore[import-untyped]
@@ -156,6 +156,27 @@ class DataZipFileMetadata:
         raise ValueError(f"Variable {variable} not found in zip entry {self.zip_entry}")
 
 
+class DataSetBackend(Protocol):
+    """
+    read access to simulation data, independent of the storage format
+
+    implemented by PdeDataSet (VCell zip files) and ZarrDataSet (exported zarr stores). Data is returned
+    as flat float64 arrays of one value per volume (or membrane) element, as stored by the solver.
+    get_compact_data() returns only the values at the given element indices, e.g. the indices of a volume domain
+    (see CartesianMesh.get_volume_domain_indices()).
+    """
+
+    def times(self) -> list[float]: ...
+
+    def variables_block_headers(self) -> list[DataBlockHeader]: ...
+
+    def get_data(self, variable: VariableInfo | str, time: float) -> numpy.ndarray: ...
+
+    def get_data_blocks(self, variables: list[VariableInfo | str], time: float) -> list[numpy.ndarray]: ...
+
+    def get_compact_data(self, variable: VariableInfo | str, time: float, indices: numpy.ndarray) -> numpy.ndarray: ...
+
+
 class PdeDataSet:
     base_dir: Path
     log_filename: str
@@ -232,6 +253,31 @@ class PdeDataSet:
             array = np.frombuffer(buffer, dtype=NUMPY_FLOAT_DTYPE)
             return array
 
+    def get_data_blocks(self, variables: list[VariableInfo | str], time: float) -> list[numpy.ndarray]:
+        # reads several variables from one zip entry in a single forward pass (one decompression)
+        zip_file_entry: DataZipFileMetadata = self._get_data_zip_file_metadata(time)
+        data_block_headers = [zip_file_entry.get_data_block_header(variable) for variable in variables]
+        arrays: dict[int, numpy.ndarray] = {}
+
+        with ZipFile(zip_file_entry.zip_file, "r") as zip_file, zip_file.open(zip_file_entry.zip_entry, mode="r") as f:
+            for data_block_header in sorted(data_block_headers, key=lambda bh: bh.data_offset):
+                if data_block_header.data_offset in arrays:
+                    continue
+                f.seek(data_block_header.data_offset)
+                buffer = bytearray(0)
+                bytes_left_to_read = data_block_header.size * 8
+                while bytes_left_to_read > 0:
+                    bytes_read = f.read(bytes_left_to_read)
+                    buffer.extend(bytes_read)
+                    bytes_left_to_read -= len(bytes_read)
+                arrays[data_block_header.data_offset] = np.frombuffer(buffer, dtype=NUMPY_FLOAT_DTYPE)
+        return [arrays[data_block_header.data_offset] for data_block_header in data_block_headers]
+
+    def get_compact_data(self, variable: VariableInfo | str, time: float, indices: numpy.ndarray) -> numpy.ndarray:
+        # values at the element indices, e.g. of a volume domain (see CartesianMesh.get_volume_domain_indices())
+        compact_data: numpy.ndarray = self.get_data(variable, time)[indices]
+        return compact_data
+
 
 class NamedFunction:
     name: str
@@ -290,3 +336,21 @@ class DataFunctions:
                 _boolean_skipped = parts[4]
                 function = NamedFunction(name=name, vcell_expression=expression, variable_type=variable_type)
                 self.named_functions.append(function)
+
+
+def get_function_bindings(pde_dataset: DataSetBackend, function: NamedFunction, time: float) -> dict[str, np.ndarray]:
+    # functions refer to variables by short name (e.g. "C_cyt") while data blocks are named "cytosol::C_cyt",
+    # a variable in the function's own domain is preferred over variables of the same name in other domains
+    block_headers = pde_dataset.variables_block_headers()
+    function_domain_name = function.name.split("::")[0]
+    bindings: dict[str, np.ndarray] = {}
+    for var_name in function.variables:
+        matches = [bh for bh in block_headers if bh.var_info.var_name.split("::")[-1] == var_name and bh.size > 0]
+        if len(matches) == 0:
+            raise ValueError(f"Variable {var_name} referenced by function {function.name} not found in dataset")
+        if len(matches) > 1:
+            matches = [bh for bh in matches if bh.var_info.var_name.split("::")[0] == function_domain_name]
+            if len(matches) != 1:
+                raise ValueError(f"Variable {var_name} referenced by function {function.name} is ambiguous")
+        bindings[var_name] = pde_dataset.get_data(matches[0].var_info, time)
+    return bindings
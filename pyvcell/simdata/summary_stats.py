@@ -0,0 +1,184 @@
+import dataclasses
+
+import numpy as np
+
+from pyvcell.simdata.region_stats import RegionSegments
+
+# order of the last axis of SummaryStatistics.to_array()
+SUMMARY_STATISTICS = ["min", "max", "mean", "count", "nan_count", "sum", "sum_sq"]
+
+# elements per block of the fused kernel, a block (512 KiB of float64) stays in cache for all reductions
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+@dataclasses.dataclass
+class SummaryStatistics:
+    """
+    mergeable summary of a set of values (NaNs are counted, not reduced)
+
+    fields are arrays of a common shape: () for a single summary or (num_regions,) per region. Summaries of
+    different timepoints, frames or workers combine with merge() (in any order), mean and variance are
+    derived from count, sum and sum_sq.
+    """
+
+    count: np.ndarray  # number of non-NaN values
+    nan_count: np.ndarray
+    min: np.ndarray  # inf without values
+    max: np.ndarray  # -inf without values
+    sum: np.ndarray
+    sum_sq: np.ndarray
+
+    @staticmethod
+    def empty(shape: tuple[int, ...] = ()) -> "SummaryStatistics":
+        return SummaryStatistics(
+            count=np.zeros(shape, dtype=np.int64),
+            nan_count=np.zeros(shape, dtype=np.int64),
+            min=np.full(shape, np.inf),
+            max=np.full(shape, -np.inf),
+            sum=np.zeros(shape),
+            sum_sq=np.zeros(shape),
+        )
+
+    def merge(self, other: "SummaryStatistics") -> "SummaryStatistics":
+        return SummaryStatistics(
+            count=self.count + other.count,
+            nan_count=self.nan_count + other.nan_count,
+            min=np.minimum(self.min, other.min),
+            max=np.maximum(self.max, other.max),
+            sum=self.sum + other.sum,
+            sum_sq=self.sum_sq + other.sum_sq,
+        )
+
+    def combine(self, axis: int = 0) -> "SummaryStatistics":
+        # merges the summaries along an axis (e.g. over timepoints)
+        return SummaryStatistics(
+            count=self.count.sum(axis=axis),
+            nan_count=self.nan_count.sum(axis=axis),
+            min=self.min.min(axis=axis, initial=np.inf),
+            max=self.max.max(axis=axis, initial=-np.inf),
+            sum=self.sum.sum(axis=axis),
+            sum_sq=self.sum_sq.sum(axis=axis),
+        )
+
+    def get(self, index: int | tuple[int, ...]) -> "SummaryStatistics":
+        # a single summary, e.g. of one region
+        return SummaryStatistics(
+            count=self.count[index],
+            nan_count=self.nan_count[index],
+            min=self.min[index],
+            max=self.max[index],
+            sum=self.sum[index],
+            sum_sq=self.sum_sq[index],
+        )
+
+    @property
+    def mean(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean: np.ndarray = np.where(self.count > 0, self.sum / self.count, np.nan)
+        return mean
+
+    @property
+    def variance(self) -> np.ndarray:
+        # population variance, clipped at zero against cancellation
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance: np.ndarray = np.maximum(self.sum_sq / self.count - self.mean * self.mean, 0.0)
+        return np.where(self.count > 0, variance, np.nan)
+
+    def to_array(self) -> np.ndarray:
+        # shape (*shape, len(SUMMARY_STATISTICS)), min/max/mean are NaN without values
+        has_values = self.count > 0
+        return np.stack(
+            [
+                np.where(has_values, self.min, np.nan),
+                np.where(has_values, self.max, np.nan),
+                self.mean,
+                self.count.astype(np.float64),
+                self.nan_count.astype(np.float64),
+                self.sum,
+                self.sum_sq,
+            ],
+            axis=-1,
+        )
+
+    @staticmethod
+    def from_array(array: np.ndarray) -> "SummaryStatistics":
+        # inverse of to_array(), rows never written (all NaN) are empty summaries
+        array = np.asarray(array, dtype=np.float64)
+        count = np.nan_to_num(array[..., SUMMARY_STATISTICS.index("count")]).astype(np.int64)
+        has_values = count > 0
+        return SummaryStatistics(
+            count=count,
+            nan_count=np.nan_to_num(array[..., SUMMARY_STATISTICS.index("nan_count")]).astype(np.int64),
+            min=np.where(has_values, array[..., SUMMARY_STATISTICS.index("min")], np.inf),
+            max=np.where(has_values, array[..., SUMMARY_STATISTICS.index("max")], -np.inf),
+            sum=np.where(has_values, array[..., SUMMARY_STATISTICS.index("sum")], 0.0),
+            sum_sq=np.where(has_values, array[..., SUMMARY_STATISTICS.index("sum_sq")], 0.0),
+        )
+
+    def to_metadata(self) -> dict:
+        # json friendly summary (single summaries only), None where undefined
+        values = self.to_array().tolist()
+        metadata = {name: (None if value != value else value) for name, value in zip(SUMMARY_STATISTICS, values)}
+        metadata["variance"] = None if self.count == 0 else float(self.variance)
+        metadata["count"] = int(self.count)
+        metadata["nan_count"] = int(self.nan_count)
+        return metadata
+
+
+def compute_statistics(data: np.ndarray, block_size: int = DEFAULT_BLOCK_SIZE) -> SummaryStatistics:
+    """
+    min, max, sum, sum of squares and NaN count of data in a single pass over memory
+
+    data is processed in blocks of block_size elements, all reductions of a block run while it is in cache.
+    """
+    values = np.ascontiguousarray(data, dtype=np.float64).ravel()
+    summary = SummaryStatistics.empty()
+    count = nan_count = 0
+    minimum, maximum, total, total_sq = np.inf, -np.inf, 0.0, 0.0
+    for start in range(0, values.shape[0], block_size):
+        block = values[start : start + block_size]
+        block_min = block.min()
+        if block_min != block_min:
+            # NaN present (any NaN propagates to min)
+            nan_mask = np.isnan(block)
+            nan_count += int(np.count_nonzero(nan_mask))
+            block = block[~nan_mask]
+            if block.shape[0] == 0:
+                continue
+            block_min = block.min()
+        count += block.shape[0]
+        minimum = min(minimum, float(block_min))
+        maximum = max(maximum, float(block.max()))
+        total += float(block.sum())
+        total_sq += float(np.dot(block, block))
+    summary.count[...] = count
+    summary.nan_count[...] = nan_count
+    summary.min[...] = minimum
+    summary.max[...] = maximum
+    summary.sum[...] = total
+    summary.sum_sq[...] = total_sq
+    return summary
+
+
+def compute_region_statistics(data: np.ndarray, segments: RegionSegments) -> SummaryStatistics:
+    # per region summaries (shape (num_regions,)) of the elements grouped by segments (weights are ignored)
+    values = np.asarray(data, dtype=np.float64).ravel()
+    if values.shape != segments.labels.shape:
+        raise ValueError(f"Expected data of shape {segments.labels.shape} but found {values.shape}")
+    num_regions = segments.num_regions
+    summary = SummaryStatistics.empty((num_regions,))
+    sorted_values = values[segments.sorted_elements]
+    sorted_segments = segments.segment_of_element[segments.sorted_elements]
+    nan_mask = np.isnan(sorted_values)
+    finite_values = np.where(nan_mask, 0.0, sorted_values)
+    summary.nan_count = np.bincount(sorted_segments, weights=nan_mask, minlength=num_regions).astype(np.int64)
+    summary.count = np.bincount(sorted_segments, minlength=num_regions) - summary.nan_count
+    summary.sum = np.bincount(sorted_segments, weights=finite_values, minlength=num_regions)
+    summary.sum_sq = np.bincount(sorted_segments, weights=finite_values * finite_values, minlength=num_regions)
+    if segments.nonempty_segments.shape[0] > 0:
+        # fmin/fmax ignore NaN (all NaN segments stay NaN and are reset below)
+        summary.min[segments.nonempty_segments] = np.fmin.reduceat(sorted_values, segments.segment_starts)
+        summary.max[segments.nonempty_segments] = np.fmax.reduceat(sorted_values, segments.segment_starts)
+    summary.min = np.where(summary.count > 0, summary.min, np.inf)
+    summary.max = np.where(summary.count > 0, summary.max, -np.inf)
+    return summary
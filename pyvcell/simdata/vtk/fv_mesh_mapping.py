@@ -1,8 +1,10 @@
+import numpy as np
+
 from pyvcell.simdata.mesh import CartesianMesh
-from pyvcell.simdata.vtk.vismesh import FiniteVolumeIndex, Vect3D, VisMesh, VisPoint, VisPolygon, VisVoxel
+from pyvcell.simdata.vtk.vismesh import ArrayVisMesh, Vect3D, VisCellType
 
 
-def from_mesh_data(cartesian_mesh: CartesianMesh, domain_name: str, b_volume: bool) -> VisMesh:
+def from_mesh_data(cartesian_mesh: CartesianMesh, domain_name: str, b_volume: bool) -> ArrayVisMesh:
     dimension = cartesian_mesh.dimension
     if dimension == 2 and b_volume:
         return from_mesh2d_volume(cartesian_mesh, domain_name)
@@ -17,206 +19,149 @@ def from_mesh_data(cartesian_mesh: CartesianMesh, domain_name: str, b_volume: bo
         raise ValueError(f"unsupported: mesh dimension = {dimension}, volumeDomain = {b_volume}")
 
 
-def to_string_key(vis_point: VisPoint, precision: int = 8) -> str:
-    format_string = f"%.{precision}f"
-    return f"({format_string % vis_point.x},{format_string % vis_point.y},{format_string % vis_point.z})"
+def from_mesh2d_volume(_cartesian_mesh: CartesianMesh, _domain_name: str) -> ArrayVisMesh:
+    raise NotImplementedError("The implementation of this method is omitted for brevity.")
 
 
-def from_mesh2d_volume(_cartesian_mesh: CartesianMesh, _domain_name: str) -> VisMesh:
+def from_mesh2d_membrane(_cartesian_mesh: CartesianMesh, _domain_name: str) -> ArrayVisMesh:
     raise NotImplementedError("The implementation of this method is omitted for brevity.")
 
 
-def from_mesh2d_membrane(_cartesian_mesh: CartesianMesh, _domain_name: str) -> VisMesh:
-    raise NotImplementedError("The implementation of this method is omitted for brevity.")
+# quad corner lattice offsets from the inside volume element per face direction, in the order of the
+# inside/outside tests below (x-, x+, y-, y+, z-, z+), wound as seen from the outside
+MEMBRANE_QUAD_OFFSETS = np.array([
+    [[0, 0, 0], [0, 0, 1], [0, 1, 1], [0, 1, 0]],  # x-   z cross y
+    [[1, 0, 0], [1, 1, 0], [1, 1, 1], [1, 0, 1]],  # x+   y cross z
+    [[0, 0, 0], [1, 0, 0], [1, 0, 1], [0, 0, 1]],  # y-   x cross z
+    [[0, 1, 0], [0, 1, 1], [1, 1, 1], [1, 1, 0]],  # y+   z cross x
+    [[0, 0, 0], [0, 1, 0], [1, 1, 0], [1, 0, 0]],  # z-   y cross x
+    [[0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]],  # z+   x cross y
+])
 
 
-def from_mesh3d_membrane(cartesian_mesh: CartesianMesh, membrane_region_ids: set[int]) -> VisMesh:
+def from_mesh3d_membrane(cartesian_mesh: CartesianMesh, membrane_region_ids: set[int]) -> ArrayVisMesh:
     dimension = 3
     origin = Vect3D(cartesian_mesh.origin[0], cartesian_mesh.origin[1], cartesian_mesh.origin[2])
     extent = Vect3D(cartesian_mesh.extent[0], cartesian_mesh.extent[1], cartesian_mesh.extent[2])
-    vis_mesh = VisMesh(dimension, origin, extent)
-    vis_mesh.points = []
-    vis_mesh.polygons = []
-    curr_point_index = 0
-    point_dict = {}
 
     # extract those membrane_elements where the mem_reg_id is in membrane_region_ids
-    selected_mem_elements = [
-        element for element in cartesian_mesh.membrane_elements if element[7] in membrane_region_ids
-    ]
-
-    for membrane_element in selected_mem_elements:
-        inside_volume_index = membrane_element[1]
-        outside_volume_index = membrane_element[2]
-        inside_i = inside_volume_index % cartesian_mesh.size[0]
-        inside_j = (inside_volume_index % (cartesian_mesh.size[0] * cartesian_mesh.size[1])) // cartesian_mesh.size[0]
-        inside_k = inside_volume_index // (cartesian_mesh.size[0] * cartesian_mesh.size[1])
-        inside_box = cartesian_mesh.get_volume_element_box(inside_i, inside_j, inside_k)
-        outside_i = outside_volume_index % cartesian_mesh.size[0]
-        outside_j = (outside_volume_index % (cartesian_mesh.size[0] * cartesian_mesh.size[1])) // cartesian_mesh.size[0]
-        outside_k = outside_volume_index // (cartesian_mesh.size[0] * cartesian_mesh.size[1])
-
-        vis_points: list[VisPoint]
-        if inside_i == outside_i + 1:
-            #  x-   z cross y
-            x = inside_box.x_lo
-            vis_points = [
-                VisPoint(x, inside_box.y_lo, inside_box.z_lo),
-                VisPoint(x, inside_box.y_lo, inside_box.z_hi),
-                VisPoint(x, inside_box.y_hi, inside_box.z_hi),
-                VisPoint(x, inside_box.y_hi, inside_box.z_lo),
-            ]
-        elif outside_i == inside_i + 1:
-            # x+   y cross z
-            x = inside_box.x_hi
-            vis_points = [
-                VisPoint(x, inside_box.y_lo, inside_box.z_lo),
-                VisPoint(x, inside_box.y_hi, inside_box.z_lo),
-                VisPoint(x, inside_box.y_hi, inside_box.z_hi),
-                VisPoint(x, inside_box.y_lo, inside_box.z_hi),
-            ]
-        elif inside_j == outside_j + 1:
-            # y-   x cross z
-            y = inside_box.y_lo
-            vis_points = [
-                VisPoint(inside_box.x_lo, y, inside_box.z_lo),
-                VisPoint(inside_box.x_hi, y, inside_box.z_lo),
-                VisPoint(inside_box.x_hi, y, inside_box.z_hi),
-                VisPoint(inside_box.x_lo, y, inside_box.z_hi),
-            ]
-        elif outside_j == inside_j + 1:
-            # y+   z cross x
-            y = inside_box.y_hi
-            vis_points = [
-                VisPoint(inside_box.x_lo, y, inside_box.z_lo),
-                VisPoint(inside_box.x_lo, y, inside_box.z_hi),
-                VisPoint(inside_box.x_hi, y, inside_box.z_hi),
-                VisPoint(inside_box.x_hi, y, inside_box.z_lo),
-            ]
-        elif inside_k == outside_k + 1:
-            # z-   y cross x
-            z = inside_box.z_lo
-            vis_points = [
-                VisPoint(inside_box.x_lo, inside_box.y_lo, z),
-                VisPoint(inside_box.x_lo, inside_box.y_hi, z),
-                VisPoint(inside_box.x_hi, inside_box.y_hi, z),
-                VisPoint(inside_box.x_hi, inside_box.y_lo, z),
-            ]
-        elif outside_k == inside_k + 1:
-            # z+   x cross y
-            z = inside_box.z_hi
-            vis_points = [
-                VisPoint(inside_box.x_lo, inside_box.y_lo, z),
-                VisPoint(inside_box.x_hi, inside_box.y_lo, z),
-                VisPoint(inside_box.x_hi, inside_box.y_hi, z),
-                VisPoint(inside_box.x_lo, inside_box.y_hi, z),
-            ]
-        else:
-            raise ValueError("inside/outside volume indices not reconciled in membraneElement")
-
-        indices = []
-        for vis_point in vis_points:
-            key = to_string_key(vis_point)
-            if key not in point_dict:
-                point_dict[key] = curr_point_index
-                vis_mesh.points.append(vis_point)
-                curr_point_index += 1
-            indices.append(point_dict[key])
-
-        vis_quad = VisPolygon(indices)
-        vis_quad.finiteVolumeIndex = FiniteVolumeIndex(
-            membrane_element[0], cartesian_mesh.get_membrane_region_index(membrane_element[0])
-        )
-        vis_mesh.polygons.append(vis_quad)
-
-    return vis_mesh
-
-
-def from_mesh3d_volume(cartesian_mesh: CartesianMesh, domain_name: str) -> VisMesh:
-    size = cartesian_mesh.size
-    num_x = size[0]
-    num_y = size[1]
-    num_z = size[2]
+    membrane_elements = cartesian_mesh.membrane_elements
+    selected_mem_elements = membrane_elements[np.isin(membrane_elements[:, 7], list(membrane_region_ids))]
+
+    inside_ijk = _get_ijk(cartesian_mesh, selected_mem_elements[:, 1])
+    outside_ijk = _get_ijk(cartesian_mesh, selected_mem_elements[:, 2])
+    # face direction of each element, the first matching test: x-, x+, y-, y+, z-, z+
+    direction_tests = np.stack(
+        [
+            inside_ijk[:, 0] == outside_ijk[:, 0] + 1,
+            outside_ijk[:, 0] == inside_ijk[:, 0] + 1,
+            inside_ijk[:, 1] == outside_ijk[:, 1] + 1,
+            outside_ijk[:, 1] == inside_ijk[:, 1] + 1,
+            inside_ijk[:, 2] == outside_ijk[:, 2] + 1,
+            outside_ijk[:, 2] == inside_ijk[:, 2] + 1,
+        ],
+        axis=1,
+    )
+    if not np.all(direction_tests.any(axis=1)):
+        raise ValueError("inside/outside volume indices not reconciled in membraneElement")
+    directions = np.argmax(direction_tests, axis=1)
+
+    corners = inside_ijk[:, np.newaxis, :] + MEMBRANE_QUAD_OFFSETS[directions]
+    points, point_indices = _weld_lattice_points(cartesian_mesh, corners)
+
+    return ArrayVisMesh.from_cells(
+        dimension,
+        origin,
+        extent,
+        points,
+        point_indices,
+        VisCellType.QUAD,
+        global_index=selected_mem_elements[:, 0],
+        region_index=selected_mem_elements[:, 7],
+    )
+
+
+def from_mesh3d_volume(cartesian_mesh: CartesianMesh, domain_name: str) -> ArrayVisMesh:
     dimension = 3
 
     origin: Vect3D = Vect3D(x=cartesian_mesh.origin[0], y=cartesian_mesh.origin[1], z=cartesian_mesh.origin[2])
     extent: Vect3D = Vect3D(x=cartesian_mesh.extent[0], y=cartesian_mesh.extent[1], z=cartesian_mesh.extent[2])
-    vis_mesh = VisMesh(dimension, origin, extent)  # invoke VisMesh() constructor
-    vis_mesh.points = []
-    vis_mesh.visVoxels = []
 
     volume_region_ids = cartesian_mesh.get_volume_region_ids(domain_name)
 
-    curr_point_index: int = 0
-    point_dict: dict[str, int] = {}
-
-    volume_index = 0
-    for k in range(num_z):
-        for j in range(num_y):
-            for i in range(num_x):
-                region_index: int = cartesian_mesh.volume_region_map[volume_index].item()
-                if region_index in volume_region_ids:
-                    element = cartesian_mesh.get_volume_element_box(i, j, k)
-                    min_x = element.x_lo
-                    max_x = element.x_hi
-                    min_y = element.y_lo
-                    max_y = element.y_hi
-                    min_z = element.z_lo
-                    max_z = element.z_hi
-
-                    """
-                    points for a VisPolyhedra ... initially a hex ... then may be clipped
-
-                           p6-------------------p7
-                          /|                   /|
-                         / |                  / |
-                       p4-------------------p5  |
-                        |  |                 |  |
-                        |  |                 |  |
-                        |  |                 |  |         z   y
-                        |  p2................|..p3        |  /
-                        | /                  | /          | /
-                        |/                   |/           |/
-                       p0-------------------p1            O----- x
-
-                      p0 = (X-,Y-,Z-)
-                      p1 = (X+,Y-,Z-)
-                      p2 = (X-,Y+,Z-)
-                      p3 = (X+,Y+,Z-)
-                      p4 = (X-,Y-,Z+)
-                      p5 = (X+,Y-,Z+)
-                      p6 = (X-,Y+,Z+)
-                      p7 = (X+,Y+,Z+)
-                    """
-
-                    # points for a VisVoxel
-                    vis_points = [
-                        [min_x, min_y, min_z],  # p0
-                        [max_x, min_y, min_z],  # p1
-                        [min_x, max_y, min_z],  # p2
-                        [max_x, max_y, min_z],  # p3
-                        [min_x, min_y, max_z],  # p4
-                        [max_x, min_y, max_z],  # p5
-                        [min_x, max_y, max_z],  # p6
-                        [max_x, max_y, max_z],  # p7
-                    ]
-
-                    indices: list[int] = [-1] * 8
-                    for v in range(8):
-                        vis_point = VisPoint(vis_points[v][0], vis_points[v][1], vis_points[v][2])
-                        # Assuming the __str__ method of VisPoint returns a string representation of the point
-                        key = str(vis_point)
-                        p = point_dict.get(key)
-                        if p is None:
-                            point_dict[key] = curr_point_index
-                            p = curr_point_index
-                            vis_mesh.points.append(vis_point)
-                            curr_point_index += 1
-                        indices[v] = p
-
-                    vis_voxel = VisVoxel(indices)
-                    vis_voxel.finiteVolumeIndex = FiniteVolumeIndex(volume_index, region_index)
-                    vis_mesh.visVoxels.append(vis_voxel)
-                volume_index += 1
-
-    return vis_mesh
+    # volume elements of the domain in global index order (x fastest)
+    volume_region_map = cartesian_mesh.volume_region_map
+    volume_indices = np.flatnonzero(np.isin(volume_region_map, list(volume_region_ids)))
+    ijk = _get_ijk(cartesian_mesh, volume_indices)
+
+    """
+    points for a VisPolyhedra ... initially a hex ... then may be clipped
+
+           p6-------------------p7
+          /|                   /|
+         / |                  / |
+       p4-------------------p5  |
+        |  |                 |  |
+        |  |                 |  |
+        |  |                 |  |         z   y
+        |  p2................|..p3        |  /
+        | /                  | /          | /
+        |/                   |/           |/
+       p0-------------------p1            O----- x
+
+      p0 = (X-,Y-,Z-)
+      p1 = (X+,Y-,Z-)
+      p2 = (X-,Y+,Z-)
+      p3 = (X+,Y+,Z-)
+      p4 = (X-,Y-,Z+)
+      p5 = (X+,Y-,Z+)
+      p6 = (X-,Y+,Z+)
+      p7 = (X+,Y+,Z+)
+    """
+    corner_offsets = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0], [0, 0, 1], [1, 0, 1], [0, 1, 1], [1, 1, 1]])
+    # (voxels, 8, 3) integer lattice coordinates of the corners
+    corners = ijk[:, np.newaxis, :] + corner_offsets
+    points, point_indices = _weld_lattice_points(cartesian_mesh, corners)
+
+    return ArrayVisMesh.from_cells(
+        dimension,
+        origin,
+        extent,
+        points,
+        point_indices,
+        VisCellType.VOXEL,
+        global_index=volume_indices,
+        region_index=volume_region_map[volume_indices],
+    )
+
+
+def _get_ijk(cartesian_mesh: CartesianMesh, volume_indices: np.ndarray) -> np.ndarray:
+    # (n, 3) element coordinates (i, j, k) of global volume indices
+    num_x, num_y, _num_z = cartesian_mesh.size
+    volume_indices = np.asarray(volume_indices, dtype=np.int64)
+    return np.stack(
+        [volume_indices % num_x, (volume_indices // num_x) % num_y, volume_indices // (num_x * num_y)], axis=1
+    )
+
+
+def _weld_lattice_points(cartesian_mesh: CartesianMesh, corners: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # (points, 3) coordinates of the (cells, corners, 3) integer lattice coordinates, shared corners welded
+    # into one point numbered in order of first appearance (as when visiting the cells in order), and the
+    # (cells, corners) point indices
+    num_x, num_y, num_z = cartesian_mesh.size
+    lattice_keys = (corners[..., 2] * (num_y + 1) + corners[..., 1]) * (num_x + 1) + corners[..., 0]
+    unique_keys, first_index, inverse = np.unique(lattice_keys.ravel(), return_index=True, return_inverse=True)
+    order = np.argsort(first_index)
+    point_number = np.empty_like(order)
+    point_number[order] = np.arange(order.shape[0])
+    point_indices = point_number[inverse.ravel()].reshape(corners.shape[:2])
+
+    point_keys = unique_keys[order]
+    point_i = point_keys % (num_x + 1)
+    point_j = (point_keys // (num_x + 1)) % (num_y + 1)
+    point_k = point_keys // ((num_x + 1) * (num_y + 1))
+    # same arithmetic as CartesianMesh.get_volume_element_box()
+    point_x = cartesian_mesh.origin[0] + point_i * cartesian_mesh.extent[0] / num_x
+    point_y = cartesian_mesh.origin[1] + point_j * cartesian_mesh.extent[1] / num_y
+    point_z = cartesian_mesh.origin[2] + point_k * cartesian_mesh.extent[2] / num_z
+    return np.stack([point_x, point_y, point_z], axis=1), point_indices
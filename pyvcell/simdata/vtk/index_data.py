@@ -0,0 +1,83 @@
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import orjson
+
+from pyvcell.simdata.vtk.vismesh import ColumnarIndexData
+
+
+class IndexFormat(Enum):
+    # json: the index data dataclasses as JSON, one object per cell
+    JSON = "json"
+    # columnar: a JSON header and a raw little-endian .bin file of column arrays (see write_columnar_index_data())
+    COLUMNAR = "columnar"
+
+
+# stored dtype of the columns by the kind of the column values
+COLUMN_DTYPES = {"i": "<i8", "u": "<i8", "b": "<i8", "f": "<f8"}
+COLUMN_ALIGNMENT = 8
+
+
+def write_columnar_index_data(index_file: Path, index_data: ColumnarIndexData) -> None:
+    """
+    writes index_data as a JSON header (index_file) and the column data (index_file with suffix .bin)
+
+    header: {"domainName", "timeIndex" (if set), "numRows" (by index list), "binFile" (name relative to index_file),
+             "columns": [{"name", "dtype", "offset", "length"}]}
+    each column is stored as int64 ("<i8") or float64 ("<f8") at a byte offset aligned to 8 bytes. The columns
+    "<list>/<field>" of one index list must have the same length.
+    """
+    bin_file = index_file.with_suffix(".bin")
+    num_rows: dict[str, int] = {}
+    for name, column in index_data.columns.items():
+        list_name = name.split("/")[0]
+        if num_rows.setdefault(list_name, int(column.shape[0])) != column.shape[0]:
+            raise ValueError(f"columns of {list_name} in {index_data.domainName} differ in length")
+    column_headers = []
+    offset = 0
+    with bin_file.open("wb") as bf:
+        for name, column in index_data.columns.items():
+            dtype = COLUMN_DTYPES.get(column.dtype.kind)
+            if dtype is None:
+                raise TypeError(f"unsupported dtype {column.dtype} of index column {name}")
+            data = np.ascontiguousarray(column, dtype=dtype).tobytes()
+            column_headers.append({"name": name, "dtype": dtype, "offset": offset, "length": int(column.shape[0])})
+            padding = -len(data) % COLUMN_ALIGNMENT
+            bf.write(data + bytes(padding))
+            offset += len(data) + padding
+    header: dict[str, Any] = {"domainName": index_data.domainName}
+    if index_data.timeIndex is not None:
+        header["timeIndex"] = index_data.timeIndex
+    header["numRows"] = num_rows
+    header["binFile"] = bin_file.name
+    header["columns"] = column_headers
+    with index_file.open("wb") as ff:
+        ff.write(orjson.dumps(header))
+
+
+def read_index_data(index_file: Path) -> ColumnarIndexData:
+    # reads columnar index data, or JSON index data (lists of index objects) into columns
+    header = orjson.loads(index_file.read_bytes())
+    if "columns" not in header:
+        return _json_to_columns(header)
+    buffer = (index_file.parent / header["binFile"]).read_bytes()
+    columns = {
+        column["name"]: np.frombuffer(buffer, dtype=column["dtype"], count=column["length"], offset=column["offset"])
+        for column in header["columns"]
+    }
+    return ColumnarIndexData(domainName=header["domainName"], columns=columns, timeIndex=header.get("timeIndex"))
+
+
+def _json_to_columns(index_json: dict) -> ColumnarIndexData:
+    # one column per field of the index objects of each list
+    columns: dict[str, np.ndarray] = {}
+    for list_name, indices in index_json.items():
+        if not isinstance(indices, list) or len(indices) == 0:
+            continue
+        for field in indices[0]:
+            columns[f"{list_name}/{field}"] = np.array([index[field] for index in indices])
+    return ColumnarIndexData(
+        domainName=index_json["domainName"], columns=columns, timeIndex=index_json.get("timeIndex")
+    )
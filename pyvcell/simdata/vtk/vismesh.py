@@ -1,6 +1,9 @@
 from dataclasses import dataclass
+from enum import IntEnum
 from typing import Optional
 
+import numpy as np
+
 
 @dataclass
 class Vect3D:
@@ -117,6 +120,14 @@ class MovingBoundaryIndexData:
     movingBoundaryVolumeIndices: Optional[list[MovingBoundaryVolumeIndex]] = None
 
 
+@dataclass
+class ColumnarIndexData:
+    # index data as columns "<index list>/<field>" (e.g. "finiteVolumeIndices/globalIndex"), one row per cell
+    domainName: str
+    columns: dict[str, np.ndarray]
+    timeIndex: Optional[int] = None
+
+
 @dataclass
 class VisMesh:
     dimension: int
@@ -132,6 +143,138 @@ class VisMesh:
     surfacePoints: Optional[list[VisPoint]] = None
 
 
+class VisCellType(IntEnum):
+    # cell types of ArrayVisMesh, numbered as the VTK cell types
+    LINE = 3
+    TRIANGLE = 5
+    POLYGON = 7
+    QUAD = 9
+    TETRA = 10
+    VOXEL = 11
+
+
+@dataclass
+class ArrayVisMesh:
+    """
+    struct of arrays form of a VisMesh: point coordinates, the point indices of all cells concatenated
+    (connectivity, cell c is connectivity[offsets[c]:offsets[c + 1]]), a cell type per cell and the finite
+    volume index columns (-1 for cells without a finite volume index)
+
+    holds polygons, voxels and tetrahedra with their finite volume indices, see from_vis_mesh() and
+    to_vis_mesh() to convert from and to the VisMesh dataclasses.
+    """
+
+    dimension: int
+    origin: Vect3D
+    extent: Vect3D
+    points: np.ndarray  # (num_points, 3) float64 x, y, z
+    connectivity: np.ndarray  # (sum of cell sizes,) int64 point indices
+    offsets: np.ndarray  # (num_cells + 1,) int64
+    cell_types: np.ndarray  # (num_cells,) uint8 VisCellType
+    global_index: np.ndarray  # (num_cells,) int64 FiniteVolumeIndex.globalIndex
+    region_index: np.ndarray  # (num_cells,) int64 FiniteVolumeIndex.regionIndex
+
+    @property
+    def num_cells(self) -> int:
+        return int(self.cell_types.shape[0])
+
+    def get_cell_point_indices(self) -> list[np.ndarray]:
+        return np.split(self.connectivity, self.offsets[1:-1])
+
+    @staticmethod
+    def from_cells(
+        dimension: int,
+        origin: Vect3D,
+        extent: Vect3D,
+        points: np.ndarray,
+        cell_point_indices: np.ndarray,
+        cell_type: VisCellType,
+        global_index: np.ndarray,
+        region_index: np.ndarray,
+    ) -> "ArrayVisMesh":
+        # mesh of cells of one type and size, cell_point_indices has shape (num_cells, cell size)
+        num_cells, cell_size = cell_point_indices.shape
+        return ArrayVisMesh(
+            dimension=dimension,
+            origin=origin,
+            extent=extent,
+            points=np.asarray(points, dtype=np.float64).reshape((-1, 3)),
+            connectivity=np.asarray(cell_point_indices, dtype=np.int64).ravel(),
+            offsets=np.arange(num_cells + 1, dtype=np.int64) * cell_size,
+            cell_types=np.full(num_cells, cell_type, dtype=np.uint8),
+            global_index=np.asarray(global_index, dtype=np.int64),
+            region_index=np.asarray(region_index, dtype=np.int64),
+        )
+
+    @staticmethod
+    def from_vis_mesh(vis_mesh: VisMesh) -> "ArrayVisMesh":
+        # cells in the order polygons, voxels, tetrahedra (the order of get_volume_vtk_grid())
+        if vis_mesh.irregularPolyhedra is not None:
+            raise ValueError("irregular polyhedra must be replaced with tetrahedra (see create_tetrahedra())")
+        polygons = vis_mesh.polygons or []
+        polygon_sizes = np.array([len(polygon.pointIndices) for polygon in polygons], dtype=np.int64)
+        polygon_types = np.full(len(polygons), VisCellType.POLYGON, dtype=np.uint8)
+        polygon_types[polygon_sizes == 4] = VisCellType.QUAD
+        polygon_types[polygon_sizes == 3] = VisCellType.TRIANGLE
+        voxels = vis_mesh.visVoxels or []
+        tetrahedra = vis_mesh.tetrahedra or []
+        blocks: list[tuple[list[VisPolygon] | list[VisVoxel] | list[VisTetrahedron], np.ndarray, np.ndarray]] = [
+            (polygons, polygon_sizes, polygon_types),
+            (voxels, np.full(len(voxels), 8), np.full(len(voxels), VisCellType.VOXEL, dtype=np.uint8)),
+            (tetrahedra, np.full(len(tetrahedra), 4), np.full(len(tetrahedra), VisCellType.TETRA, dtype=np.uint8)),
+        ]
+
+        sizes = np.concatenate([block_sizes for _cells, block_sizes, _types in blocks]).astype(np.int64)
+        connectivity = np.fromiter(
+            (index for cells, _sizes, _types in blocks for cell in cells for index in cell.pointIndices),
+            dtype=np.int64,
+            count=int(sizes.sum()),
+        )
+        fv_indices = [cell.finiteVolumeIndex for cells, _sizes, _types in blocks for cell in cells]
+        points = [(point.x, point.y, point.z) for point in vis_mesh.points or []]
+        return ArrayVisMesh(
+            dimension=vis_mesh.dimension,
+            origin=vis_mesh.origin,
+            extent=vis_mesh.extent,
+            points=np.array(points, dtype=np.float64).reshape((-1, 3)),
+            connectivity=connectivity,
+            offsets=np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+            cell_types=np.concatenate([types for _cells, _sizes, types in blocks]),
+            global_index=np.array([-1 if fv is None else fv.globalIndex for fv in fv_indices], dtype=np.int64),
+            region_index=np.array([-1 if fv is None else fv.regionIndex for fv in fv_indices], dtype=np.int64),
+        )
+
+    def to_vis_mesh(self) -> VisMesh:
+        vis_mesh = VisMesh(self.dimension, self.origin, self.extent)
+        vis_mesh.points = [VisPoint(x, y, z) for x, y, z in self.points.tolist()]
+        cell_types = self.cell_types.tolist()
+        global_indices = self.global_index.tolist()
+        region_indices = self.region_index.tolist()
+        for c, point_indices in enumerate(self.get_cell_point_indices()):
+            indices = point_indices.tolist()
+            fv_index = FiniteVolumeIndex(global_indices[c], region_indices[c]) if global_indices[c] >= 0 else None
+            if cell_types[c] == VisCellType.VOXEL:
+                vis_mesh.visVoxels = vis_mesh.visVoxels or []
+                vis_mesh.visVoxels.append(VisVoxel(indices, finiteVolumeIndex=fv_index))
+            elif cell_types[c] == VisCellType.TETRA:
+                vis_mesh.tetrahedra = vis_mesh.tetrahedra or []
+                vis_mesh.tetrahedra.append(VisTetrahedron(indices, finiteVolumeIndex=fv_index))
+            elif cell_types[c] in (VisCellType.QUAD, VisCellType.TRIANGLE, VisCellType.POLYGON):
+                vis_mesh.polygons = vis_mesh.polygons or []
+                vis_mesh.polygons.append(VisPolygon(indices, finiteVolumeIndex=fv_index))
+            else:
+                raise ValueError(f"unsupported cell type {cell_types[c]} of cell {c}")
+        return vis_mesh
+
+    def get_finite_volume_indices(self) -> list[FiniteVolumeIndex]:
+        if np.any(self.global_index < 0):
+            raise ValueError("finite volume index missing for some cells")
+        return [
+            FiniteVolumeIndex(global_index, region_index)
+            for global_index, region_index in zip(self.global_index.tolist(), self.region_index.tolist())
+        ]
+
+
 @dataclass
 class Box3D:
     x_lo: float
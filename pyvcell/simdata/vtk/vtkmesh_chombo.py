@@ -1,29 +1,33 @@
-from copy import deepcopy
+import dataclasses
 from pathlib import Path
 
+import numpy as np
 import orjson
 import vtkmodules.all as vtk
 
-from pyvcell.simdata.vtk.vismesh import ChomboIndexData, VisLine, VisMesh, VisPolygon, VisTetrahedron
+from pyvcell.simdata.vtk.index_data import IndexFormat, write_columnar_index_data
+from pyvcell.simdata.vtk.vismesh import (
+    ChomboIndexData,
+    ColumnarIndexData,
+    VisLine,
+    VisMesh,
+    VisPolygon,
+    VisTetrahedron,
+)
 from pyvcell.simdata.vtk.vtkmesh_utils import create_tetrahedra, get_membrane_vtk_grid, get_volume_vtk_grid, writevtk
 
 
 def write_chombo_volume_vtk_grid_and_index_data(
-    vis_mesh: VisMesh, domainname: str, vtkfile: Path, indexfile: Path
+    vis_mesh: VisMesh, domainname: str, vtkfile: Path, indexfile: Path, index_format: IndexFormat = IndexFormat.JSON
 ) -> None:
     original_vis_mesh = vis_mesh
     corrected_vis_mesh = original_vis_mesh  # same mesh if no irregularPolyhedra
     if original_vis_mesh.irregularPolyhedra is not None:
-        corrected_vis_mesh = deepcopy(vis_mesh)
-        if corrected_vis_mesh.tetrahedra is None:
-            corrected_vis_mesh.tetrahedra = []
-        if corrected_vis_mesh.irregularPolyhedra is None:
-            raise ValueError("corrected_vis_mesh.irregularPolyhedra is None")
-        for irregularPolyhedron in corrected_vis_mesh.irregularPolyhedra:
-            tets = create_tetrahedra(irregularPolyhedron, corrected_vis_mesh)
-            for tet in tets:
-                corrected_vis_mesh.tetrahedra.append(tet)
-        corrected_vis_mesh.irregularPolyhedra = None
+        # a shallow copy with new cell lists, the points and cells of vis_mesh are only read
+        tetrahedra = list(original_vis_mesh.tetrahedra or [])
+        for irregularPolyhedron in original_vis_mesh.irregularPolyhedra:
+            tetrahedra.extend(create_tetrahedra(irregularPolyhedron, original_vis_mesh))
+        corrected_vis_mesh = dataclasses.replace(original_vis_mesh, tetrahedra=tetrahedra, irregularPolyhedra=None)
 
     vtkgrid: vtk.vtkUnstructuredGrid = get_volume_vtk_grid(corrected_vis_mesh)
     writevtk(vtkgrid, vtkfile)
@@ -57,11 +61,23 @@ def write_chombo_volume_vtk_grid_and_index_data(
                 chombo_index_data.chomboVolumeIndices.append(tetrahedron.chomboVolumeIndex)
         if len(chombo_index_data.chomboVolumeIndices) == 0:
             print("didn't find any indices ... bad")
-    write_chombo_index_data(indexfile, chombo_index_data)
+    if index_format == IndexFormat.COLUMNAR:
+        # the columns straight from the index objects of the mesh cells
+        volume_indices = chombo_index_data.chomboVolumeIndices
+        write_chombo_volume_columnar_index_data(
+            indexfile,
+            domainname,
+            level=np.array([index.level for index in volume_indices], dtype=np.int64),
+            box_number=np.array([index.boxNumber for index in volume_indices], dtype=np.int64),
+            box_index=np.array([index.boxIndex for index in volume_indices], dtype=np.int64),
+            fraction=np.array([index.fraction for index in volume_indices], dtype=np.float64),
+        )
+    else:
+        write_chombo_index_data(indexfile, chombo_index_data)
 
 
 def write_chombo_membrane_vtk_grid_and_index_data(
-    vis_mesh: VisMesh, domainname: str, vtkfile: Path, indexfile: Path
+    vis_mesh: VisMesh, domainname: str, vtkfile: Path, indexfile: Path, index_format: IndexFormat = IndexFormat.JSON
 ) -> None:
     vtkgrid = get_membrane_vtk_grid(vis_mesh)
     writevtk(vtkgrid, vtkfile)
@@ -89,10 +105,41 @@ def write_chombo_membrane_vtk_grid_and_index_data(
         raise ValueError(f"unexpected mesh dimension {vis_mesh.dimension}")
     if len(chombo_index_data.chomboSurfaceIndices) == 0:
         print("didn't find any indices ... bad")
-    write_chombo_index_data(indexfile, chombo_index_data)
+    if index_format == IndexFormat.COLUMNAR:
+        # the columns straight from the index objects of the mesh cells
+        surface_indices = chombo_index_data.chomboSurfaceIndices
+        write_chombo_membrane_columnar_index_data(
+            indexfile, domainname, index=np.array([index.index for index in surface_indices], dtype=np.int64)
+        )
+    else:
+        write_chombo_index_data(indexfile, chombo_index_data)
 
 
 def write_chombo_index_data(chombo_index_file: Path, chombo_index_data: ChomboIndexData) -> None:
     json = orjson.dumps(chombo_index_data, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY)
     with chombo_index_file.open("wb") as ff:
         ff.write(json)
+
+
+def write_chombo_volume_columnar_index_data(
+    chombo_index_file: Path,
+    domain_name: str,
+    level: np.ndarray,
+    box_number: np.ndarray,
+    box_index: np.ndarray,
+    fraction: np.ndarray,
+) -> None:
+    # columnar form of the chomboVolumeIndices of write_chombo_index_data(), see write_columnar_index_data()
+    columns = {
+        "chomboVolumeIndices/level": level,
+        "chomboVolumeIndices/boxNumber": box_number,
+        "chomboVolumeIndices/boxIndex": box_index,
+        "chomboVolumeIndices/fraction": fraction,
+    }
+    write_columnar_index_data(chombo_index_file, ColumnarIndexData(domainName=domain_name, columns=columns))
+
+
+def write_chombo_membrane_columnar_index_data(chombo_index_file: Path, domain_name: str, index: np.ndarray) -> None:
+    # columnar form of the chomboSurfaceIndices of write_chombo_index_data(), see write_columnar_index_data()
+    columns = {"chomboSurfaceIndices/index": index}
+    write_columnar_index_data(chombo_index_file, ColumnarIndexData(domainName=domain_name, columns=columns))
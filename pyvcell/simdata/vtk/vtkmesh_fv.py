@@ -1,19 +1,32 @@
 from pathlib import Path
 
+import numpy as np
 import orjson
 
-from pyvcell.simdata.vtk.vismesh import FiniteVolumeIndexData, VisMesh
+from pyvcell.simdata.vtk.index_data import IndexFormat, write_columnar_index_data
+from pyvcell.simdata.vtk.vismesh import ArrayVisMesh, ColumnarIndexData, FiniteVolumeIndexData, VisMesh
 from pyvcell.simdata.vtk.vtkmesh_utils import get_volume_vtk_grid, smooth_unstructured_grid_surface, writevtk
 
 
 def write_finite_volume_smoothed_vtk_grid_and_index_data(
-    vis_mesh: VisMesh, domain_name: str, vtu_file: Path, index_file: Path
+    vis_mesh: VisMesh | ArrayVisMesh,
+    domain_name: str,
+    vtu_file: Path,
+    index_file: Path,
+    index_format: IndexFormat = IndexFormat.JSON,
 ) -> None:
     vtkgrid = get_volume_vtk_grid(vis_mesh)
     vtkgrid_smoothed = smooth_unstructured_grid_surface(vtkgrid) if vis_mesh.dimension == 3 else vtkgrid
     writevtk(vtkgrid_smoothed, vtu_file)
+    if isinstance(vis_mesh, ArrayVisMesh) and index_format == IndexFormat.COLUMNAR:
+        # straight from the index columns, one row per cell in grid order
+        write_finite_volume_columnar_index_data(index_file, domain_name, vis_mesh.global_index, vis_mesh.region_index)
+        return
     finite_volume_index_data = FiniteVolumeIndexData(domainName=domain_name, finiteVolumeIndices=[])
-    if vis_mesh.dimension == 2:
+    if isinstance(vis_mesh, ArrayVisMesh):
+        # one index per cell, in grid order (the columnar form is written above)
+        finite_volume_index_data.finiteVolumeIndices = vis_mesh.get_finite_volume_indices()
+    elif vis_mesh.dimension == 2:
         # if volume
         if vis_mesh.polygons is not None:
             for polygon in vis_mesh.polygons:
@@ -50,7 +63,17 @@ def write_finite_volume_smoothed_vtk_grid_and_index_data(
     if finite_volume_index_data.finiteVolumeIndices is None or len(finite_volume_index_data.finiteVolumeIndices) == 0:
         print("didn't find any indices ... bad")
 
-    write_finite_volume_index_data(index_file, finite_volume_index_data)
+    if index_format == IndexFormat.COLUMNAR:
+        # the columns straight from the index objects of the mesh cells
+        finite_volume_indices = finite_volume_index_data.finiteVolumeIndices
+        write_finite_volume_columnar_index_data(
+            index_file,
+            domain_name,
+            global_index=np.array([index.globalIndex for index in finite_volume_indices], dtype=np.int64),
+            region_index=np.array([index.regionIndex for index in finite_volume_indices], dtype=np.int64),
+        )
+    else:
+        write_finite_volume_index_data(index_file, finite_volume_index_data)
 
 
 def write_finite_volume_index_data(
@@ -59,3 +82,13 @@ def write_finite_volume_index_data(
     json = orjson.dumps(finite_volume_index_data, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY)
     with finite_volume_index_file.open("wb") as ff:
         ff.write(json)
+
+
+def write_finite_volume_columnar_index_data(
+    finite_volume_index_file: Path, domain_name: str, global_index: np.ndarray, region_index: np.ndarray
+) -> None:
+    # columnar form of write_finite_volume_index_data(), see write_columnar_index_data()
+    if np.any(global_index < 0):
+        raise ValueError("finite volume index missing for some cells")
+    columns = {"finiteVolumeIndices/globalIndex": global_index, "finiteVolumeIndices/regionIndex": region_index}
+    write_columnar_index_data(finite_volume_index_file, ColumnarIndexData(domainName=domain_name, columns=columns))
@@ -1,13 +1,20 @@
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import orjson
 
-from pyvcell.simdata.vtk.vismesh import MovingBoundaryIndexData, VisMesh
+from pyvcell.simdata.vtk.index_data import IndexFormat, write_columnar_index_data
+from pyvcell.simdata.vtk.vismesh import ColumnarIndexData, MovingBoundaryIndexData, MovingBoundarySurfaceIndex, VisMesh
 from pyvcell.simdata.vtk.vtkmesh_utils import get_volume_vtk_grid, writevtk
 
 
 def write_moving_boundary_volume_vtk_grid_and_index_data(
-    vis_mesh: VisMesh, domain_name: str, vtu_file: Path, index_file: Path
+    vis_mesh: VisMesh,
+    domain_name: str,
+    vtu_file: Path,
+    index_file: Path,
+    index_format: IndexFormat = IndexFormat.JSON,
 ) -> None:
     vtkgrid = get_volume_vtk_grid(vis_mesh)
     writevtk(vtkgrid, vtu_file)
@@ -22,12 +29,12 @@ def write_moving_boundary_volume_vtk_grid_and_index_data(
                 moving_boundary_index_data.movingBoundaryVolumeIndices.append(polygon.movingBoundaryVolumeIndex)
         # if membrane
         if vis_mesh.visLines is not None:
+            surface_indices: list[MovingBoundarySurfaceIndex] = []
+            moving_boundary_index_data.movingBoundarySurfaceIndices = surface_indices
             for visLine in vis_mesh.visLines:
                 if visLine.movingBoundarySurfaceIndex is None:
                     raise ValueError("visLine.movingBoundarySurfaceIndex is None")
-                if moving_boundary_index_data.movingBoundarySurfaceIndices is None:
-                    raise ValueError("moving_boundary_index_data.movingBoundarySurfaceIndices is None")
-                moving_boundary_index_data.movingBoundarySurfaceIndices.append(visLine.movingBoundarySurfaceIndex)
+                surface_indices.append(visLine.movingBoundarySurfaceIndex)
     # elif visMesh.dimension == 3:
     #     # if volume
     #     if visMesh.visVoxels is not None:
@@ -61,7 +68,23 @@ def write_moving_boundary_volume_vtk_grid_and_index_data(
     ):
         print("didn't find any indices ... bad")
 
-    write_moving_boundary_index_data(index_file, moving_boundary_index_data)
+    if index_format == IndexFormat.COLUMNAR:
+        # the columns straight from the index objects of the mesh cells
+        volume_indices = moving_boundary_index_data.movingBoundaryVolumeIndices
+        surface_index = None
+        if moving_boundary_index_data.movingBoundarySurfaceIndices is not None:
+            surface_index = np.array(
+                [index.index for index in moving_boundary_index_data.movingBoundarySurfaceIndices], dtype=np.int64
+            )
+        write_moving_boundary_columnar_index_data(
+            index_file,
+            domain_name,
+            moving_boundary_index_data.timeIndex,
+            volume_index=np.array([index.index for index in volume_indices], dtype=np.int64),
+            surface_index=surface_index,
+        )
+    else:
+        write_moving_boundary_index_data(index_file, moving_boundary_index_data)
 
 
 def write_moving_boundary_index_data(
@@ -70,3 +93,17 @@ def write_moving_boundary_index_data(
     json = orjson.dumps(moving_boundary_index_data, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY)
     with moving_boundary_index_file.open("wb") as ff:
         ff.write(json)
+
+
+def write_moving_boundary_columnar_index_data(
+    moving_boundary_index_file: Path,
+    domain_name: str,
+    time_index: int,
+    volume_index: np.ndarray,
+    surface_index: Optional[np.ndarray] = None,
+) -> None:
+    # columnar form of write_moving_boundary_index_data(), see write_columnar_index_data()
+    columns = {} if surface_index is None else {"movingBoundarySurfaceIndices/index": surface_index}
+    columns["movingBoundaryVolumeIndices/index"] = volume_index
+    columnar_index_data = ColumnarIndexData(domainName=domain_name, columns=columns, timeIndex=time_index)
+    write_columnar_index_data(moving_boundary_index_file, columnar_index_data)
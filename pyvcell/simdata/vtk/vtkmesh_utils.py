@@ -1,3 +1,4 @@
+import dataclasses
 import os
 from pathlib import Path
 
@@ -5,7 +6,14 @@ import numpy as np
 import vtkmodules.all as vtk
 from vtkmodules.util.numpy_support import numpy_to_vtk
 
-from pyvcell.simdata.vtk.vismesh import PolyhedronFace, VisIrregularPolyhedron, VisMesh, VisTetrahedron
+from pyvcell.simdata.vtk.vismesh import (
+    ArrayVisMesh,
+    PolyhedronFace,
+    VisCellType,
+    VisIrregularPolyhedron,
+    VisMesh,
+    VisTetrahedron,
+)
 
 
 #
@@ -69,124 +77,74 @@ def write_data_array_to_new_vtk_file(
 
 
 def get_membrane_vtk_grid(vis_mesh: VisMesh) -> vtk.vtkUnstructuredGrid:
-    vtk_points = vtk.vtkPoints()
     if vis_mesh.surfacePoints is None:
         raise ValueError("vis_mesh.surfacePoints is None")
-    for visPoint in vis_mesh.surfacePoints:
-        vtk_points.InsertNextPoint(visPoint.x, visPoint.y, visPoint.z)
-
-    vtk_grid = vtk.vtkUnstructuredGrid()
-    vtk_grid.Allocate(len(vis_mesh.surfacePoints), len(vis_mesh.surfacePoints))
-    vtk_grid.SetPoints(vtk_points)
+    points = np.array([[point.x, point.y, point.z] for point in vis_mesh.surfacePoints], dtype=np.float64)
 
+    cells: list[list[int]]
     if vis_mesh.dimension == 2:
-        vtk_line = vtk.vtkLine()
-        line_type = vtk_line.GetCellType()
-
         if vis_mesh.visLines is None:
             raise ValueError("vis_mesh.visLines is None")
-        for line in vis_mesh.visLines:
-            vtk_grid.InsertNextCell(line_type, 2, [line.p1, line.p2])
+        cells = [[line.p1, line.p2] for line in vis_mesh.visLines]
+        cell_type = VisCellType.LINE
     else:
-        vtk_triangle = vtk.vtkTriangle()
-        triangle_type = vtk_triangle.GetCellType()
         if vis_mesh.surfaceTriangles is None:
             raise ValueError("vis_mesh.surfaceTriangles is None")
-        for surfaceTriangle in vis_mesh.surfaceTriangles:
-            # each triangle is a cell
-            vtk_grid.InsertNextCell(triangle_type, 3, surfaceTriangle.pointIndices)
+        # each triangle is a cell
+        cells = [surface_triangle.pointIndices for surface_triangle in vis_mesh.surfaceTriangles]
+        cell_type = VisCellType.TRIANGLE
+    cell_size = 2 if cell_type == VisCellType.LINE else 3
+    connectivity = np.array(cells, dtype=np.int64).reshape(-1)
+    offsets = np.arange(len(cells) + 1, dtype=np.int64) * cell_size
+    return build_vtk_grid(points, connectivity, offsets, np.full(len(cells), cell_type, dtype=np.uint8))
+
+
+def get_volume_vtk_grid(vis_mesh: VisMesh | ArrayVisMesh) -> vtk.vtkUnstructuredGrid:
+    if isinstance(vis_mesh, ArrayVisMesh):
+        return get_array_vtk_grid(vis_mesh)
+    #
+    # replace any VisIrregularPolyhedron with a list of VisTetrahedron (appended after the other cells)
+    #
+    if vis_mesh.irregularPolyhedra is not None:
+        tetrahedra = list(vis_mesh.tetrahedra or [])
+        for clippedPolyhedron in vis_mesh.irregularPolyhedra:
+            tetrahedra.extend(create_tetrahedra(clippedPolyhedron, vis_mesh))
+        vis_mesh = dataclasses.replace(vis_mesh, tetrahedra=tetrahedra, irregularPolyhedra=None)
+    if vis_mesh.points is None:
+        raise ValueError("vis_mesh.points is None")
+    return get_array_vtk_grid(ArrayVisMesh.from_vis_mesh(vis_mesh))
 
-    vtk_grid.BuildLinks()
-    return vtk_grid
 
+def get_array_vtk_grid(vis_mesh: ArrayVisMesh) -> vtk.vtkUnstructuredGrid:
+    return build_vtk_grid(vis_mesh.points, vis_mesh.connectivity, vis_mesh.offsets, vis_mesh.cell_types)
 
-def get_volume_vtk_grid(vis_mesh: VisMesh) -> vtk.vtkUnstructuredGrid:
-    b_clip_polyhedra = True
 
-    vtkpoints = vtk.vtkPoints()
-    if vis_mesh.points is None:
-        raise ValueError("vis_mesh.points is None")
-    for visPoint in vis_mesh.points:
-        vtkpoints.InsertNextPoint(visPoint.x, visPoint.y, visPoint.z)
+def build_vtk_grid(
+    points: np.ndarray, connectivity: np.ndarray, offsets: np.ndarray, cell_types: np.ndarray
+) -> vtk.vtkUnstructuredGrid:
+    # hands the arrays to VTK in bulk (deep copies), cell c is connectivity[offsets[c]:offsets[c + 1]] of
+    # cell type cell_types[c] (VTK cell type numbers, see VisCellType)
+    # float32 coordinates, the vtkPoints default
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float32).reshape((-1, 3)), deep=True))
+
+    # 64 bit offsets and connectivity, the vtkCellArray default storage
+    cell_array = vtk.vtkCellArray()
+    cell_array.SetData(
+        numpy_to_vtk(np.ascontiguousarray(offsets, dtype=np.int64), deep=True, array_type=vtk.VTK_TYPE_INT64),
+        numpy_to_vtk(np.ascontiguousarray(connectivity, dtype=np.int64), deep=True, array_type=vtk.VTK_TYPE_INT64),
+    )
+    vtk_cell_types = numpy_to_vtk(
+        np.ascontiguousarray(cell_types, dtype=np.uint8), deep=True, array_type=vtk.VTK_UNSIGNED_CHAR
+    )
 
     vtk_grid = vtk.vtkUnstructuredGrid()
-    vtk_grid.Allocate(len(vis_mesh.points), len(vis_mesh.points))
-    vtk_grid.SetPoints(vtkpoints)
-
-    quad_type = vtk.vtkQuad().GetCellType()
-    #  lineType = vtk.vtkLine().GetCellType()
-    polygon_type = vtk.vtkPolygon().GetCellType()
-    polyhedron_type = vtk.vtkPolyhedron().GetCellType()
-    triangle_type = vtk.vtkTriangle().GetCellType()
-    voxel_type = vtk.vtkVoxel().GetCellType()
-    tetra_type = vtk.vtkTetra().GetCellType()
-
-    if vis_mesh.polygons is not None:
-        if vis_mesh.polygons is None:
-            raise ValueError("vis_mesh.polygons is None")
-        for vis_polygon in vis_mesh.polygons:
-            polygon_points = vis_polygon.pointIndices
-            num_points = len(polygon_points)
-            if num_points == 4:
-                vtk_grid.InsertNextCell(quad_type, num_points, polygon_points)
-            elif num_points == 3:
-                vtk_grid.InsertNextCell(triangle_type, num_points, polygon_points)
-            else:
-                vtk_grid.InsertNextCell(polygon_type, num_points, polygon_points)
-    #
-    # replace any VisIrregularPolyhedron with a list of VisTetrahedron
-    #
-    if vis_mesh.visVoxels is not None:
-        if vis_mesh.visVoxels is None:
-            raise ValueError("vis_mesh.visVoxels is None")
-        for voxel in vis_mesh.visVoxels:
-            polyhedron_points = voxel.pointIndices
-            num_points = len(polyhedron_points)
-            vtk_grid.InsertNextCell(voxel_type, num_points, polyhedron_points)
-
-    if vis_mesh.tetrahedra is not None:
-        if vis_mesh.tetrahedra is None:
-            raise ValueError("vis_mesh.tetrahedra is None")
-        for visTet in vis_mesh.tetrahedra:
-            if not isinstance(visTet, VisTetrahedron):
-                raise TypeError("expecting a VisTetrahedron")
-            tet_points = visTet.pointIndices
-            vtk_grid.InsertNextCell(tetra_type, len(tet_points), tet_points)
-
-    b_initialized_faces = False
-    if vis_mesh.irregularPolyhedra is not None:
-        if vis_mesh.irregularPolyhedra is None:
-            raise ValueError("vis_mesh.irregularPolyhedra is None")
-        for clippedPolyhedron in vis_mesh.irregularPolyhedra:
-            if b_clip_polyhedra:
-                tets = create_tetrahedra(clippedPolyhedron, vis_mesh)
-                for visTet in tets:
-                    tet_points = visTet.pointIndices
-                    vtk_grid.InsertNextCell(tetra_type, len(tet_points), tet_points)
-            else:
-                face_stream = get_vtk_face_stream(clippedPolyhedron)
-                if b_initialized_faces is False and vtk_grid.GetNumberOfCells() > 0:
-                    vtk_grid.InitializeFacesRepresentation(vtk_grid.GetNumberOfCells())
-                b_initialized_faces = True
-                vtk_grid.InsertNextCell(polyhedron_type, len(face_stream), face_stream)
-
+    vtk_grid.SetPoints(vtk_points)
+    vtk_grid.SetCells(vtk_cell_types, cell_array)
     vtk_grid.BuildLinks()
-    # vtk_grid.Squeeze()
     return vtk_grid
 
 
-def get_vtk_face_stream(irregular_polyhedron: VisIrregularPolyhedron) -> list[int]:
-    face_stream = [
-        len(irregular_polyhedron.polyhedronFaces),
-    ]
-    for polyhedronFace in irregular_polyhedron.polyhedronFaces:
-        face_stream.append(len(polyhedronFace.vertices))
-        for v in polyhedronFace.vertices:
-            face_stream.append(v)
-    int_face_stream = [int(v) for v in face_stream]
-    return int_face_stream
-
-
 def smooth_unstructured_grid_surface(vtk_grid: vtk.vtkUnstructuredGrid) -> vtk.vtkUnstructuredGrid:
     ug_geometry_filter = vtk.vtkUnstructuredGridGeometryFilter()
     ug_geometry_filter.PassThroughPointIdsOn()
@@ -0,0 +1,107 @@
+from enum import Enum
+from typing import Any
+
+import numpy as np
+from numcodecs.abc import Codec  # type: ignore[import-untyped]
+from numcodecs.compat import ensure_ndarray, ndarray_copy  # type: ignore[import-untyped]
+from numcodecs.registry import register_codec  # type: ignore[import-untyped]
+
+
+class DeltaMode(Enum):
+    # lossless, XOR of the float bit patterns of consecutive frames
+    XOR = "xor"
+    # lossy, values quantized to multiples of 2 * error_bound, differences of the quantized integers
+    QUANTIZE = "quantize"
+
+
+# quantized values of non-finite floats (finite values are bounded by _MAX_QUANTIZED)
+_NAN = np.iinfo(np.int64).min
+_NEG_INF = _NAN + 1
+_POS_INF = np.iinfo(np.int64).max
+_MAX_QUANTIZED = 2**62
+
+
+class TemporalDelta(Codec):  # type: ignore[no-any-unimported]
+    """
+    zarr filter storing the frames of a chunk as a keyframe followed by differences to the previous frame
+
+    a chunk holds time_chunk frames of frame_size elements along its time axis (frame_size is the product of
+    the chunk shape after the time axis). Chunks of slowly varying fields become mostly zeros (or zero bits)
+    which the compressor that follows shrinks far better than independent frames. The first frame of every
+    chunk is a keyframe, so chunks decode independently.
+
+    mode "xor" is lossless. Mode "quantize" rounds values to multiples of 2 * error_bound (absolute error at
+    most error_bound, up to float rounding) and stores differences of the integer quantization as int64,
+    NaN and infinities are preserved.
+    """
+
+    codec_id = "pyvcell.temporal_delta"
+
+    dtype: str
+    time_chunk: int
+    frame_size: int
+    mode: str
+    error_bound: float | None
+    _step: float  # quantization step, 2 * error_bound
+
+    def __init__(
+        self, dtype: str, time_chunk: int, frame_size: int, mode: str = "xor", error_bound: float | None = None
+    ) -> None:
+        if np.dtype(dtype).kind != "f":
+            raise ValueError(f"temporal delta encoding requires a float dtype, found {dtype}")
+        if DeltaMode(mode) == DeltaMode.QUANTIZE and (error_bound is None or error_bound <= 0):
+            raise ValueError(f"quantized delta encoding requires a positive error bound, found {error_bound}")
+        self.dtype = np.dtype(dtype).str
+        self.time_chunk = int(time_chunk)
+        self.frame_size = int(frame_size)
+        self.mode = DeltaMode(mode).value
+        self.error_bound = None if error_bound is None else float(error_bound)
+        self._step = 0.0 if error_bound is None else 2.0 * float(error_bound)
+
+    def encode(self, buf: Any) -> np.ndarray:
+        values = self._frames(ensure_ndarray(buf).view(self.dtype))
+        if self.mode == DeltaMode.XOR.value:
+            bits = values.view(f"u{values.dtype.itemsize}")
+            xor_deltas = bits.copy()
+            xor_deltas[:, 1:] ^= bits[:, :-1]
+            return xor_deltas.ravel()
+        quantized = self._quantize(values).view(np.uint64)
+        # unsigned differences wrap around, cumsum in decode() wraps back
+        deltas = quantized.copy()
+        deltas[:, 1:] -= quantized[:, :-1]
+        return deltas.ravel()
+
+    def decode(self, buf: Any, out: Any = None) -> Any:
+        if self.mode == DeltaMode.XOR.value:
+            xor_deltas = self._frames(ensure_ndarray(buf).view(f"u{np.dtype(self.dtype).itemsize}"))
+            values = np.bitwise_xor.accumulate(xor_deltas, axis=1).view(self.dtype)
+        else:
+            deltas = self._frames(ensure_ndarray(buf).view(np.uint64))
+            values = self._dequantize(np.cumsum(deltas, axis=1, dtype=np.uint64).view(np.int64))
+        return ndarray_copy(values.ravel(), out)
+
+    def _frames(self, values: np.ndarray) -> np.ndarray:
+        # (blocks before the time axis, time, frame elements)
+        return values.reshape((-1, self.time_chunk, self.frame_size))
+
+    def _quantize(self, values: np.ndarray) -> np.ndarray:
+        scaled = values.astype(np.float64) / self._step
+        finite = np.isfinite(scaled)
+        if np.any(np.abs(scaled[finite]) >= _MAX_QUANTIZED):
+            raise ValueError(f"values exceed the quantization range of error bound {self.error_bound}")
+        quantized = np.where(finite, np.rint(np.where(finite, scaled, 0.0)), 0.0).astype(np.int64)
+        quantized[np.isnan(scaled)] = _NAN
+        quantized[scaled == np.inf] = _POS_INF
+        quantized[scaled == -np.inf] = _NEG_INF
+        return quantized
+
+    def _dequantize(self, quantized: np.ndarray) -> np.ndarray:
+        values = quantized.astype(np.float64) * self._step
+        values[quantized == _NAN] = np.nan
+        values[quantized == _POS_INF] = np.inf
+        values[quantized == _NEG_INF] = -np.inf
+        result: np.ndarray = values.astype(self.dtype)
+        return result
+
+
+register_codec(TemporalDelta)
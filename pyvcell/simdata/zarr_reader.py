@@ -0,0 +1,235 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.quantile_sketch import QuantileSketch
+from pyvcell.simdata.simdata_models import DataBlockHeader, VariableInfo, VariableType
+from pyvcell.simdata.zarr_writer import ZarrLayout
+
+
+class ZarrDataSet:
+    """
+    reads an exported zarr store (see write_zarr) through the same interface as PdeDataSet
+
+    supports layout v1 (a single (t, c, z, y, x) array, or a multiscale pyramid whose full resolution
+    level is read) and layout v2 (dense or compact per variable arrays). Exported functions can be read
+    with get_data() like variables, but are not listed by variables_block_headers() (as in PdeDataSet).
+    Data is returned flat (one value per volume element) as float64, compact data is scattered back
+    to the full mesh with zeros outside of the variable's domain by get_data(), get_compact_data() returns
+    it as stored when read at the domain's volume indices.
+
+    reads are chunked by zarr, get_data_blocks() reads several variables concurrently when workers > 1.
+
+    a parameter scan store (see write_scan_zarr) is read one job at a time, job is the position along its
+    job axis (metadata["jobs"][job]).
+    """
+
+    zarr_dir: Path
+    workers: int
+    job: int | None
+    layout: ZarrLayout
+    metadata: dict
+    data_times: list[float]
+    mesh_shape: tuple[int, int, int]  # (z, y, x)
+    _root: Any  # zarr.Group, or zarr.Array for a single array v1 store
+    _channels: dict[str, dict]  # channel metadata by variable name ("domain::name")
+    _block_headers: list[DataBlockHeader]
+    _time_positions: list[int]  # position of data_times[i] along the stored time axis
+    _job_index: tuple[int, ...]  # leading index of time dependent arrays, (job,) for a scan store
+
+    def __init__(self, zarr_dir: Path, workers: int = 1, job: int | None = None) -> None:
+        self.zarr_dir = zarr_dir
+        self.workers = workers
+        self.job = job
+        self._job_index = ()
+        self.metadata = {}
+        self.data_times = []
+        self._channels = {}
+        self._block_headers = []
+        self._time_positions = []
+
+    def read(self) -> None:
+        store_path = str(self.zarr_dir.absolute())
+        if (self.zarr_dir / ".zmetadata").exists():
+            self._root = zarr.open_consolidated(store_path, mode="r")
+        else:
+            self._root = zarr.open(store_path, mode="r")
+        self.metadata = self._root.attrs.get("metadata")
+        if self.metadata is None:
+            raise ValueError(f"{self.zarr_dir} is not a pyvcell zarr export (no metadata attribute)")
+        num_x, num_y, num_z = self.metadata["mesh"]["size"]
+        self.mesh_shape = (num_z, num_y, num_x)
+
+        if "jobs" in self.metadata:
+            if self.job is None or not 0 <= self.job < len(self.metadata["jobs"]):
+                raise ValueError(f"{self.zarr_dir} is a parameter scan, select one of its jobs (found job={self.job})")
+            self._job_index = (self.job,)
+        if self.metadata.get("layout") == ZarrLayout.V2.value:
+            self.layout = ZarrLayout.V2
+            stored_times = [float(time) for time in self._root["times"][:]]
+            # timepoints of an interrupted export are not readable
+            if "completed" in self._root:
+                completed = self._root["completed"][self._job_index]
+            else:
+                completed = np.ones(len(stored_times), bool)
+            self._time_positions = [t for t in range(len(stored_times)) if completed[t]]
+            self.data_times = [stored_times[t] for t in self._time_positions]
+            channels = self.metadata["channels"]
+        else:
+            self.layout = ZarrLayout.V1
+            self._time_positions = list(range(len(self.metadata["times"])))
+            self.data_times = [float(time) for time in self.metadata["times"]]
+            # channel 0 holds the region map
+            channels = [
+                {**channel, "name": f"{channel['domain_name']}::{channel['label']}"}
+                for channel in self.metadata["channels"][1:]
+            ]
+
+        self._channels = {channel["name"]: channel for channel in channels}
+        self._block_headers = []
+        for channel in channels:
+            if channel.get("function", False):
+                continue
+            block_header = DataBlockHeader()
+            variable_type = VariableType[channel.get("variable_type", VariableType.VOLUME.name)]
+            block_header.var_info = VariableInfo(var_name=channel["name"], variable_type=variable_type)
+            if variable_type == VariableType.VOLUME:
+                block_header.size = int(np.prod(self.mesh_shape))
+            else:
+                block_header.size = int(self._get_array(channel).shape[-1])
+            block_header.data_offset = 0
+            self._block_headers.append(block_header)
+
+    def times(self) -> list[float]:
+        return self.data_times
+
+    def time_index(self, time: float) -> int:
+        return self.data_times.index(time)
+
+    def variables_block_headers(self) -> list[DataBlockHeader]:
+        return self._block_headers
+
+    def get_channel(self, variable: VariableInfo | str) -> dict:
+        name = variable.var_name if isinstance(variable, VariableInfo) else variable
+        if name not in self._channels:
+            raise ValueError(f"Variable {name} not found in zarr store {self.zarr_dir}")
+        return self._channels[name]
+
+    def get_data(self, variable: VariableInfo | str, time: float) -> np.ndarray:
+        channel = self.get_channel(variable)
+        t = self._time_positions[self.time_index(time)]
+        if self.layout == ZarrLayout.V1:
+            frame = self._get_array(channel)[t, channel["index"]]
+        else:
+            frame = self._get_array(channel)[(*self._job_index, t)]
+        data: np.ndarray = np.asarray(frame, dtype=np.float64).ravel()
+        if channel.get("compact", False):
+            data = self._scatter(channel, data)
+        return data
+
+    def get_compact_data(self, variable: VariableInfo | str, time: float, indices: np.ndarray) -> np.ndarray:
+        # values at the element indices, compact channels stored at the same indices are read as is
+        channel = self.get_channel(variable)
+        if channel.get("compact", False) and np.array_equal(
+            self._root[f"domains/{channel['domain_name']}/volume_indices"][:], indices
+        ):
+            frame = self._get_array(channel)[(*self._job_index, self._time_positions[self.time_index(time)])]
+            data: np.ndarray = np.asarray(frame, dtype=np.float64).ravel()
+            return data
+        compact_data: np.ndarray = self.get_data(variable, time)[indices]
+        return compact_data
+
+    def get_data_blocks(self, variables: list[VariableInfo | str], time: float) -> list[np.ndarray]:
+        if self.workers == 1 or len(variables) < 2:
+            return [self.get_data(variable, time) for variable in variables]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="zarr-read") as pool:
+            return list(pool.map(lambda variable: self.get_data(variable, time), variables))
+
+    def get_time_series(
+        self, variable: VariableInfo | str, element_indices: np.ndarray, times: list[float] | None = None
+    ) -> np.ndarray:
+        # returns shape (num_times, num_elements), only the chunks holding the elements are read
+        channel = self.get_channel(variable)
+        if times is None:
+            times = self.data_times
+        positions = np.array([self._time_positions[self.time_index(time)] for time in times], dtype=np.int64)
+        element_indices = np.asarray(element_indices, dtype=np.int64)
+        array = self._get_array(channel)
+        result = np.zeros((positions.shape[0], element_indices.shape[0]))
+        selected = np.ones(element_indices.shape[0], dtype=bool)
+        if channel.get("compact", False):
+            # elements outside of the domain stay zero
+            volume_indices = self._root[f"domains/{channel['domain_name']}/volume_indices"][:]
+            compact_indices = np.minimum(np.searchsorted(volume_indices, element_indices), volume_indices.shape[0] - 1)
+            selected = volume_indices[compact_indices] == element_indices
+            coordinates: tuple[np.ndarray, ...] = (compact_indices[selected],)
+        elif channel.get("variable_type", VariableType.VOLUME.name) == VariableType.VOLUME.name:
+            coordinates = np.unravel_index(element_indices, self.mesh_shape)
+        else:
+            coordinates = (element_indices,)
+        if self.layout == ZarrLayout.V1:
+            coordinates = (np.full(coordinates[0].shape, channel["index"]), *coordinates)
+        selection = np.broadcast_arrays(
+            *[np.full((1, 1), job) for job in self._job_index],
+            positions[:, np.newaxis],
+            *[c[np.newaxis, :] for c in coordinates],
+        )
+        if selection[0].size > 0:
+            result[:, selected] = array.vindex[tuple(selection)]
+        return result
+
+    def get_quantiles(
+        self, variable: VariableInfo | str, q: float | list[float], region_index: int | None = None
+    ) -> np.ndarray:
+        # quantiles over all timepoints (of one volume/membrane region) from the histogram in the metadata
+        channel = self.get_channel(variable)
+        if region_index is None:
+            histogram = channel.get("histogram")
+        else:
+            region_histograms = {region["region_index"]: region for region in channel.get("region_histograms", [])}
+            histogram = region_histograms.get(region_index)
+        if histogram is None:
+            raise ValueError(f"no histogram of {channel['name']} stored, export with histograms=True")
+        return QuantileSketch.from_metadata(histogram).quantile(q)
+
+    def get_preview(self, variable: VariableInfo | str, time: float, name: str) -> np.ndarray:
+        # 2D preview (see PREVIEW_NAMES, e.g. "max_z") of a volume channel at one timepoint (layout v2)
+        channel = self.get_channel(variable)
+        if name not in channel.get("previews", {}):
+            raise ValueError(f"no preview {name} of {channel['name']} stored, export with previews=True")
+        t = self._time_positions[self.time_index(time)]
+        preview: np.ndarray = self._root[channel["previews"][name]][(*self._job_index, t)]
+        return preview
+
+    def get_post_processing_statistics(self) -> np.ndarray:
+        # (times, variables, statistics) post processing statistics, see metadata["post_processing"]
+        if "post_processing" not in self.metadata:
+            raise ValueError(f"no post processing stored in {self.zarr_dir}, export with post_processing")
+        statistics: np.ndarray = self._root["post_processing/statistics"][:]
+        return statistics
+
+    def get_post_processing_image(self, name: str, time: float) -> np.ndarray:
+        # post processing image (e.g. "fluor") at one of the post processing times
+        post_processing = self.metadata.get("post_processing", {})
+        images = {image["name"]: image for image in post_processing.get("images", [])}
+        if name not in images:
+            raise ValueError(f"no post processing image {name} stored in {self.zarr_dir}")
+        image: np.ndarray = self._root[images[name]["path"]][post_processing["times"].index(time)]
+        return image
+
+    def _get_array(self, channel: dict) -> Any:
+        if self.layout == ZarrLayout.V2:
+            return self._root[channel["path"]]
+        if isinstance(self._root, zarr.Group):
+            # multiscale pyramid, full resolution level
+            return self._root["0"]
+        return self._root
+
+    def _scatter(self, channel: dict, compact_data: np.ndarray) -> np.ndarray:
+        volume_indices = self._root[f"domains/{channel['domain_name']}/volume_indices"][:]
+        data = np.zeros(int(np.prod(self.mesh_shape)))
+        data[volume_indices] = compact_data
+        return data
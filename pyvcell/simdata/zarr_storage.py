@@ -0,0 +1,324 @@
+import dataclasses
+import warnings
+from collections.abc import Callable
+from enum import Enum
+from functools import partial
+from typing import Any
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.zarr_codecs import DeltaMode, TemporalDelta
+
+DEFAULT_TARGET_CHUNK_BYTES = 8 * 1024 * 1024
+DEFAULT_WRITE_BUFFER_BYTES = 512 * 1024 * 1024
+
+
+class AccessPattern(Enum):
+    # whole (or large parts of) single frames are read, chunks hold one timepoint
+    SPATIAL = "spatial"
+    # long time series of few elements are read, chunks span as many timepoints as possible
+    TIME_SERIES = "time_series"
+    # chunks are split as evenly as possible over time and space
+    BALANCED = "balanced"
+
+
+class Compressor(Enum):
+    BLOSC_LZ4 = "blosc-lz4"
+    BLOSC_ZSTD = "blosc-zstd"
+    ZSTD = "zstd"
+    GZIP = "gzip"
+    NONE = "none"
+
+
+def zarr_supports_sharding() -> bool:
+    return int(zarr.__version__.split(".")[0]) >= 3
+
+
+@dataclasses.dataclass
+class ZarrStorageOptions:
+    """
+    chunking, compression and sharding of exported zarr arrays
+
+    chunks given explicitly (for the array's full shape) take precedence, otherwise the chunk shape is
+    planned from access_pattern and target_chunk_bytes (see plan_chunks()). With neither, arrays keep
+    the historic one-frame-per-chunk layout. Chunks spanning several timepoints are assembled in memory
+    before writing, write_buffer_bytes bounds the total of these buffers (and therefore the time extent of
+    a chunk): it is split evenly across the arrays an export buffers at the same time (e.g. its channels).
+
+    shard_bytes groups chunks into shards of about that size (zarr v3 only, ignored with a warning otherwise).
+    Sharded arrays are compressed with the zarr v3 codec equivalent to compressor, they cannot be delta encoded.
+
+    delta_mode stores float arrays with the TemporalDelta filter (a keyframe and differences along time per
+    chunk, lossless "xor" or "quantize" with an absolute error_bound). It only pays off for chunks spanning
+    several timepoints, so chunks are planned for the BALANCED access pattern unless chunks or an access
+    pattern are given.
+    """
+
+    chunks: tuple[int, ...] | None = None
+    access_pattern: AccessPattern | None = None
+    target_chunk_bytes: int = DEFAULT_TARGET_CHUNK_BYTES
+    compressor: Compressor | None = None
+    compression_level: int | None = None
+    shard_bytes: int | None = None
+    dtype: str = "float64"
+    write_buffer_bytes: int = DEFAULT_WRITE_BUFFER_BYTES
+    delta_mode: DeltaMode | None = None
+    error_bound: float | None = None
+
+    def __post_init__(self) -> None:
+        if self.delta_mode == DeltaMode.QUANTIZE and (self.error_bound is None or self.error_bound <= 0):
+            raise ValueError(f"quantized delta encoding requires a positive error bound, found {self.error_bound}")
+        if self.delta_mode is not None and self.shard_bytes is not None and zarr_supports_sharding():
+            raise ValueError("temporal delta encoding is not supported for sharded arrays, unset shard_bytes")
+
+    def make_compressor(self) -> Any:
+        # no choice keeps the zarr default compressor, only Compressor.NONE disables compression
+        if self.compressor is None:
+            return "default"
+        level = self.compression_level
+        if self.compressor == Compressor.BLOSC_LZ4:
+            return zarr.Blosc(cname="lz4", clevel=5 if level is None else level, shuffle=zarr.Blosc.SHUFFLE)
+        if self.compressor == Compressor.BLOSC_ZSTD:
+            return zarr.Blosc(cname="zstd", clevel=3 if level is None else level, shuffle=zarr.Blosc.SHUFFLE)
+        if self.compressor == Compressor.ZSTD:
+            return zarr.Zstd(level=3 if level is None else level)
+        if self.compressor == Compressor.GZIP:
+            return zarr.GZip(level=6 if level is None else level)
+        return None
+
+    def make_sharded_compressors(self) -> Any:
+        # the zarr v3 codecs of make_compressor() for sharded arrays, "auto" keeps the zarr default
+        if self.compressor is None:
+            return "auto"
+        if self.compressor == Compressor.NONE:
+            return None
+        from zarr.codecs import BloscCodec, GzipCodec, ZstdCodec  # type: ignore[import-untyped]
+
+        level = self.compression_level
+        if self.compressor == Compressor.BLOSC_LZ4:
+            return BloscCodec(cname="lz4", clevel=5 if level is None else level, shuffle="shuffle")
+        if self.compressor == Compressor.BLOSC_ZSTD:
+            return BloscCodec(cname="zstd", clevel=3 if level is None else level, shuffle="shuffle")
+        if self.compressor == Compressor.ZSTD:
+            return ZstdCodec(level=3 if level is None else level)
+        return GzipCodec(level=6 if level is None else level)
+
+    def make_filters(self, chunks: tuple[int, ...], time_axis: int | None, dtype: str) -> list[Any] | None:
+        # None means no filters (non-float arrays and arrays without a time axis are never delta encoded)
+        if self.delta_mode is None or time_axis is None or np.dtype(dtype).kind != "f":
+            return None
+        if chunks[time_axis] == 1:
+            warnings.warn("temporal delta encoding has no effect on chunks of a single timepoint", stacklevel=3)
+        return [
+            TemporalDelta(
+                dtype=dtype,
+                time_chunk=chunks[time_axis],
+                frame_size=int(np.prod(chunks[time_axis + 1 :])),
+                mode=self.delta_mode.value,
+                error_bound=self.error_bound,
+            )
+        ]
+
+    def plan(
+        self,
+        shape: tuple[int, ...],
+        time_axis: int | None = 0,
+        unit_axes: tuple[int, ...] = (),
+        buffered_arrays: int = 1,
+    ) -> tuple[tuple[int, ...], tuple[int, ...] | None]:
+        # returns (chunks, shards) for an array of this shape, unit_axes (e.g. channels) always get chunk 1,
+        # buffered_arrays arrays of about this size share write_buffer_bytes
+        itemsize = np.dtype(self.dtype).itemsize
+        if self.chunks is not None:
+            if len(self.chunks) != len(shape):
+                raise ValueError(f"chunks {self.chunks} do not match array shape {shape}")
+            chunks = tuple(min(c, s) for c, s in zip(self.chunks, shape))
+        elif self.access_pattern is None and self.delta_mode is None:
+            chunks = tuple(1 if axis == time_axis or axis in unit_axes else s for axis, s in enumerate(shape))
+        else:
+            access_pattern = self.access_pattern or AccessPattern.BALANCED
+            chunks = plan_chunks(shape, itemsize, access_pattern, self.target_chunk_bytes, time_axis, unit_axes)
+
+        if time_axis is not None:
+            # bound the number of frames that must be buffered to fill one chunk along time
+            frame_bytes = itemsize * int(np.prod([s for axis, s in enumerate(shape) if axis != time_axis]))
+            buffer_bytes = self.write_buffer_bytes // max(buffered_arrays, 1)
+            max_time_chunk = max(1, buffer_bytes // max(frame_bytes, 1))
+            chunks = tuple(min(c, max_time_chunk) if axis == time_axis else c for axis, c in enumerate(chunks))
+
+        shards = None
+        if self.shard_bytes is not None:
+            if zarr_supports_sharding():
+                shards = plan_shards(shape, chunks, itemsize, self.shard_bytes, unit_axes)
+            else:
+                warnings.warn("zarr sharding requires zarr-python 3, writing unsharded arrays", stacklevel=2)
+        return chunks, shards
+
+    def create_array(
+        self,
+        group: Any,
+        path: str,
+        shape: tuple[int, ...],
+        time_axis: int | None = 0,
+        unit_axes: tuple[int, ...] = (),
+        dtype: str | None = None,
+        buffered_arrays: int = 1,
+    ) -> Any:
+        chunks, shards = self.plan(shape, time_axis=time_axis, unit_axes=unit_axes, buffered_arrays=buffered_arrays)
+        dtype = dtype or self.dtype
+        if shards is not None:
+            return group.create_array(
+                path,
+                shape=shape,
+                chunks=chunks,
+                shards=shards,
+                dtype=dtype,
+                compressors=self.make_sharded_compressors(),
+            )
+        return group.create_dataset(
+            path,
+            shape=shape,
+            chunks=chunks,
+            dtype=dtype,
+            compressor=self.make_compressor(),
+            filters=self.make_filters(chunks, time_axis, dtype),
+        )
+
+    def create_root_array(
+        self,
+        zarr_path: str,
+        shape: tuple[int, ...],
+        time_axis: int | None = 0,
+        unit_axes: tuple[int, ...] = (),
+        buffered_arrays: int = 1,
+    ) -> Any:
+        chunks, shards = self.plan(shape, time_axis=time_axis, unit_axes=unit_axes, buffered_arrays=buffered_arrays)
+        if shards is not None:
+            return zarr.create_array(
+                store=zarr_path,
+                shape=shape,
+                chunks=chunks,
+                shards=shards,
+                dtype=self.dtype,
+                compressors=self.make_sharded_compressors(),
+                overwrite=True,
+            )
+        return zarr.open(
+            zarr_path,
+            mode="w",
+            shape=shape,
+            chunks=chunks,
+            dtype=self.dtype,
+            compressor=self.make_compressor(),
+            filters=self.make_filters(chunks, time_axis, self.dtype),
+        )
+
+
+class TimeBlockBuffer:
+    """
+    collects frames of array[t, *index] until a whole chunk along time (axis 0) can be written
+
+    times are the timepoints that will be added (default: all of them), add() must be called in that order
+    and returns a callable writing the completed block (or None). Each block is written once, so blocks can
+    be written concurrently without read-modify-write races. on_written(times) is called after each write.
+    """
+
+    array: Any  # zarr.Array
+    index: tuple[int, ...]
+    time_chunk: int
+    on_written: Callable[[list[int]], None] | None
+    _last_time_of_block: dict[int, int]
+    _frames: dict[int, np.ndarray]
+
+    def __init__(
+        self,
+        array: Any,
+        index: tuple[int, ...] = (),
+        times: list[int] | None = None,
+        on_written: Callable[[list[int]], None] | None = None,
+    ) -> None:
+        self.array = array
+        self.index = index
+        self.time_chunk = array.chunks[0]
+        self.on_written = on_written
+        self._last_time_of_block = {}
+        for t in sorted(range(array.shape[0]) if times is None else times):
+            self._last_time_of_block[t // self.time_chunk] = t
+        self._frames = {}
+
+    def add(self, t: int, frame: np.ndarray) -> Callable[[], None] | None:
+        self._frames[t] = frame
+        if self._last_time_of_block[t // self.time_chunk] != t:
+            return None
+        block_times = sorted(self._frames)
+        block_frames = [self._frames.pop(s) for s in block_times]
+        return partial(self._write_block, block_times, block_frames)
+
+    def _write_block(self, times: list[int], frames: list[np.ndarray]) -> None:
+        if len(times) == 1:
+            self.array[(times[0], *self.index)] = frames[0]
+        elif times[-1] - times[0] + 1 == len(times):
+            self.array[(slice(times[0], times[-1] + 1), *self.index)] = np.stack(frames)
+        else:
+            # only some timepoints of the chunk are (re)written
+            for t, frame in zip(times, frames):
+                self.array[(t, *self.index)] = frame
+        if self.on_written is not None:
+            self.on_written(times)
+
+
+def plan_chunks(
+    shape: tuple[int, ...],
+    itemsize: int,
+    access_pattern: AccessPattern,
+    target_chunk_bytes: int,
+    time_axis: int | None = 0,
+    unit_axes: tuple[int, ...] = (),
+) -> tuple[int, ...]:
+    """
+    chooses a chunk shape of at most target_chunk_bytes (unless a single element is larger)
+
+    starting from the full array, the largest splittable axis is halved until the chunk fits. Spatial axes
+    are halved outermost first on ties, so chunks stay contiguous along the fastest varying axis.
+        SPATIAL      time chunk is 1, only spatial axes are split
+        TIME_SERIES  spatial axes are split first, time only once every spatial chunk is 1
+        BALANCED     time and spatial axes are split alike
+    """
+    chunks = [1 if axis in unit_axes else s for axis, s in enumerate(shape)]
+    spatial_axes = [axis for axis in range(len(shape)) if axis != time_axis and axis not in unit_axes]
+    if time_axis is not None and access_pattern == AccessPattern.SPATIAL:
+        chunks[time_axis] = 1
+    target_elements = max(1, target_chunk_bytes // itemsize)
+
+    def halve_largest(axes: list[int]) -> bool:
+        splittable = [axis for axis in axes if chunks[axis] > 1]
+        if len(splittable) == 0:
+            return False
+        axis = max(splittable, key=lambda a: chunks[a])
+        chunks[axis] = -(-chunks[axis] // 2)
+        return True
+
+    while int(np.prod(chunks)) > target_elements:
+        if access_pattern == AccessPattern.BALANCED and time_axis is not None:
+            if not halve_largest([time_axis, *spatial_axes]):
+                break
+        elif not halve_largest(spatial_axes) and (time_axis is None or not halve_largest([time_axis])):
+            break
+    return tuple(chunks)
+
+
+def plan_shards(
+    shape: tuple[int, ...], chunks: tuple[int, ...], itemsize: int, shard_bytes: int, unit_axes: tuple[int, ...] = ()
+) -> tuple[int, ...]:
+    # grows shards from the chunk shape, doubling the axis with the most chunks left, until about shard_bytes
+    shards = list(chunks)
+    while True:
+        candidates = [axis for axis in range(len(shape)) if axis not in unit_axes and shards[axis] < shape[axis]]
+        if len(candidates) == 0:
+            break
+        axis = max(candidates, key=lambda a: shape[a] / shards[a])
+        if int(np.prod(shards)) * 2 * itemsize > shard_bytes:
+            break
+        shards[axis] = min(shards[axis] * 2, -(-shape[axis] // chunks[axis]) * chunks[axis])
+    return tuple(shards)
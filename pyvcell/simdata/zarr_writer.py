@@ -1,92 +1,263 @@
+import copy
+import dataclasses
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import partial
 from pathlib import Path
+from typing import Any
 
 import numpy as np
 import zarr  # type: ignore[import-untyped]
 
+from pyvcell.simdata.export_pipeline import ExportPipeline
+from pyvcell.simdata.export_selection import ExportSelection, crop_frame
 from pyvcell.simdata.mesh import CartesianMesh
-from pyvcell.simdata.simdata_models import DataBlockHeader, DataFunctions, NamedFunction, PdeDataSet, VariableType
+from pyvcell.simdata.multiscale import get_pyramid_poolings, multiscales_metadata
+from pyvcell.simdata.postprocessing import PostProcessing, StatisticType
+from pyvcell.simdata.previews import PREVIEW_NAMES, PreviewProjector
+from pyvcell.simdata.quantile_sketch import QuantileSketch, compute_region_sketches
+from pyvcell.simdata.region_stats import RegionSegments
+from pyvcell.simdata.scan import ScanJob, get_scan_parameters
+from pyvcell.simdata.simdata_models import (
+    DataBlockHeader,
+    DataFunctions,
+    DataSetBackend,
+    NamedFunction,
+    VariableInfo,
+    VariableType,
+)
+from pyvcell.simdata.summary_stats import (
+    SUMMARY_STATISTICS,
+    SummaryStatistics,
+    compute_region_statistics,
+    compute_statistics,
+)
+from pyvcell.simdata.zarr_storage import AccessPattern, TimeBlockBuffer, ZarrStorageOptions
 
 
-def write_zarr(pde_dataset: PdeDataSet, data_functions: DataFunctions, mesh: CartesianMesh, zarr_dir: Path) -> None:
-    volume_data_vars: list[DataBlockHeader] = [
-        v for v in pde_dataset.variables_block_headers() if v.var_info.variable_type == VariableType.VOLUME
-    ]
-    volume_functions: list[NamedFunction] = [
-        f for f in data_functions.named_functions if f.variable_type == VariableType.VOLUME
-    ]
+class ZarrLayout(Enum):
+    # v1: a single (t, c, z, y, x) float64 array, region map in channel 0, statistics in attrs
+    V1 = "v1"
+    # v2: a group with static arrays stored once, one array per variable/function and statistics arrays
+    V2 = "v2"
+
+
+# last axis of the v2 "statistics" array (see SummaryStatistics.to_array())
+V2_STATISTICS = SUMMARY_STATISTICS
+
+
+def write_zarr(
+    pde_dataset: DataSetBackend,
+    data_functions: DataFunctions,
+    mesh: CartesianMesh,
+    zarr_dir: Path,
+    compact: bool = False,
+    workers: int = 1,
+    use_processes: bool = False,
+    layout: ZarrLayout | None = None,
+    storage: ZarrStorageOptions | None = None,
+    multiscale_levels: int = 0,
+    resume: bool = False,
+    selection: ExportSelection | None = None,
+    region_statistics: bool = False,
+    histograms: bool = False,
+    previews: bool = False,
+    post_processing: PostProcessing | None = None,
+) -> None:
+    """
+    converts the volume variables and volume functions of a simulation dataset to zarr
+
+    layout defaults to ZarrLayout.V1, or ZarrLayout.V2 when compact=True (compact storage requires v2).
+    storage selects chunking, compression, dtype and sharding of the data arrays (see ZarrStorageOptions),
+    by default each chunk holds one frame of one channel.
+
+    multiscale_levels > 0 (layout v1 only) writes an OME-NGFF multiscale pyramid instead of a single array:
+    a group with the full resolution array at "0" and levels "1".."n" downsampled by 2**level with region
+    aware pooling (see RegionPooling), computed in the same pass over the data.
+
+    resume=True (layout v2 only) continues an existing export instead of overwriting it, see write_zarr_v2().
+
+    selection restricts the export to matching variables/functions, a time range and a spatial crop (see
+    ExportSelection). Only the variables needed by the selected channels are read, only at the selected
+    timepoints, and only the selected functions are evaluated (on the cropped data).
+
+    workers > 1 overlaps reading (decompression), function evaluation and zarr compression/writes across
+    timepoints (see ExportPipeline), use_processes=True reads in worker processes instead of threads.
+
+    statistics of each frame are computed in one fused pass (see compute_statistics()) by the evaluate
+    workers, and merged over time into per channel "global_statistics" in the metadata (with
+    region_statistics=True also per volume region, or membrane region for membrane channels).
+    histograms=True also streams each channel's values into a QuantileSketch stored as "histogram" in the
+    channel metadata (and "region_histograms" with region_statistics), see ZarrDataSet.get_quantiles().
+
+    previews=True (layout v2 only) also stores small projection previews of every volume channel and
+    timepoint (see write_zarr_v2()), computed in the same pass.
+
+    post_processing (layout v2 only, read()) also stores the solver's post processing statistics and image
+    channels (see write_zarr_v2()), written alongside the channels.
+    """
+    if layout is None:
+        layout = ZarrLayout.V2 if compact else ZarrLayout.V1
+    if layout == ZarrLayout.V2:
+        if multiscale_levels > 0:
+            raise ValueError("multiscale pyramids require layout v1")
+        write_zarr_v2(
+            pde_dataset=pde_dataset,
+            data_functions=data_functions,
+            mesh=mesh,
+            zarr_dir=zarr_dir,
+            compact=compact,
+            workers=workers,
+            use_processes=use_processes,
+            storage=storage,
+            resume=resume,
+            selection=selection,
+            region_statistics=region_statistics,
+            histograms=histograms,
+            previews=previews,
+            post_processing=post_processing,
+        )
+        return
+    if compact:
+        raise ValueError("compact storage requires layout v2")
+    if resume:
+        raise ValueError("resuming an export requires layout v2")
+    if previews:
+        raise ValueError("previews require layout v2")
+    if post_processing is not None:
+        raise ValueError("post processing export requires layout v2")
+
+    plan = _plan_export(pde_dataset, data_functions, mesh, selection)
+    volume_data_vars, volume_functions = plan.variables, plan.functions
     num_channels = len(volume_data_vars) + len(volume_functions) + 1
-    num_t: int = len(pde_dataset.times())
-    times: list[float] = pde_dataset.times()
-    header = pde_dataset.first_data_zip_file_metadata().file_header
-    num_x: int = header.sizeX
-    num_y: int = header.sizeY
-    num_z: int = header.sizeZ
-
-    z1 = zarr.open(
-        str(zarr_dir.absolute()),
-        mode="w",
-        shape=(num_t, num_channels, num_z, num_y, num_x),
-        chunks=(1, 1, num_z, num_y, num_x),
-        dtype=float,
-    )
+    times: list[float] = plan.times
+    num_t: int = len(times)
+    mesh = plan.mesh
+    num_x, num_y, num_z = mesh.size
 
-    channel_metadata: list[dict] = []
-    for t in range(num_t):
-        bindings = {}
-        # add region map
-        region_map = mesh.volume_region_map.reshape((num_z, num_y, num_x))
-        z1[t, 0, :, :, :] = region_map
-        if t == 0:
-            channel_metadata.append({
-                "index": 0,
-                "label": "region_mask",
-                "domain_name": "all",
-                "min_value": np.min(region_map),
-                "max_value": np.max(region_map),
-            })
-
-        # add volumetric state variables
-        for i, v in enumerate(volume_data_vars):
-            var_data: np.ndarray = pde_dataset.get_data(v.var_info, times[t]).reshape((num_z, num_y, num_x))
-            c = i + 1
-            z1[t, c, :, :, :] = var_data
-            domain_name = v.var_info.var_name.split("::")[0]
-            var_name = v.var_info.var_name.split("::")[1]
-            bindings[var_name] = var_data
-            if t == 0:
-                channel_metadata.append({
-                    "index": c,
-                    "label": var_name,
-                    "domain_name": domain_name,
-                    "min_values": [],
-                    "max_values": [],
-                    "mean_values": [],
-                })
-            channel_metadata[c]["min_values"].append(np.min(var_data))
-            channel_metadata[c]["max_values"].append(np.max(var_data))
-            channel_metadata[c]["mean_values"].append(np.mean(var_data))
-
-        # add volumetric functions
-        for j, f in enumerate(volume_functions):
-            func_data = f.evaluate(variable_bindings=bindings).reshape((num_z, num_y, num_x))
-            c = i + j + 2
-            z1[t, c, :, :, :] = func_data
-            domain_name = f.name.split("::")[0]
-            function_name = f.name.split("::")[1]
-            if t == 0:
-                channel_metadata.append({
-                    "index": (i + j + 2),
-                    "label": function_name,
-                    "domain_name": domain_name,
-                    "min_values": [],
-                    "max_values": [],
-                    "mean_values": [],
-                })
-            channel_metadata[c]["min_values"].append(np.min(func_data))
-            channel_metadata[c]["max_values"].append(np.max(func_data))
-            channel_metadata[c]["mean_values"].append(np.mean(func_data))
-
-    z1.attrs["metadata"] = {
+    storage = storage or ZarrStorageOptions()
+    shape = (num_t, num_channels, num_z, num_y, num_x)
+    poolings = get_pyramid_poolings(mesh, multiscale_levels)
+    # the levels are buffered at the same time, each buffers all channels of its frames
+    num_levels = multiscale_levels + 1
+    if multiscale_levels == 0:
+        z1 = storage.create_root_array(str(zarr_dir.absolute()), shape=shape, unit_axes=(1,))
+        level_arrays = [z1]
+    else:
+        z1 = zarr.open_group(str(zarr_dir.absolute()), mode="w")
+        level_arrays = [storage.create_array(z1, "0", shape=shape, unit_axes=(1,), buffered_arrays=num_levels)]
+        for level, pooling in enumerate(poolings, start=1):
+            level_shape = (num_t, num_channels, *pooling.shape)
+            level_arrays.append(
+                storage.create_array(z1, str(level), shape=level_shape, unit_axes=(1,), buffered_arrays=num_levels)
+            )
+    # one buffer per (level, channel)
+    channel_buffers = [TimeBlockBuffer(array, index=(c,)) for array in level_arrays for c in range(num_channels)]
+    pending_writes: dict[int, list[Callable[[], None]]] = {}
+
+    region_map = mesh.volume_region_map.reshape((num_z, num_y, num_x))
+    level_region_maps = [region_map] + [pooling.region_map for pooling in poolings]
+    channel_metadata: list[dict] = [
+        {
+            "index": 0,
+            "label": "region_mask",
+            "domain_name": "all",
+            "min_value": np.min(region_map),
+            "max_value": np.max(region_map),
+        }
+    ]
+    channel_names = [v.var_info.var_name for v in volume_data_vars] + [f.name for f in volume_functions]
+    for c, name in enumerate(channel_names, start=1):
+        channel_metadata.append({
+            "index": c,
+            "label": name.split("::")[1],
+            "domain_name": name.split("::")[0],
+            "function": c > len(volume_data_vars),
+            "min_values": [],
+            "max_values": [],
+            "mean_values": [],
+        })
+
+    volume_segments = _get_volume_segments(mesh)
+    totals = [SummaryStatistics.empty() for _ in channel_names]
+    region_totals = [SummaryStatistics.empty((volume_segments.num_regions,)) for _ in channel_names]
+    sketches = [QuantileSketch() for _ in channel_names]
+    region_sketches = [[QuantileSketch() for _ in range(volume_segments.num_regions)] for _ in channel_names]
+
+    def evaluate(t: int, read_frames: list[np.ndarray]) -> _EvaluatedFrames:
+        bindings, var_frames = plan.split(read_frames)
+        func_frames = [
+            np.broadcast_to(f.evaluate(variable_bindings=bindings), mesh.volume_region_map.shape)
+            for f in volume_functions
+        ]
+        frames = [data.reshape((num_z, num_y, num_x)) for data in var_frames + func_frames]
+        return _EvaluatedFrames(
+            # downsampled levels follow the full resolution frames, level by level
+            frames=frames + [pooling.pool(data) for pooling in poolings for data in frames],
+            statistics=[compute_statistics(data) for data in frames],
+            region_statistics=(
+                [compute_region_statistics(data, volume_segments) for data in frames] if region_statistics else []
+            ),
+            sketches=[_sketch(data) for data in frames] if histograms else [],
+            region_sketches=(
+                [compute_region_sketches(data, volume_segments) for data in frames]
+                if histograms and region_statistics
+                else []
+            ),
+        )
+
+    def reduce(t: int, evaluated: _EvaluatedFrames) -> None:
+        frames = evaluated.frames
+        num_data_channels = num_channels - 1
+        for c, summary in enumerate(evaluated.statistics):
+            minimum, maximum, mean = summary.to_array()[:3].tolist()
+            channel_metadata[c + 1]["min_values"].append(minimum)
+            channel_metadata[c + 1]["max_values"].append(maximum)
+            channel_metadata[c + 1]["mean_values"].append(mean)
+            totals[c] = totals[c].merge(summary)
+        for c, region_summary in enumerate(evaluated.region_statistics):
+            region_totals[c] = region_totals[c].merge(region_summary)
+        _merge_sketches(sketches, region_sketches, evaluated)
+        # runs in time order, so chunks spanning several timepoints are completed here (region map in channel 0)
+        level_frames = [
+            [level_region_map, *frames[level * num_data_channels : (level + 1) * num_data_channels]]
+            for level, level_region_map in enumerate(level_region_maps)
+        ]
+        block_writes = [
+            buffer.add(t, data)
+            for buffer, data in zip(
+                channel_buffers, [data for channel_frames in level_frames for data in channel_frames]
+            )
+        ]
+        pending_writes[t] = [block_write for block_write in block_writes if block_write is not None]
+
+    def write(t: int, evaluated: _EvaluatedFrames) -> None:
+        for block_write in pending_writes.pop(t):
+            block_write()
+
+    ExportPipeline(
+        read=plan.get_reader(pde_dataset),
+        evaluate=evaluate,
+        reduce=reduce,
+        write=write,
+        workers=workers,
+        use_processes=use_processes,
+    ).run(list(range(num_t)))
+
+    for c in range(len(channel_names)):
+        channel_metadata[c + 1]["global_statistics"] = totals[c].to_metadata()
+        if region_statistics:
+            channel_metadata[c + 1]["region_statistics"] = _region_statistics_metadata(
+                region_totals[c], volume_segments.region_ids
+            )
+        if histograms:
+            channel_metadata[c + 1].update(
+                _histogram_metadata(sketches[c], region_sketches[c], volume_segments.region_ids, region_statistics)
+            )
+
+    metadata: dict = {
         "axes": [
             {"name": "t", "type": "time", "unit": "second"},
             {"name": "c", "type": "channel", "unit": None},
@@ -96,22 +267,846 @@ def write_zarr(pde_dataset: PdeDataSet, data_functions: DataFunctions, mesh: Car
         ],
         "channels": channel_metadata,
         "times": times,
+        "mesh": _mesh_metadata(mesh),
+    }
+    if selection is not None:
+        metadata["selection"] = selection.metadata(plan.source_mesh)
+    z1.attrs["metadata"] = metadata
+    if multiscale_levels > 0:
+        z1.attrs["multiscales"] = multiscales_metadata(mesh, poolings, name=zarr_dir.name)
+
+
+def write_zarr_v2(
+    pde_dataset: DataSetBackend,
+    data_functions: DataFunctions,
+    mesh: CartesianMesh,
+    zarr_dir: Path,
+    compact: bool = False,
+    workers: int = 1,
+    use_processes: bool = False,
+    storage: ZarrStorageOptions | None = None,
+    resume: bool = False,
+    selection: ExportSelection | None = None,
+    region_statistics: bool = False,
+    histograms: bool = False,
+    previews: bool = False,
+    post_processing: PostProcessing | None = None,
+) -> None:
+    """
+    writes volume and membrane variables and functions as a zarr group (layout v2) with consolidated metadata
+
+    zarr group layout:
+        times                            (t,) float64
+        completed                        (t,) bool, set once all arrays of the timepoint are written
+        region_map                       (z, y, x) uint16, written once
+        mesh/membrane_elements           (m, 8) int32, written once
+        mesh/membrane_region_map         (m,) uint16 membrane region of each membrane element, written once
+        data/<domain>/<name>             (t, z, y, x) per volume variable or function (storage.dtype), or if
+                                         compact (t, n) values at domains/<domain>/volume_indices
+        data/<membrane>/<name>           (t, m) per membrane variable or function, chunked for time series
+                                         unless storage sets chunks or an access pattern
+        domains/<domain>/volume_indices  (n,) global volume element indices of the domain (compact only)
+        statistics                       (t, c, s) float64, s indexes V2_STATISTICS, computed inside the domain
+        region_statistics/<domain>/<name>  (t, r, s) float64 per region of the channel's domain (volume or
+                                         membrane regions "region_ids" of the channel), if region_statistics
+        previews/<domain>/<name>/<preview>  (t, a, b) float32 per volume channel and PREVIEW_NAMES entry, if previews:
+                                         max_<axis> / mean_<axis> projections along z, y or x and the central
+                                         slice_<axis> orthogonal to it, of the voxels inside the domain
+        post_processing/times            (p,) float64 times of the solver's post processing, if post_processing
+        post_processing/statistics       (p, v, 4) float64 per post processing variable, the last axis indexes
+                                         StatisticType (average, total, min, max)
+        post_processing/images/<name>    (p, ...) per post processing image channel (e.g. fluor, storage.dtype)
+
+    channel c of "statistics" is attrs["metadata"]["channels"][c], its "variable_type" is VOLUME or
+    MEMBRANE. With compact storage, use CartesianMesh.scatter() (or numpy fancy indexing with volume_indices)
+    to rebuild full volume frames. Membrane functions take volume variables from the adjacent volume element
+    in the variable's domain (NaN where the membrane does not touch it, excluded from statistics).
+    Membrane data is not exported with a spatial selection (the cropped mesh has no membrane elements).
+    Statistics over all (completed) timepoints are added as "global_statistics" of each channel (and
+    "region_statistics" per region) once the export is done, as are the histograms (computed inside the
+    domain like the statistics, completed timepoints of earlier runs are read back from the store).
+
+    resume=True continues an existing store (e.g. an interrupted export, or a simulation that has produced
+    more timepoints since): the time axis grows to the dataset's times and only timepoints not yet marked
+    in "completed" are written. Existing chunks of completed timepoints are not rewritten (except for a
+    shared, partially written chunk when time chunks span several timepoints).
+
+    post_processing is exported whole (no selection applies) by a separate thread while the channels are
+    written, it is described in attrs["metadata"]["post_processing"] with the extents and origin of each
+    image. On resume it is rewritten.
+    """
+    plan = _plan_export(pde_dataset, data_functions, mesh, selection, membrane=True)
+    storage = storage or ZarrStorageOptions()
+    metadata = _v2_metadata(plan, compact, region_statistics, previews)
+    if selection is not None:
+        metadata["selection"] = selection.metadata(plan.source_mesh)
+
+    if resume and zarr_dir.exists():
+        root = zarr.open_group(str(zarr_dir.absolute()), mode="r+")
+        completed = _resume_v2(root, metadata, plan.times)
+    else:
+        root = _create_v2(zarr_dir, plan.mesh, metadata, plan.times, storage)
+        completed = np.zeros(len(plan.times), dtype=bool)
+    # write the metadata first, so an interrupted export can be resumed
+    root.attrs["metadata"] = metadata
+    zarr.consolidate_metadata(root.store)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="post-processing") as pool:
+        post_processing_export = None
+        if post_processing is not None:
+            post_processing_export = pool.submit(_export_post_processing, root, post_processing, storage)
+        _export_v2(pde_dataset, plan, metadata, root, completed, workers, use_processes, histograms)
+        if post_processing_export is not None:
+            metadata["post_processing"] = post_processing_export.result()
+    root.attrs["metadata"] = metadata
+    zarr.consolidate_metadata(root.store)
+
+
+def write_scan_zarr(
+    jobs: list[ScanJob],
+    mesh: CartesianMesh,
+    zarr_dir: Path,
+    compact: bool = False,
+    workers: int = 1,
+    job_workers: int = 1,
+    use_processes: bool = False,
+    storage: ZarrStorageOptions | None = None,
+    selection: ExportSelection | None = None,
+    region_statistics: bool = False,
+    histograms: bool = False,
+    previews: bool = False,
+) -> None:
+    """
+    writes all jobs of a parameter scan into one layout v2 store with a leading job axis
+
+    the jobs must share the mesh, channels and times. Time dependent arrays ("completed", data, statistics,
+    region statistics and previews) are (j, t, ...) with one chunk per job along j, static arrays (times,
+    region map, mesh and domain indices) are stored once. A cross-job slice such as
+    root["data/cytosol/C_cyt"][:, t, z, y, x] is a single read of the store.
+
+    metadata["jobs"][j] holds the job's "job_id", its "parameters" and per channel statistics (and histograms),
+    metadata["scan_parameters"] the values per job of the constants varied by the scan. Channel statistics
+    and histograms in metadata["channels"] cover all jobs.
+
+    job_workers jobs are converted concurrently, each with its own export pipeline of workers (see write_zarr()).
+    """
+    if len(jobs) == 0:
+        raise ValueError("a scan export needs at least one job")
+    plans = [_plan_export(job.pde_dataset, job.data_functions, mesh, selection, membrane=True) for job in jobs]
+    storage = storage or ZarrStorageOptions()
+    metadata = _v2_metadata(plans[0], compact, region_statistics, previews)
+    channel_names = [channel["name"] for channel in metadata["channels"]]
+    for job, plan in zip(jobs, plans):
+        job_channel_names = [channel["name"] for channel in _v2_metadata(plan, compact, False, False)["channels"]]
+        if job_channel_names != channel_names or plan.times != plans[0].times:
+            raise ValueError(f"job {job.job_id} does not share the channels and times of job {jobs[0].job_id}")
+    if selection is not None:
+        metadata["selection"] = selection.metadata(plans[0].source_mesh)
+    metadata["jobs"] = [{"index": j, "job_id": job.job_id, "parameters": job.parameters} for j, job in enumerate(jobs)]
+    metadata["scan_parameters"] = get_scan_parameters(jobs)
+
+    root = _create_v2(zarr_dir, plans[0].mesh, metadata, plans[0].times, storage, num_jobs=len(jobs))
+    root.attrs["metadata"] = metadata
+    zarr.consolidate_metadata(root.store)
+
+    def export_job(j: int) -> list[dict]:
+        job_metadata = copy.deepcopy(metadata)
+        _export_v2(
+            jobs[j].pde_dataset,
+            plans[j],
+            job_metadata,
+            _JobGroup(root, j),
+            np.zeros(len(plans[j].times), dtype=bool),
+            workers,
+            use_processes,
+            histograms,
+        )
+        channels: list[dict] = job_metadata["channels"]
+        return channels
+
+    with ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix="scan-job") as pool:
+        job_channels = list(pool.map(export_job, range(len(jobs))))
+
+    summary_keys = ["global_statistics", "region_statistics", "histogram", "region_histograms"]
+    for job_metadata, channels in zip(metadata["jobs"], job_channels):
+        job_metadata["channels"] = [
+            {"name": channel["name"], **{key: channel[key] for key in summary_keys if key in channel}}
+            for channel in channels
+        ]
+    # statistics over all jobs
+    completed = root["completed"][:]
+    totals = SummaryStatistics.from_array(root["statistics"][:][completed]).combine(axis=0)
+    for c, channel in enumerate(metadata["channels"]):
+        channel["global_statistics"] = totals.get(c).to_metadata()
+        if region_statistics:
+            region_totals = SummaryStatistics.from_array(root[_region_statistics_path(channel)][:][completed])
+            channel["region_statistics"] = _region_statistics_metadata(
+                region_totals.combine(axis=0), channel["region_ids"]
+            )
+        if histograms:
+            sketch = QuantileSketch()
+            region_ids = channel.get("region_ids", [])
+            region_sketches = [QuantileSketch() for _ in region_ids]
+            for channels in job_channels:
+                sketch.merge(QuantileSketch.from_metadata(channels[c]["histogram"]))
+                # the jobs share the mesh, so their region histograms are in the order of region_ids
+                for region_sketch, region_histogram in zip(region_sketches, channels[c].get("region_histograms", [])):
+                    region_sketch.merge(QuantileSketch.from_metadata(region_histogram))
+            channel.update(_histogram_metadata(sketch, region_sketches, region_ids, region_statistics))
+    root.attrs["metadata"] = metadata
+    zarr.consolidate_metadata(root.store)
+
+
+def _v2_metadata(plan: "_ExportPlan", compact: bool, region_statistics: bool, previews: bool) -> dict:
+    mesh = plan.mesh
+    channels: list[tuple[str, VariableType, bool]] = [
+        *[(v.var_info.var_name, VariableType.VOLUME, False) for v in plan.variables],
+        *[(f.name, VariableType.VOLUME, True) for f in plan.functions],
+        *[(v.var_info.var_name, VariableType.MEMBRANE, False) for v in plan.membrane_variables],
+        *[(f.name, VariableType.MEMBRANE, True) for f in plan.membrane_functions],
+    ]
+    metadata: dict = {
+        "layout": ZarrLayout.V2.value,
+        "compact": compact,
+        "channels": [
+            {
+                "index": c,
+                "name": name,
+                "label": name.split("::")[1],
+                "domain_name": name.split("::")[0],
+                "path": f"data/{name.split('::')[0]}/{name.split('::')[1]}",
+                "variable_type": variable_type.name,
+                "compact": compact and variable_type == VariableType.VOLUME,
+                "function": is_function,
+            }
+            for c, (name, variable_type, is_function) in enumerate(channels)
+        ],
+        "region_statistics": region_statistics,
+        "previews": previews,
         "mesh": {
-            "size": mesh.size,
-            "extent": mesh.extent,
-            "origin": mesh.origin,
-            "volume_regions": [
-                {
-                    "region_index": mesh.volume_regions[i][0],
-                    "domain_type_index": mesh.volume_regions[i][1],
-                    "volume": mesh.volume_regions[i][2],
-                    "domain_name": mesh.volume_regions[i][3],
-                }
-                for i in range(len(mesh.volume_regions))
+            **_mesh_metadata(mesh),
+            "membrane_regions": [
+                {"region_index": mem_reg_id, "volume_region_1": vol_reg1, "volume_region_2": vol_reg2, "area": surface}
+                for mem_reg_id, vol_reg1, vol_reg2, surface in mesh.membrane_regions
             ],
         },
     }
-    z1.attrs["metadata"]["mesh"] = {
+    for channel in metadata["channels"]:
+        if region_statistics:
+            channel["region_ids"] = _get_channel_segments(mesh, channel).region_ids.tolist()
+        # membrane channels have no previews
+        if previews and channel["variable_type"] == VariableType.VOLUME.name:
+            channel["previews"] = {name: f"{_previews_path(channel)}/{name}" for name in PREVIEW_NAMES}
+    return metadata
+
+
+def _export_v2(
+    pde_dataset: DataSetBackend,
+    plan: "_ExportPlan",
+    metadata: dict,
+    root: Any,
+    completed: np.ndarray,
+    workers: int,
+    use_processes: bool,
+    histograms: bool,
+) -> None:
+    # writes the timepoints not yet completed into the arrays of root (see write_zarr_v2()), then adds the
+    # global statistics (and histograms) to the channels of metadata
+    volume_data_vars, volume_functions = plan.variables, plan.functions
+    num_t = len(plan.times)
+    mesh = plan.mesh
+    num_x, num_y, num_z = mesh.size
+    compact: bool = metadata["compact"]
+    region_statistics: bool = metadata["region_statistics"]
+    channel_names = [channel["name"] for channel in metadata["channels"]]
+    is_membrane = [channel["variable_type"] == VariableType.MEMBRANE.name for channel in metadata["channels"]]
+    channel_segments = [_get_channel_segments(mesh, channel) for channel in metadata["channels"]]
+    # one projector per volume domain
+    projectors: dict[str, PreviewProjector] = {}
+    for channel in metadata["channels"]:
+        domain_name = channel["domain_name"]
+        if "previews" in channel and domain_name not in projectors:
+            mask = np.zeros(mesh.volume_region_map.shape, dtype=bool)
+            mask[mesh.get_volume_domain_indices(domain_name)] = True
+            projectors[domain_name] = PreviewProjector((num_z, num_y, num_x), mask)
+
+    missing_times = [t for t in range(num_t) if not completed[t]]
+    completion = _CompletionTracker(root["completed"], writes_per_time=len(channel_names) + 1)
+    buffers = [
+        TimeBlockBuffer(root[channel["path"]], times=missing_times, on_written=completion.written)
+        for channel in metadata["channels"]
+    ]
+    statistics_arrays = [root["statistics"]]
+    if region_statistics:
+        statistics_arrays += [root[_region_statistics_path(channel)] for channel in metadata["channels"]]
+    preview_arrays = [root[path] for channel in metadata["channels"] for path in channel.get("previews", {}).values()]
+    pending_writes: dict[int, list[Callable[[], None]]] = {}
+    sketches = [QuantileSketch() for _ in channel_names]
+    region_sketches = [[QuantileSketch() for _ in range(segments.num_regions)] for segments in channel_segments]
+
+    def domain_values(c: int, data: np.ndarray) -> np.ndarray:
+        # volume statistics are computed inside the domain, NaNs (membrane functions) are only counted
+        return data if compact or is_membrane[c] else mesh.compact(data, channel_names[c].split("::")[0])
+
+    def project(c: int, data: np.ndarray) -> list[np.ndarray]:
+        domain_name = channel_names[c].split("::")[0]
+        if compact:
+            data = mesh.scatter(data, domain_name, fill_value=np.nan)
+        return list(projectors[domain_name].project(data).values())
+
+    def evaluate(t: int, read_frames: list[np.ndarray]) -> _EvaluatedFrames:
+        frames = evaluate_frames(read_frames)
+        return _EvaluatedFrames(
+            frames=frames,
+            statistics=[compute_statistics(domain_values(c, data)) for c, data in enumerate(frames)],
+            region_statistics=(
+                [compute_region_statistics(data, segments) for data, segments in zip(frames, channel_segments)]
+                if region_statistics
+                else []
+            ),
+            sketches=[_sketch(domain_values(c, data)) for c, data in enumerate(frames)] if histograms else [],
+            region_sketches=(
+                [compute_region_sketches(data, segments) for data, segments in zip(frames, channel_segments)]
+                if histograms and region_statistics
+                else []
+            ),
+            previews=[
+                image
+                for c, data in enumerate(frames)
+                if "previews" in metadata["channels"][c]
+                for image in project(c, data)
+            ],
+        )
+
+    def evaluate_frames(read_frames: list[np.ndarray]) -> list[np.ndarray]:
+        bindings, var_frames = plan.split(read_frames)
+        if not compact:
+            func_frames = [
+                np.broadcast_to(f.evaluate(bindings), mesh.volume_region_map.shape) for f in volume_functions
+            ]
+            return var_frames + func_frames + plan.get_membrane_frames(read_frames)
+        frames = [
+            mesh.compact(data, v.var_info.var_name.split("::")[0]) for v, data in zip(volume_data_vars, var_frames)
+        ]
+        for f in volume_functions:
+            # functions are only evaluated inside their own domain
+            domain_name = f.name.split("::")[0]
+            func_data = f.evaluate({name: mesh.compact(data, domain_name) for name, data in bindings.items()})
+            frames.append(np.broadcast_to(func_data, mesh.get_volume_domain_indices(domain_name).shape))
+        return frames + plan.get_membrane_frames(read_frames)
+
+    def reduce(t: int, evaluated: _EvaluatedFrames) -> None:
+        statistics_rows = [np.stack([summary.to_array() for summary in evaluated.statistics])]
+        statistics_rows += [summary.to_array() for summary in evaluated.region_statistics]
+        statistics_rows += evaluated.previews
+        block_writes = [
+            buffer.add(t, data if compact or is_membrane[c] else data.reshape((num_z, num_y, num_x)))
+            for c, (buffer, data) in enumerate(zip(buffers, evaluated.frames))
+        ]
+        pending_writes[t] = [block_write for block_write in block_writes if block_write is not None]
+        pending_writes[t].append(
+            partial(_write_rows, statistics_arrays + preview_arrays, t, statistics_rows, completion)
+        )
+        _merge_sketches(sketches, region_sketches, evaluated)
+
+    def write(t: int, evaluated: _EvaluatedFrames) -> None:
+        for block_write in pending_writes.pop(t):
+            block_write()
+
+    ExportPipeline(
+        read=plan.get_reader(pde_dataset),
+        evaluate=evaluate,
+        reduce=reduce,
+        write=write,
+        workers=workers,
+        use_processes=use_processes,
+    ).run(missing_times)
+
+    # global statistics over all completed timepoints, including those of earlier (resumed) runs
+    completed = root["completed"][:]
+    totals = SummaryStatistics.from_array(root["statistics"][:][completed]).combine(axis=0)
+    for c, channel in enumerate(metadata["channels"]):
+        channel["global_statistics"] = totals.get(c).to_metadata()
+        if region_statistics:
+            region_totals = SummaryStatistics.from_array(root[_region_statistics_path(channel)][:][completed])
+            channel["region_statistics"] = _region_statistics_metadata(
+                region_totals.combine(axis=0), channel["region_ids"]
+            )
+    if histograms:
+        exported_times = set(missing_times)
+        for t in [t for t in range(num_t) if completed[t] and t not in exported_times]:
+            frames = [
+                np.asarray(root[channel["path"]][t], dtype=np.float64).ravel() for channel in metadata["channels"]
+            ]
+            _merge_sketches(
+                sketches,
+                region_sketches,
+                _EvaluatedFrames(
+                    frames=frames,
+                    statistics=[],
+                    region_statistics=[],
+                    sketches=[_sketch(domain_values(c, data)) for c, data in enumerate(frames)],
+                    region_sketches=(
+                        [compute_region_sketches(data, segments) for data, segments in zip(frames, channel_segments)]
+                        if region_statistics
+                        else []
+                    ),
+                ),
+            )
+        for c, (channel, segments) in enumerate(zip(metadata["channels"], channel_segments)):
+            channel.update(_histogram_metadata(sketches[c], region_sketches[c], segments.region_ids, region_statistics))
+
+
+def _create_v2(
+    zarr_dir: Path,
+    mesh: CartesianMesh,
+    metadata: dict,
+    times: list[float],
+    storage: ZarrStorageOptions,
+    num_jobs: int | None = None,
+) -> Any:
+    # with num_jobs, time dependent arrays get a leading job axis (one chunk per job), static arrays are shared
+    num_t = len(times)
+    num_x, num_y, num_z = mesh.size
+    compact: bool = metadata["compact"]
+    job_shape: tuple[int, ...] = () if num_jobs is None else (num_jobs,)
+    job_chunks: tuple[int, ...] = () if num_jobs is None else (1,)
+    time_axis = len(job_shape)
+    job_axes = tuple(range(time_axis))
+    root = zarr.open_group(str(zarr_dir.absolute()), mode="w")
+    root.create_dataset("times", data=np.array(times, dtype=np.float64))
+    root.zeros("completed", shape=(*job_shape, num_t), chunks=(*job_chunks, 1), dtype=bool)
+    region_map = mesh.volume_region_map.reshape((num_z, num_y, num_x))
+    root.create_dataset("region_map", data=region_map, chunks=region_map.shape)
+    root.create_dataset("mesh/membrane_elements", data=mesh.membrane_elements)
+    root.create_dataset("mesh/membrane_region_map", data=mesh.membrane_elements[:, 7].astype(np.uint16))
+
+    if compact:
+        for domain_name in sorted({channel["domain_name"] for channel in metadata["channels"] if channel["compact"]}):
+            indices = mesh.get_volume_domain_indices(domain_name)
+            root.create_dataset(f"domains/{domain_name}/volume_indices", data=indices, chunks=indices.shape)
+
+    # membrane data is mostly read as time series of a few elements
+    # the channel arrays are buffered at the same time and share the write buffer
+    num_channels = len(metadata["channels"])
+    membrane_storage = storage
+    if storage.chunks is None and storage.access_pattern is None:
+        membrane_storage = dataclasses.replace(storage, access_pattern=AccessPattern.TIME_SERIES)
+    for channel in metadata["channels"]:
+        if channel["variable_type"] == VariableType.MEMBRANE.name:
+            channel_storage = membrane_storage
+            shape: tuple[int, ...] = (num_t, mesh.membrane_elements.shape[0])
+        elif compact:
+            channel_storage = storage
+            shape = (num_t, mesh.get_volume_domain_indices(channel["domain_name"]).shape[0])
+        else:
+            channel_storage = storage
+            shape = (num_t, num_z, num_y, num_x)
+        array = channel_storage.create_array(
+            root,
+            channel["path"],
+            shape=(*job_shape, *shape),
+            time_axis=time_axis,
+            unit_axes=job_axes,
+            buffered_arrays=num_channels,
+        )
+        array.attrs["name"] = channel["name"]
+        array.attrs["domain_name"] = channel["domain_name"]
+        array.attrs["compact"] = channel["compact"]
+        array.attrs["variable_type"] = channel["variable_type"]
+
+    # one chunk per timepoint, so rows can be written concurrently and appended
+    statistics_array = root.full(
+        "statistics",
+        shape=(*job_shape, num_t, num_channels, len(V2_STATISTICS)),
+        chunks=(*job_chunks, 1, num_channels, len(V2_STATISTICS)),
+        fill_value=np.nan,
+        dtype=np.float64,
+    )
+    statistics_array.attrs["statistics"] = V2_STATISTICS
+    if metadata["region_statistics"]:
+        for channel in metadata["channels"]:
+            num_regions = len(channel["region_ids"])
+            region_statistics_array = root.full(
+                _region_statistics_path(channel),
+                shape=(*job_shape, num_t, num_regions, len(V2_STATISTICS)),
+                chunks=(*job_chunks, 1, num_regions, len(V2_STATISTICS)),
+                fill_value=np.nan,
+                dtype=np.float64,
+            )
+            region_statistics_array.attrs["statistics"] = V2_STATISTICS
+            region_statistics_array.attrs["region_ids"] = channel["region_ids"]
+    for channel in metadata["channels"]:
+        if "previews" not in channel:
+            continue
+        projector = PreviewProjector((num_z, num_y, num_x))
+        for name, (num_a, num_b) in projector.preview_shapes().items():
+            root.full(
+                channel["previews"][name],
+                shape=(*job_shape, num_t, num_a, num_b),
+                chunks=(*job_chunks, 1, num_a, num_b),
+                fill_value=np.nan,
+                dtype=np.float32,
+            )
+    return root
+
+
+def _export_post_processing(root: Any, post_processing: PostProcessing, storage: ZarrStorageOptions) -> dict:
+    # writes the post_processing arrays (see write_zarr_v2()), returns their metadata
+    if "post_processing" in root:
+        del root["post_processing"]
+    root.create_dataset("post_processing/times", data=np.asarray(post_processing.times, dtype=np.float64))
+    statistics_array = root.create_dataset(
+        "post_processing/statistics", data=post_processing.statistics, dtype=np.float64
+    )
+    statistic_names = [statistic.name.lower() for statistic in StatisticType]
+    variable_names = [variable.var_name for variable in post_processing.variables[:: len(StatisticType)]]
+    statistics_array.attrs["statistics"] = statistic_names
+    statistics_array.attrs["variables"] = variable_names
+    images = []
+    num_t = len(post_processing.times)
+    for image_metadata in post_processing.image_metadata:
+        path = f"post_processing/images/{image_metadata.name}"
+        array = storage.create_array(root, path, shape=(num_t, *image_metadata.shape))
+        # one read per time chunk, into one buffer
+        time_chunk = array.chunks[0]
+        for start in range(0, num_t, time_chunk):
+            time_indices = list(range(start, min(start + time_chunk, num_t)))
+            array[start : time_indices[-1] + 1] = post_processing.read_images(image_metadata, time_indices)
+        images.append({
+            "name": image_metadata.name,
+            "path": path,
+            "shape": list(image_metadata.shape),
+            "extents": image_metadata.extents.tolist(),
+            "origin": image_metadata.origin.tolist(),
+        })
+    return {
+        "times": [float(time) for time in post_processing.times],
+        "statistics": statistic_names,
+        "variables": variable_names,
+        # units[v][s] of statistic s of variable v
+        "units": [
+            [variable.stat_var_unit for variable in post_processing.variables[v : v + len(StatisticType)]]
+            for v in range(0, len(post_processing.variables), len(StatisticType))
+        ],
+        "images": images,
+    }
+
+
+def _resume_v2(root: Any, metadata: dict, times: list[float]) -> np.ndarray:
+    # grows the time axis of an existing v2 store, returns the completed flags of all times
+    stored_metadata = root.attrs.get("metadata")
+    if stored_metadata is None or stored_metadata.get("layout") != ZarrLayout.V2.value:
+        raise ValueError("cannot resume export, the existing zarr store is not a layout v2 export")
+    if stored_metadata["compact"] != metadata["compact"]:
+        raise ValueError("cannot resume export, compact storage does not match the existing zarr store")
+    stored_names = [channel["name"] for channel in stored_metadata["channels"]]
+    names = [channel["name"] for channel in metadata["channels"]]
+    if stored_names != names:
+        raise ValueError(f"cannot resume export, channels {names} do not match stored channels {stored_names}")
+    if list(stored_metadata["mesh"]["size"]) != list(metadata["mesh"]["size"]):
+        raise ValueError("cannot resume export, mesh size does not match the existing zarr store")
+    if list(root["statistics"].attrs.get("statistics", [])) != V2_STATISTICS:
+        raise ValueError("cannot resume export, the existing zarr store has different statistics")
+    if stored_metadata.get("region_statistics", False) != metadata["region_statistics"]:
+        raise ValueError("cannot resume export, region statistics do not match the existing zarr store")
+    if stored_metadata.get("previews", False) != metadata["previews"]:
+        raise ValueError("cannot resume export, previews do not match the existing zarr store")
+    stored_times = root["times"][:]
+    if len(stored_times) > len(times) or not np.array_equal(stored_times, times[: len(stored_times)]):
+        raise ValueError("cannot resume export, dataset times do not extend the stored times")
+
+    num_t = len(times)
+    if num_t > len(stored_times):
+        # resizing only rewrites array metadata, existing chunks are kept
+        paths = ["times", "completed", "statistics", *[channel["path"] for channel in metadata["channels"]]]
+        if metadata["region_statistics"]:
+            paths += [_region_statistics_path(channel) for channel in metadata["channels"]]
+        paths += [path for channel in metadata["channels"] for path in channel.get("previews", {}).values()]
+        for path in paths:
+            root[path].resize((num_t, *root[path].shape[1:]))
+        root["times"][len(stored_times) :] = times[len(stored_times) :]
+    completed: np.ndarray = root["completed"][:]
+    return completed
+
+
+class _JobArray:
+    # the (j, t, ...) array of a scan store seen as the (t, ...) array of job j
+
+    array: Any  # zarr.Array
+    job: int
+
+    def __init__(self, array: Any, job: int) -> None:
+        self.array = array
+        self.job = job
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return tuple(self.array.shape[1:])
+
+    @property
+    def chunks(self) -> tuple[int, ...]:
+        return tuple(self.array.chunks[1:])
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.array[(self.job, *(key if isinstance(key, tuple) else (key,)))]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.array[(self.job, *(key if isinstance(key, tuple) else (key,)))] = value
+
+
+class _JobGroup:
+    # the arrays of job j of a scan store, see _JobArray
+
+    root: Any  # zarr.Group
+    job: int
+
+    def __init__(self, root: Any, job: int) -> None:
+        self.root = root
+        self.job = job
+
+    def __getitem__(self, path: str) -> _JobArray:
+        return _JobArray(self.root[path], self.job)
+
+
+class _CompletionTracker:
+    # sets completed[t] once all writes_per_time writes of timepoint t are done (writes run on several threads)
+
+    completed: Any  # zarr.Array, one chunk per timepoint
+    writes_per_time: int
+    _remaining: dict[int, int]
+    _lock: threading.Lock
+
+    def __init__(self, completed: Any, writes_per_time: int) -> None:
+        self.completed = completed
+        self.writes_per_time = writes_per_time
+        self._remaining = {}
+        self._lock = threading.Lock()
+
+    def written(self, times: list[int]) -> None:
+        finished = []
+        with self._lock:
+            for t in times:
+                self._remaining[t] = self._remaining.get(t, self.writes_per_time) - 1
+                if self._remaining[t] == 0:
+                    del self._remaining[t]
+                    finished.append(t)
+        for t in finished:
+            self.completed[t] = True
+
+
+def _write_rows(arrays: list[Any], t: int, rows: list[np.ndarray], completion: _CompletionTracker) -> None:
+    # statistics and previews of timepoint t, each array has one chunk per timepoint
+    for array, row in zip(arrays, rows):
+        array[t] = row
+    completion.written([t])
+
+
+@dataclasses.dataclass
+class _EvaluatedFrames:
+    frames: list[np.ndarray]
+    statistics: list[SummaryStatistics]  # per exported channel
+    region_statistics: list[SummaryStatistics]  # per exported channel, empty unless requested
+    sketches: list[QuantileSketch] = dataclasses.field(default_factory=list)  # per exported channel, if requested
+    region_sketches: list[list[QuantileSketch]] = dataclasses.field(default_factory=list)
+    previews: list[np.ndarray] = dataclasses.field(default_factory=list)  # PREVIEW_NAMES per volume channel
+
+
+def _sketch(data: np.ndarray) -> QuantileSketch:
+    sketch = QuantileSketch()
+    sketch.add(data)
+    return sketch
+
+
+def _merge_sketches(
+    sketches: list[QuantileSketch], region_sketches: list[list[QuantileSketch]], evaluated: _EvaluatedFrames
+) -> None:
+    for sketch, frame_sketch in zip(sketches, evaluated.sketches):
+        sketch.merge(frame_sketch)
+    for channel_sketches, frame_sketches in zip(region_sketches, evaluated.region_sketches):
+        for sketch, frame_sketch in zip(channel_sketches, frame_sketches):
+            sketch.merge(frame_sketch)
+
+
+def _histogram_metadata(
+    sketch: QuantileSketch,
+    region_sketches: list[QuantileSketch],
+    region_ids: list[int] | np.ndarray,
+    region_statistics: bool,
+) -> dict:
+    metadata: dict = {"histogram": sketch.to_metadata()}
+    if region_statistics:
+        metadata["region_histograms"] = [
+            {"region_index": int(region_id), **region_sketch.to_metadata()}
+            for region_id, region_sketch in zip(region_ids, region_sketches)
+        ]
+    return metadata
+
+
+def _get_volume_segments(mesh: CartesianMesh, domain_name: str | None = None) -> RegionSegments:
+    # unweighted grouping of volume elements (of a domain's compact storage) by volume region
+    if domain_name is None:
+        labels = mesh.volume_region_map
+        region_ids = [vol_reg_id for vol_reg_id, _subvol_id, _volume, _domain_name in mesh.volume_regions]
+    else:
+        labels = mesh.volume_region_map[mesh.get_volume_domain_indices(domain_name)]
+        region_ids = sorted(mesh.get_volume_region_ids(domain_name))
+    return RegionSegments(labels=labels, weights=np.ones(labels.shape), region_ids=region_ids)
+
+
+def _get_membrane_segments(mesh: CartesianMesh) -> RegionSegments:
+    labels = mesh.membrane_elements[:, 7]
+    region_ids = [mem_reg_id for mem_reg_id, _vol_reg1, _vol_reg2, _surface in mesh.membrane_regions]
+    return RegionSegments(labels=labels, weights=np.ones(labels.shape), region_ids=region_ids)
+
+
+def _get_channel_segments(mesh: CartesianMesh, channel: dict) -> RegionSegments:
+    # regions of the channel's domain, matching the layout of its stored frames
+    if channel["variable_type"] == VariableType.MEMBRANE.name:
+        return _get_membrane_segments(mesh)
+    if channel["compact"]:
+        return _get_volume_segments(mesh, channel["domain_name"])
+    labels = mesh.volume_region_map
+    region_ids = sorted(mesh.get_volume_region_ids(channel["domain_name"]))
+    return RegionSegments(labels=labels, weights=np.ones(labels.shape), region_ids=region_ids)
+
+
+def _previews_path(channel: dict) -> str:
+    return f"previews/{channel['domain_name']}/{channel['label']}"
+
+
+def _region_statistics_path(channel: dict) -> str:
+    return f"region_statistics/{channel['domain_name']}/{channel['label']}"
+
+
+def _region_statistics_metadata(summary: SummaryStatistics, region_ids: list[int] | np.ndarray) -> list[dict]:
+    return [{"region_index": int(region_id), **summary.get(r).to_metadata()} for r, region_id in enumerate(region_ids)]
+
+
+def _get_channels(
+    pde_dataset: DataSetBackend, data_functions: DataFunctions, variable_type: VariableType
+) -> tuple[list[DataBlockHeader], list[NamedFunction]]:
+    data_vars: list[DataBlockHeader] = [
+        v for v in pde_dataset.variables_block_headers() if v.var_info.variable_type == variable_type
+    ]
+    functions: list[NamedFunction] = [f for f in data_functions.named_functions if f.variable_type == variable_type]
+    return data_vars, functions
+
+
+@dataclasses.dataclass
+class _ExportPlan:
+    # exported channels, the variables to read for them, times and the (possibly cropped) output mesh
+    variables: list[DataBlockHeader]
+    functions: list[NamedFunction]
+    membrane_variables: list[DataBlockHeader]
+    membrane_functions: list[NamedFunction]
+    read_variables: list[DataBlockHeader]
+    times: list[float]
+    mesh: CartesianMesh
+    source_mesh: CartesianMesh
+    crop: tuple[tuple[int, int, int], tuple[slice, slice, slice]] | None
+    _membrane_volume_indices: dict[str, np.ndarray] = dataclasses.field(default_factory=dict)
+    _membrane_domain_masks: dict[str, np.ndarray] = dataclasses.field(default_factory=dict)
+
+    def get_reader(self, pde_dataset: DataSetBackend) -> Callable[[int], list[np.ndarray]]:
+        return partial(_read_frames, pde_dataset, [v.var_info for v in self.read_variables], self.times, self.crop)
+
+    def split(self, read_frames: list[np.ndarray]) -> tuple[dict[str, np.ndarray], list[np.ndarray]]:
+        # volume function bindings (by short name) and the frames of the exported volume variables
+        frames = dict(zip([v.var_info.var_name for v in self.read_variables], read_frames))
+        bindings = {
+            name.split("::")[-1]: data
+            for v, (name, data) in zip(self.read_variables, frames.items())
+            if v.var_info.variable_type == VariableType.VOLUME
+        }
+        return bindings, [frames[v.var_info.var_name] for v in self.variables]
+
+    def get_membrane_frames(self, read_frames: list[np.ndarray]) -> list[np.ndarray]:
+        """
+        frames (one value per membrane element) of the exported membrane variables and functions
+
+        volume variables referenced by membrane functions are taken from the adjacent volume element in the
+        variable's domain, elements without such a neighbor get NaN. Membrane functions are NaN outside of the
+        membrane regions of their own membrane domain.
+        """
+        frames = dict(zip([v.var_info.var_name for v in self.read_variables], read_frames))
+        num_membrane_elements = self.mesh.membrane_elements.shape[0]
+        membrane_frames = [frames[v.var_info.var_name] for v in self.membrane_variables]
+        for f in self.membrane_functions:
+            bindings: dict[str, np.ndarray] = {}
+            for v in self.read_variables:
+                domain_name, _, short_name = v.var_info.var_name.rpartition("::")
+                if short_name not in f.variables or short_name in bindings:
+                    continue
+                if v.var_info.variable_type == VariableType.MEMBRANE:
+                    bindings[short_name] = frames[v.var_info.var_name]
+                else:
+                    indices = self._get_membrane_volume_indices(domain_name)
+                    values = frames[v.var_info.var_name][np.maximum(indices, 0)]
+                    bindings[short_name] = np.where(indices >= 0, values, np.nan)
+            values = np.broadcast_to(f.evaluate(bindings), (num_membrane_elements,))
+            membrane_frames.append(np.where(self._get_membrane_domain_mask(f.name.split("::")[0]), values, np.nan))
+        return membrane_frames
+
+    def _get_membrane_domain_mask(self, membrane_domain_name: str) -> np.ndarray:
+        if membrane_domain_name not in self._membrane_domain_masks:
+            region_ids = list(self.mesh.get_membrane_domain_region_ids(membrane_domain_name))
+            self._membrane_domain_masks[membrane_domain_name] = np.isin(self.mesh.membrane_elements[:, 7], region_ids)
+        return self._membrane_domain_masks[membrane_domain_name]
+
+    def _get_membrane_volume_indices(self, domain_name: str) -> np.ndarray:
+        if domain_name not in self._membrane_volume_indices:
+            self._membrane_volume_indices[domain_name] = self.mesh.get_membrane_volume_indices(domain_name)
+        return self._membrane_volume_indices[domain_name]
+
+
+def _plan_export(
+    pde_dataset: DataSetBackend,
+    data_functions: DataFunctions,
+    mesh: CartesianMesh,
+    selection: ExportSelection | None,
+    membrane: bool = False,
+) -> _ExportPlan:
+    volume_data_vars, volume_functions = _get_channels(pde_dataset, data_functions, VariableType.VOLUME)
+    membrane_data_vars: list[DataBlockHeader] = []
+    membrane_functions: list[NamedFunction] = []
+    # a cropped mesh has no membrane elements
+    if membrane and mesh.membrane_elements.shape[0] > 0 and (selection is None or not selection.is_spatial):
+        membrane_data_vars, membrane_functions = _get_channels(pde_dataset, data_functions, VariableType.MEMBRANE)
+    times = pde_dataset.times()
+    selection = selection or ExportSelection()
+    variables, functions, read_variables = selection.select_channels(
+        volume_data_vars + membrane_data_vars, volume_functions + membrane_functions
+    )
+    return _ExportPlan(
+        variables=[v for v in variables if v.var_info.variable_type == VariableType.VOLUME],
+        functions=[f for f in functions if f.variable_type == VariableType.VOLUME],
+        membrane_variables=[v for v in variables if v.var_info.variable_type == VariableType.MEMBRANE],
+        membrane_functions=[f for f in functions if f.variable_type == VariableType.MEMBRANE],
+        read_variables=read_variables,
+        times=[times[t] for t in selection.select_times(times)],
+        mesh=selection.crop_mesh(mesh),
+        source_mesh=mesh,
+        crop=selection.get_crop(mesh),
+    )
+
+
+def _read_frames(
+    pde_dataset: DataSetBackend,
+    variables: list[VariableInfo],
+    times: list[float],
+    crop: tuple[tuple[int, int, int], tuple[slice, slice, slice]] | None,
+    t: int,
+) -> list[np.ndarray]:
+    # module level (picklable) read stage, all variables of a timepoint in one pass over its zip entry
+    frames = pde_dataset.get_data_blocks(list(variables), times[t])
+    return [
+        crop_frame(data, crop) if v.variable_type == VariableType.VOLUME else data for v, data in zip(variables, frames)
+    ]
+
+
+def _mesh_metadata(mesh: CartesianMesh) -> dict:
+    return {
         "size": mesh.size,
         "extent": mesh.extent,
         "origin": mesh.origin,
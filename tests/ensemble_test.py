@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.ensemble import EnsembleDataSet, WelfordAccumulator, write_ensemble_zarr
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.simdata_models import DataSetBackend
+from pyvcell.simdata.zarr_reader import ZarrDataSet
+from tests.test_fixture import ScaledPdeDataSet, setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_welford_accumulator() -> None:
+    rng = np.random.default_rng(seed=3)
+    frames = rng.normal(loc=1000.0, size=(7, 50))
+    frames[2, :5] = np.nan
+    first = WelfordAccumulator.empty(50)
+    second = WelfordAccumulator.empty(50)
+    for frame in frames[:3]:
+        first.add(frame)
+    for frame in frames[3:]:
+        second.add(frame)
+    merged = first.merge(second)
+
+    assert np.array_equal(merged.count, np.sum(~np.isnan(frames), axis=0))
+    assert np.allclose(merged.get_field("mean"), np.nanmean(frames, axis=0))
+    assert np.allclose(merged.get_field("variance"), np.nanvar(frames, axis=0, ddof=1))
+    assert np.array_equal(merged.get_field("min"), np.nanmin(frames, axis=0))
+    assert np.array_equal(merged.get_field("max"), np.nanmax(frames, axis=0))
+    # no values
+    assert np.isnan(WelfordAccumulator.empty(3).get_field("mean")).all()
+
+
+def test_ensemble_dataset() -> None:
+    setup_files()
+
+    datasets: list[DataSetBackend] = []
+    for scale in [1.0, 2.0, 4.0]:
+        pde_dataset = ScaledPdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+        pde_dataset.scale = scale
+        pde_dataset.read()
+        datasets.append(pde_dataset)
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    ensemble = EnsembleDataSet(datasets, variables=["cytosol::RanC_cyt", "Nucleus::RanC_nuc"], workers=2)
+    assert [header.var_info.var_name for header in ensemble.variables_block_headers()][:4] == [
+        "cytosol::RanC_cyt_mean",
+        "cytosol::RanC_cyt_variance",
+        "cytosol::RanC_cyt_min",
+        "cytosol::RanC_cyt_max",
+    ]
+    time = ensemble.times()[2]
+    RanC_cyt = datasets[0].get_data("cytosol::RanC_cyt", time)
+    members = np.stack([scale * RanC_cyt for scale in [1.0, 2.0, 4.0]])
+    mean, variance, minimum = ensemble.get_data_blocks(
+        ["cytosol::RanC_cyt_mean", "cytosol::RanC_cyt_variance", "cytosol::RanC_cyt_min"], time
+    )
+    assert np.allclose(mean, members.mean(axis=0))
+    assert np.allclose(variance, members.var(axis=0, ddof=1))
+    assert np.array_equal(minimum, members.min(axis=0))
+
+    zarr_dir = test_data_dir / "zarr_ensemble"
+    write_ensemble_zarr(ensemble, mesh, zarr_dir, compact=True)
+    root = zarr.open_consolidated(str(zarr_dir), mode="r")
+    assert root.attrs["metadata"]["ensemble"]["num_jobs"] == 3
+    zarr_dataset = ZarrDataSet(zarr_dir)
+    zarr_dataset.read()
+    cytosol_indices = mesh.get_volume_domain_indices("cytosol")
+    RanC_cyt_max = zarr_dataset.get_data("cytosol::RanC_cyt_max", time)
+    assert np.array_equal(RanC_cyt_max[cytosol_indices], 4.0 * RanC_cyt[cytosol_indices])
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
@@ -0,0 +1,95 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.export_selection import ExportSelection
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet, VariableInfo
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_zarr
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+class RecordingPdeDataSet(PdeDataSet):
+    requested: set[str]
+
+    def get_data_blocks(self, variables: list[VariableInfo | str], time: float) -> list[np.ndarray]:
+        self.requested.update(v.var_name if isinstance(v, VariableInfo) else v for v in variables)
+        return super().get_data_blocks(variables, time)
+
+
+def test_export_selection() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = RecordingPdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    pde_dataset.requested = set()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    selection = ExportSelection(
+        variables=["cytosol::Ran*", "J_r0"],
+        time_start=0.25,
+        time_step=2,
+        bbox_voxels=[(10, 50), (5, 45), (3, 20)],
+        stride=(2, 3, 1),
+    )
+    zarr_dir = test_data_dir / "zarr_selection"
+    write_zarr(
+        pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=zarr_dir, selection=selection
+    )
+
+    # J_r0 = RanC_cyt - 1000 * C_cyt * Ran_cyt needs C_cyt, but Nucleus::RanC_nuc is never read
+    assert pde_dataset.requested == {"cytosol::C_cyt", "cytosol::Ran_cyt", "cytosol::RanC_cyt"}
+    z = zarr.open(str(zarr_dir), mode="r")
+    metadata = z.attrs["metadata"]
+    assert [channel["label"] for channel in metadata["channels"]] == ["region_mask", "Ran_cyt", "RanC_cyt", "J_r0"]
+    assert metadata["times"] == [0.25, 0.75]
+    assert z.shape == (2, 4, 17, 14, 20)
+    assert metadata["mesh"]["size"] == [20, 14, 17]
+    assert metadata["selection"]["source_size"] == [71, 71, 25]
+
+    num_x, num_y, num_z = mesh.size
+    crop = (slice(3, 20), slice(5, 45, 3), slice(10, 50, 2))
+    assert np.array_equal(z[0, 0], mesh.volume_region_map.reshape((num_z, num_y, num_x))[crop])
+    Ran_cyt = pde_dataset.get_data("cytosol::Ran_cyt", 0.75).reshape((num_z, num_y, num_x))
+    assert np.array_equal(z[1, 1], Ran_cyt[crop])
+
+    # voxel (10, 5, 3) of the source is the first voxel of the crop, at the same center
+    cropped_mesh = selection.crop_mesh(mesh)
+    source_box = mesh.get_volume_element_box(10, 5, 3)
+    cropped_box = cropped_mesh.get_volume_element_box(0, 0, 0)
+    assert np.isclose((source_box.x_lo + source_box.x_hi) / 2, (cropped_box.x_lo + cropped_box.x_hi) / 2)
+    assert np.isclose((source_box.y_lo + source_box.y_hi) / 2, (cropped_box.y_lo + cropped_box.y_hi) / 2)
+    shutil.rmtree(zarr_dir)
+
+    # a domain crop in compact v2 storage
+    zarr_dir = test_data_dir / "zarr_selection_v2"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        layout=ZarrLayout.V2,
+        compact=True,
+        selection=ExportSelection(variables=["Nucleus::*"], crop_domain="Nucleus"),
+    )
+    root = zarr.open_consolidated(str(zarr_dir), mode="r")
+    nucleus_indices = mesh.get_volume_domain_indices("Nucleus")
+    assert root["data/Nucleus/RanC_nuc"].shape == (5, nucleus_indices.shape[0])
+    RanC_nuc = pde_dataset.get_data("Nucleus::RanC_nuc", 1.0)
+    assert np.array_equal(root["data/Nucleus/RanC_nuc"][4], RanC_nuc[nucleus_indices])
+    shutil.rmtree(zarr_dir)
+
+    # micrometer boxes select the voxels whose centers lie inside
+    voxel_size = [extent / size for extent, size in zip(mesh.extent, mesh.size)]
+    bbox_um = [(origin + 2.5 * voxel, origin + 6.5 * voxel) for origin, voxel in zip(mesh.origin, voxel_size)]
+    assert ExportSelection(bbox_um=bbox_um).get_voxel_ranges(mesh) == [(2, 7), (2, 7), (2, 7)]
+
+    teardown_files()
@@ -1,13 +1,33 @@
+import hashlib
 from pathlib import Path
 
+import numpy as np
+from vtkmodules.util.numpy_support import vtk_to_numpy
+
 from pyvcell.simdata.mesh import CartesianMesh
 from pyvcell.simdata.vtk.fv_mesh_mapping import from_mesh3d_membrane, from_mesh3d_volume
+from pyvcell.simdata.vtk.vismesh import (
+    ArrayVisMesh,
+    FiniteVolumeIndex,
+    Vect3D,
+    VisCellType,
+    VisMesh,
+    VisPoint,
+    VisSurfaceTriangle,
+)
 from pyvcell.simdata.vtk.vtkmesh_fv import write_finite_volume_smoothed_vtk_grid_and_index_data
+from pyvcell.simdata.vtk.vtkmesh_utils import get_membrane_vtk_grid, get_volume_vtk_grid
 from tests.test_fixture import setup_files, teardown_files
 
 test_data_dir = (Path(__file__).parent / "test_data").absolute()
 
 
+def _sha256(array: np.ndarray) -> str:
+    # little endian float64 (points) or int64 (indices) bytes, independent of the array's dtype
+    dtype = "<f8" if np.issubdtype(array.dtype, np.floating) else "<i8"
+    return hashlib.sha256(np.ascontiguousarray(array, dtype=dtype).tobytes()).hexdigest()
+
+
 def test_mesh_parse() -> None:
     setup_files()
 
@@ -35,3 +55,188 @@ def test_mesh_parse() -> None:
         (test_data_dir / "cytosol.json").unlink()
 
     teardown_files()
+
+
+def test_mesh3d_volume_points() -> None:
+    setup_files()
+
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    nucleus_vismesh = from_mesh3d_volume(mesh, "Nucleus")
+
+    nucleus_indices = mesh.get_volume_domain_indices("Nucleus")
+    assert np.array_equal(nucleus_vismesh.global_index, nucleus_indices)
+    assert np.all(nucleus_vismesh.region_index == 5)
+    assert np.all(nucleus_vismesh.cell_types == VisCellType.VOXEL)
+
+    # shared corners are one point, numbered in order of first appearance
+    point_indices = nucleus_vismesh.connectivity.reshape((-1, 8))
+    unique_indices, first_appearance = np.unique(point_indices.ravel(), return_index=True)
+    assert np.array_equal(unique_indices, np.arange(nucleus_vismesh.points.shape[0]))
+    assert np.all(np.diff(first_appearance) > 0)
+    points = nucleus_vismesh.points
+    assert np.unique(points, axis=0).shape[0] == points.shape[0]
+
+    # corners p0 (X-,Y-,Z-) and p7 (X+,Y+,Z+) are the element box corners
+    num_x, num_y, _num_z = mesh.size
+    for index, voxel_points in zip(nucleus_vismesh.global_index[::97].tolist(), point_indices[::97]):
+        box = mesh.get_volume_element_box(index % num_x, (index // num_x) % num_y, index // (num_x * num_y))
+        assert points[voxel_points[0]].tolist() == [box.x_lo, box.y_lo, box.z_lo]
+        assert points[voxel_points[7]].tolist() == [box.x_hi, box.y_hi, box.z_hi]
+
+    teardown_files()
+
+
+def test_mesh3d_volume_reference() -> None:
+    # output of the original per-voxel loop (string keyed point dictionary), which the vectorized version reproduces
+    setup_files()
+
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    expected = {
+        "cytosol": (
+            16306,
+            12210,
+            "b4b9cc933e17048bada7722d1b388e812b67385b533fa69d44b2a09fe74440a1",
+            "ab3ae8e8e6ff93e1e5096c1b00eeebdcb5a0f21ec1becb81618d19b050df48e6",
+            "2cd31b5d6f7981f6bd8d03be045c1a7cb993dfbdb1970e90e7bb4459cce07167",
+            "9e5a446860bd7db349ac1fdde80276b90831df68f5499ad2ce53d74876fe7654",
+        ),
+        "Nucleus": (
+            3959,
+            3015,
+            "1c80e37ea2af1cfc65c0b7485d701ad03fcd2489360a2b7f8e62b9ea4244ec03",
+            "d99d7a717754a4917dcbe37eeb5b182e9b3260c783cd8fe186736b2781cc2317",
+            "091c95748eaa7315b20a0739f4de490ccdf6d6aff260e067f522d5ae70dcf284",
+            "4149d2f3aa73a9688cbaded8888ab41fd3ff26632477a1693a2d04f19e4328a0",
+        ),
+    }
+    for domain_name, (num_points, num_cells, points, connectivity, global_index, region_index) in expected.items():
+        vis_mesh = from_mesh3d_volume(mesh, domain_name)
+        assert vis_mesh.points.shape == (num_points, 3)
+        assert vis_mesh.num_cells == num_cells
+        assert np.array_equal(vis_mesh.offsets, np.arange(num_cells + 1) * 8)
+        assert _sha256(vis_mesh.points) == points
+        assert _sha256(vis_mesh.connectivity) == connectivity
+        assert _sha256(vis_mesh.global_index) == global_index
+        assert _sha256(vis_mesh.region_index) == region_index
+
+    teardown_files()
+
+
+def test_mesh3d_membrane_quads() -> None:
+    setup_files()
+
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    membrane_region_ids = mesh.get_membrane_region_ids("Nucleus")
+    nuclear_membrane_vismesh = from_mesh3d_membrane(mesh, membrane_region_ids)
+
+    selected = mesh.membrane_elements[np.isin(mesh.membrane_elements[:, 7], list(membrane_region_ids))]
+    assert nuclear_membrane_vismesh.num_cells == selected.shape[0]
+    assert np.array_equal(nuclear_membrane_vismesh.global_index, selected[:, 0])
+    assert np.array_equal(nuclear_membrane_vismesh.region_index, selected[:, 7])
+    points = nuclear_membrane_vismesh.points
+    assert np.unique(points, axis=0).shape[0] == points.shape[0]
+
+    # quads are wound counterclockwise seen from the outside volume element
+    num_x, num_y, _num_z = mesh.size
+    for quad_points, element in zip(nuclear_membrane_vismesh.get_cell_point_indices(), selected):
+        p0, p1, _p2, p3 = points[quad_points]
+        normal = np.cross(p1 - p0, p3 - p0)
+        inside, outside = (
+            np.array([index % num_x, (index // num_x) % num_y, index // (num_x * num_y)]) for index in element[1:3]
+        )
+        assert np.array_equal(np.sign(normal), outside - inside)
+
+    teardown_files()
+
+
+def test_mesh3d_membrane_reference() -> None:
+    # output of the original per-element loop (string keyed point dictionary), which the vectorized version reproduces
+    setup_files()
+
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    expected = [
+        (
+            {0, 1, 2, 3},
+            6067,
+            6053,
+            "5c2536ac465523c207c1d3e422255bd2a6c882562dc1a56f019f41b649ec98dd",
+            "1e707d55222b65e0bb920dcec6f825379caa068a5d82bc3ee7cf1e7dc04c0b13",
+            "30c3acdaa44ce249ef1930e1f18caff4e16cc88757874f225e1a2ad4628f8e17",
+            "8215c4c15532be9b46c106e1900e10a3b1b7c9b5200107fe68a2f65ce2984270",
+        ),
+        (
+            {4},
+            1765,
+            1764,
+            "13e984fa713e15af7f7c48ec78c06c6ee065fc14bcfc03b5835ab1e196c78ae7",
+            "3a1cee73f453b873b1aab357db93a1aa6dabe148cf60c11d2e94baa6fe68d319",
+            "96391005d2559c391f91ce0d10ec50923473907d08416863f86dac89dba489ab",
+            "d9184ed0f92c95709bd7d32f7376908d43cefbc9fb4a473cd56844cbd4de1e80",
+        ),
+    ]
+    for membrane_region_ids, num_points, num_cells, points, connectivity, global_index, region_index in expected:
+        vis_mesh = from_mesh3d_membrane(mesh, membrane_region_ids)
+        assert vis_mesh.points.shape == (num_points, 3)
+        assert vis_mesh.num_cells == num_cells
+        assert np.all(vis_mesh.cell_types == VisCellType.QUAD)
+        assert np.array_equal(vis_mesh.offsets, np.arange(num_cells + 1) * 4)
+        assert _sha256(vis_mesh.points) == points
+        assert _sha256(vis_mesh.connectivity) == connectivity
+        assert _sha256(vis_mesh.global_index) == global_index
+        assert _sha256(vis_mesh.region_index) == region_index
+
+    teardown_files()
+
+
+def test_array_vis_mesh_conversion() -> None:
+    setup_files()
+
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    nucleus_vismesh = from_mesh3d_volume(mesh, "Nucleus")
+    vis_mesh = nucleus_vismesh.to_vis_mesh()
+    assert vis_mesh.points is not None and vis_mesh.visVoxels is not None and vis_mesh.polygons is None
+    assert len(vis_mesh.visVoxels) == nucleus_vismesh.num_cells
+    first_voxel = vis_mesh.visVoxels[0]
+    assert first_voxel.pointIndices == list(range(8))
+    assert first_voxel.finiteVolumeIndex == FiniteVolumeIndex(int(nucleus_vismesh.global_index[0]), 5)
+    assert vis_mesh.points[7] == VisPoint(*nucleus_vismesh.points[7].tolist())
+
+    round_trip = ArrayVisMesh.from_vis_mesh(vis_mesh)
+    for field in ["points", "connectivity", "offsets", "cell_types", "global_index", "region_index"]:
+        assert np.array_equal(getattr(round_trip, field), getattr(nucleus_vismesh, field))
+
+    teardown_files()
+
+
+def test_vtk_grid() -> None:
+    setup_files()
+
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    nucleus_vismesh = from_mesh3d_volume(mesh, "Nucleus")
+    vtk_grid = get_volume_vtk_grid(nucleus_vismesh)
+    assert vtk_grid.GetNumberOfCells() == nucleus_vismesh.num_cells
+    cell_types = [vtk_grid.GetCellType(c) for c in range(vtk_grid.GetNumberOfCells())]
+    assert np.array_equal(cell_types, nucleus_vismesh.cell_types)
+    assert np.array_equal(vtk_to_numpy(vtk_grid.GetCells().GetConnectivityArray()), nucleus_vismesh.connectivity)
+    assert np.allclose(vtk_to_numpy(vtk_grid.GetPoints().GetData()), nucleus_vismesh.points)
+    # dataclass meshes give the same grid
+    dataclass_grid = get_volume_vtk_grid(nucleus_vismesh.to_vis_mesh())
+    assert np.array_equal(
+        vtk_to_numpy(dataclass_grid.GetCells().GetOffsetsArray()), vtk_to_numpy(vtk_grid.GetCells().GetOffsetsArray())
+    )
+
+    surface_mesh = VisMesh(3, Vect3D(0.0, 0.0, 0.0), Vect3D(1.0, 1.0, 1.0))
+    surface_mesh.surfacePoints = [VisPoint(0.0, 0.0, 0.0), VisPoint(1.0, 0.0, 0.0), VisPoint(0.0, 1.0, 0.0)]
+    surface_mesh.surfaceTriangles = [VisSurfaceTriangle([0, 1, 2], face="z-")]
+    membrane_grid = get_membrane_vtk_grid(surface_mesh)
+    assert membrane_grid.GetNumberOfPoints() == 3
+    assert membrane_grid.GetCellType(0) == VisCellType.TRIANGLE
+    assert np.array_equal(vtk_to_numpy(membrane_grid.GetCells().GetConnectivityArray()), [0, 1, 2])
+
+    teardown_files()
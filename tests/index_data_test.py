@@ -0,0 +1,146 @@
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.vtk.fv_mesh_mapping import from_mesh3d_volume
+from pyvcell.simdata.vtk.index_data import IndexFormat, read_index_data
+from pyvcell.simdata.vtk.vismesh import (
+    ChomboSurfaceIndex,
+    ChomboVolumeIndex,
+    ColumnarIndexData,
+    MovingBoundarySurfaceIndex,
+    MovingBoundaryVolumeIndex,
+    Vect3D,
+    VisLine,
+    VisMesh,
+    VisPoint,
+    VisPolygon,
+)
+from pyvcell.simdata.vtk.vtkmesh_chombo import (
+    write_chombo_membrane_vtk_grid_and_index_data,
+    write_chombo_volume_vtk_grid_and_index_data,
+)
+from pyvcell.simdata.vtk.vtkmesh_fv import write_finite_volume_smoothed_vtk_grid_and_index_data
+from pyvcell.simdata.vtk.vtkmesh_mb import write_moving_boundary_volume_vtk_grid_and_index_data
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_finite_volume_columnar_index_data() -> None:
+    setup_files()
+
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    nucleus_vismesh = from_mesh3d_volume(mesh, "Nucleus")
+    write_finite_volume_smoothed_vtk_grid_and_index_data(
+        nucleus_vismesh,
+        "Nucleus",
+        test_data_dir / "Nucleus.vtu",
+        test_data_dir / "Nucleus_columnar.json",
+        IndexFormat.COLUMNAR,
+    )
+    write_finite_volume_smoothed_vtk_grid_and_index_data(
+        nucleus_vismesh, "Nucleus", test_data_dir / "Nucleus.vtu", test_data_dir / "Nucleus.json"
+    )
+    assert (test_data_dir / "Nucleus_columnar.bin").exists()
+
+    columnar = read_index_data(test_data_dir / "Nucleus_columnar.json")
+    assert columnar.domainName == "Nucleus"
+    global_index = columnar.columns["finiteVolumeIndices/globalIndex"]
+    assert global_index.dtype == np.dtype("<i8")
+    assert np.array_equal(global_index, mesh.get_volume_domain_indices("Nucleus"))
+    assert np.all(columnar.columns["finiteVolumeIndices/regionIndex"] == 5)
+
+    # the JSON index data reads into the same columns
+    from_json = read_index_data(test_data_dir / "Nucleus.json")
+    assert from_json.columns.keys() == columnar.columns.keys()
+    for name, column in columnar.columns.items():
+        assert np.array_equal(from_json.columns[name], column)
+
+    teardown_files()
+
+
+def test_chombo_and_moving_boundary_columnar_index_data() -> None:
+    setup_files()
+
+    # two unit squares and their outline
+    points = [VisPoint(x, y, 0.0) for y in range(2) for x in range(3)]
+    vis_mesh = VisMesh(
+        dimension=2,
+        origin=Vect3D(0.0, 0.0, 0.0),
+        extent=Vect3D(2.0, 1.0, 1.0),
+        points=points,
+        surfacePoints=points,
+        polygons=[
+            VisPolygon(
+                [0, 1, 4, 3],
+                chomboVolumeIndex=ChomboVolumeIndex(0, 3, 17, 1.0),
+                movingBoundaryVolumeIndex=MovingBoundaryVolumeIndex(7),
+            ),
+            VisPolygon(
+                [1, 2, 5, 4],
+                chomboVolumeIndex=ChomboVolumeIndex(1, 4, 2, 0.25),
+                movingBoundaryVolumeIndex=MovingBoundaryVolumeIndex(9),
+            ),
+        ],
+        visLines=[
+            VisLine(
+                p1,
+                p2,
+                chomboSurfaceIndex=ChomboSurfaceIndex(10 + i),
+                movingBoundarySurfaceIndex=MovingBoundarySurfaceIndex(i),
+            )
+            for i, (p1, p2) in enumerate([(0, 1), (1, 2), (2, 5), (5, 4), (4, 3), (3, 0)])
+        ],
+    )
+
+    def write_both(name: str, write: Callable[[Path, IndexFormat], None]) -> ColumnarIndexData:
+        # the JSON and columnar index data hold the same columns
+        write(test_data_dir / f"{name}.json", IndexFormat.JSON)
+        write(test_data_dir / f"{name}_columnar.json", IndexFormat.COLUMNAR)
+        from_json = read_index_data(test_data_dir / f"{name}.json")
+        columnar = read_index_data(test_data_dir / f"{name}_columnar.json")
+        assert columnar.domainName == from_json.domainName
+        assert columnar.timeIndex == from_json.timeIndex
+        assert list(columnar.columns) == list(from_json.columns)
+        for column_name, column in columnar.columns.items():
+            assert np.array_equal(from_json.columns[column_name], column)
+        return columnar
+
+    chombo = write_both(
+        "chombo",
+        lambda index_file, index_format: write_chombo_volume_vtk_grid_and_index_data(
+            vis_mesh, "subdomain0", test_data_dir / "chombo.vtu", index_file, index_format
+        ),
+    )
+    assert list(chombo.columns) == [
+        "chomboVolumeIndices/level",
+        "chomboVolumeIndices/boxNumber",
+        "chomboVolumeIndices/boxIndex",
+        "chomboVolumeIndices/fraction",
+    ]
+    assert chombo.columns["chomboVolumeIndices/boxIndex"].tolist() == [17, 2]
+    assert chombo.columns["chomboVolumeIndices/fraction"].tolist() == [1.0, 0.25]
+
+    chombo_membrane = write_both(
+        "chombo_membrane",
+        lambda index_file, index_format: write_chombo_membrane_vtk_grid_and_index_data(
+            vis_mesh, "subdomain0_membrane", test_data_dir / "chombo_membrane.vtu", index_file, index_format
+        ),
+    )
+    assert chombo_membrane.columns["chomboSurfaceIndices/index"].tolist() == [10, 11, 12, 13, 14, 15]
+
+    moving_boundary = write_both(
+        "mb",
+        lambda index_file, index_format: write_moving_boundary_volume_vtk_grid_and_index_data(
+            vis_mesh, "omega", test_data_dir / "mb.vtu", index_file, index_format
+        ),
+    )
+    assert moving_boundary.timeIndex == 0
+    assert moving_boundary.columns["movingBoundaryVolumeIndices/index"].tolist() == [7, 9]
+    assert moving_boundary.columns["movingBoundarySurfaceIndices/index"].tolist() == [0, 1, 2, 3, 4, 5]
+
+    teardown_files()
@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.multiscale import RegionPooling
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
+from pyvcell.simdata.zarr_writer import write_zarr
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_region_pooling() -> None:
+    region_map = np.array([[[0, 0, 1], [0, 1, 1], [2, 2, 2]]], dtype=np.uint16)
+    data = np.array([[[1.0, 3.0, 100.0], [5.0, 200.0, 300.0], [7.0, 9.0, 11.0]]])
+    pooling = RegionPooling(region_map, (1, 2, 2))
+    assert pooling.shape == (1, 2, 2)
+    # ties go to the smaller region index
+    assert np.array_equal(pooling.region_map, [[[0, 1], [2, 2]]])
+    # values of other regions in a block are ignored
+    assert np.array_equal(pooling.pool(data), [[[3.0, 200.0], [8.0, 11.0]]])
+
+
+def test_zarr_writer_multiscale() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    single_dir = test_data_dir / "zarr_single"
+    write_zarr(pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=single_dir)
+    single = zarr.open(str(single_dir), mode="r")
+
+    pyramid_dir = test_data_dir / "zarr_pyramid"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=pyramid_dir,
+        workers=2,
+        multiscale_levels=2,
+    )
+    root = zarr.open_group(str(pyramid_dir), mode="r")
+    assert np.array_equal(root["0"][:], single[:])
+    assert root.attrs["metadata"] == single.attrs["metadata"]
+    assert root["1"].shape == (5, 6, 13, 36, 36)
+    assert root["2"].shape == (5, 6, 7, 18, 18)
+
+    multiscales = root.attrs["multiscales"][0]
+    assert [dataset["path"] for dataset in multiscales["datasets"]] == ["0", "1", "2"]
+    scale_0 = multiscales["datasets"][0]["coordinateTransformations"][0]["scale"]
+    scale_2 = multiscales["datasets"][2]["coordinateTransformations"][0]["scale"]
+    assert np.allclose(scale_2, [1, 1, 4 * scale_0[2], 4 * scale_0[3], 4 * scale_0[4]])
+
+    # every level 2 voxel is the mean of the full resolution voxels of its block in the block's mode region
+    full = single[3]
+    level_2 = root["2"][3]
+    for k, j, i in [(0, 0, 0), (3, 9, 9), (6, 17, 17), (2, 5, 12)]:
+        block = (slice(4 * k, 4 * k + 4), slice(4 * j, 4 * j + 4), slice(4 * i, 4 * i + 4))
+        regions, counts = np.unique(full[0][block], return_counts=True)
+        mode_region = regions[np.argmax(counts)]
+        assert level_2[0, k, j, i] == mode_region
+        in_region = full[0][block] == mode_region
+        for c in range(1, 6):
+            assert np.isclose(level_2[c, k, j, i], np.mean(full[c][block][in_region]))
+
+    shutil.rmtree(single_dir)
+    shutil.rmtree(pyramid_dir)
+
+    teardown_files()
@@ -0,0 +1,72 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.previews import PREVIEW_NAMES, PreviewProjector
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
+from pyvcell.simdata.zarr_reader import ZarrDataSet
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_zarr
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_preview_projector() -> None:
+    rng = np.random.default_rng(seed=2)
+    data = rng.normal(size=(4, 5, 6))
+    mask = data > -0.5
+    mask[:, 0, 0] = False
+    projector = PreviewProjector((4, 5, 6), mask)
+    previews = projector.project(data.ravel())
+
+    assert list(previews) == PREVIEW_NAMES
+    assert {name: image.shape for name, image in previews.items()} == projector.preview_shapes()
+    masked = np.where(mask, data, np.nan)
+    assert np.array_equal(previews["max_z"], np.nanmax(masked, axis=0), equal_nan=True)
+    assert np.allclose(previews["mean_y"], np.nanmean(masked, axis=1), equal_nan=True)
+    assert np.array_equal(previews["slice_x"], masked[:, :, 3], equal_nan=True)
+    # a ray missing the mask has no value
+    assert np.isnan(previews["max_z"][0, 0])
+
+
+def test_zarr_writer_previews() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=test_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    num_x, num_y, num_z = mesh.size
+
+    zarr_dir = test_data_dir / "zarr_previews"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        layout=ZarrLayout.V2,
+        compact=True,
+        previews=True,
+    )
+    zarr_dataset = ZarrDataSet(zarr_dir)
+    zarr_dataset.read()
+    assert "previews" not in zarr_dataset.get_channel("Nucleus_cytosol_membrane::J_flux0")
+    nucleus = np.zeros(mesh.volume_region_map.shape, dtype=bool)
+    nucleus[mesh.get_volume_domain_indices("Nucleus")] = True
+    nucleus = nucleus.reshape((num_z, num_y, num_x))
+    for time in pde_dataset.times():
+        RanC_nuc = pde_dataset.get_data("Nucleus::RanC_nuc", time).reshape((num_z, num_y, num_x))
+        max_z = zarr_dataset.get_preview("Nucleus::RanC_nuc", time, "max_z")
+        assert max_z.shape == (num_y, num_x)
+        expected = np.max(np.where(nucleus, RanC_nuc, -np.inf), axis=0)
+        assert np.allclose(max_z, np.where(nucleus.any(axis=0), expected, np.nan), equal_nan=True)
+        slice_y = zarr_dataset.get_preview("Nucleus::RanC_nuc", time, "slice_y")
+        assert slice_y.shape == (num_z, num_x)
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
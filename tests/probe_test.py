@@ -0,0 +1,111 @@
+import copy
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.probe import VolumeProbe, kymograph, line_profile
+from pyvcell.simdata.simdata_models import (
+    DataBlockHeader,
+    DataFunctions,
+    NamedFunction,
+    PdeDataSet,
+    VariableType,
+    get_function_bindings,
+)
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_volume_probe() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    # centers of a few volume elements inside the cytosol
+    cytosol_regions = list(mesh.get_volume_region_ids("cytosol"))
+    cytosol_elements = np.where(np.isin(mesh.volume_region_map, cytosol_regions))[0][::5000]
+    size = np.array(mesh.size)
+    ijk = np.stack(
+        [cytosol_elements % size[0], (cytosol_elements // size[0]) % size[1], cytosol_elements // (size[0] * size[1])],
+        axis=1,
+    )
+    centers = np.array(mesh.origin) + (ijk + 0.5) * np.array(mesh.extent) / size
+    assert np.array_equal(mesh.get_volume_element_global_index(mesh.get_volume_element_ijk(centers)), cytosol_elements)
+
+    nearest_probe = VolumeProbe(mesh, centers)
+    interpolating_probe = VolumeProbe(mesh, centers, interpolate=True)
+    series = nearest_probe.time_series(pde_dataset, "cytosol::RanC_cyt")
+    assert series.shape == (5, len(cytosol_elements))
+    for t, time in enumerate(pde_dataset.times()):
+        data = pde_dataset.get_data("cytosol::RanC_cyt", time)
+        assert np.allclose(series[t], data[cytosol_elements])
+        assert np.allclose(interpolating_probe.sample(data), data[cytosol_elements])
+
+    # functions are evaluated only at the probed elements
+    data_functions = DataFunctions(function_file=test_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    function_J_r0 = next(f for f in data_functions.named_functions if f.variable_type == VariableType.VOLUME)
+    function_series = interpolating_probe.time_series(pde_dataset, function_J_r0)
+    full_J_r0 = function_J_r0.evaluate(get_function_bindings(pde_dataset, function_J_r0, 1.0))
+    assert np.allclose(function_series[-1], full_J_r0[cytosol_elements])
+
+    teardown_files()
+
+
+class NucleusCopyPdeDataSet(PdeDataSet):
+    # lists a Nucleus::C_cyt block next to cytosol::C_cyt, both with the short name C_cyt
+
+    def variables_block_headers(self) -> list[DataBlockHeader]:
+        block_headers = super().variables_block_headers()
+        nucleus_header = copy.deepcopy(next(bh for bh in block_headers if bh.var_info.var_name == "cytosol::C_cyt"))
+        nucleus_header.var_info.var_name = "Nucleus::C_cyt"
+        return [*block_headers, nucleus_header]
+
+
+def test_function_bindings_by_domain() -> None:
+    setup_files()
+
+    pde_dataset = NucleusCopyPdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+
+    # the variable of the function's own domain wins
+    cytosol_function = NamedFunction(name="cytosol::F", vcell_expression="C_cyt", variable_type=VariableType.VOLUME)
+    bindings = get_function_bindings(pde_dataset, cytosol_function, 1.0)
+    assert np.array_equal(bindings["C_cyt"], pde_dataset.get_data("cytosol::C_cyt", 1.0))
+
+    # none of the matches is in the function's domain
+    membrane_function = NamedFunction(
+        name="Nucleus_cytosol_membrane::G", vcell_expression="C_cyt", variable_type=VariableType.MEMBRANE
+    )
+    with pytest.raises(ValueError, match="ambiguous"):
+        get_function_bindings(pde_dataset, membrane_function, 1.0)
+
+    teardown_files()
+
+
+def test_kymograph() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    start = [0.0, 37.0, 13.0]
+    end = [74.24, 37.0, 13.0]
+    image = kymograph(pde_dataset, mesh, "Nucleus::RanC_nuc", start, end, num_points=100)
+    assert image.shape == (5, 100)
+    assert np.all(image >= 0.0)
+    # at t=0 RanC_nuc is uniform inside the nucleus and zero elsewhere, interpolation never mixes the two
+    assert set(np.unique(np.round(image[0], 12))) <= {0.0, 4.5e-4}
+
+    profile = line_profile(pde_dataset, mesh, "Nucleus::RanC_nuc", 1.0, start, end, num_points=100)
+    assert np.allclose(profile, image[-1])
+
+    teardown_files()
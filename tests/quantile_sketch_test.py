@@ -0,0 +1,102 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.quantile_sketch import QuantileSketch, compute_region_sketches, compute_sketches
+from pyvcell.simdata.region_stats import RegionSegments
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
+from pyvcell.simdata.zarr_reader import ZarrDataSet
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_zarr
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+QUANTILES = [0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]
+
+
+def _assert_quantiles(sketch: QuantileSketch, values: np.ndarray) -> None:
+    # every estimate is within the relative accuracy of the exact (lower) quantile
+    expected = np.quantile(values, QUANTILES, method="lower")
+    assert np.allclose(sketch.quantile(QUANTILES), expected, rtol=sketch.relative_accuracy, atol=1e-300)
+
+
+def test_quantile_sketch() -> None:
+    rng = np.random.default_rng(seed=11)
+    data = np.concatenate([rng.lognormal(sigma=3.0, size=5000), -rng.exponential(size=2000), np.zeros(500)])
+    rng.shuffle(data)
+
+    sketch = QuantileSketch()
+    sketch.add(np.append(data, [np.nan, np.nan]))
+    assert sketch.count == data.shape[0]
+    _assert_quantiles(sketch, data)
+
+    # sketches of parts merge into the sketch of the whole
+    merged = QuantileSketch()
+    for part in np.array_split(data, 7):
+        part_sketch = QuantileSketch()
+        part_sketch.add(part)
+        merged.merge(part_sketch)
+    assert np.array_equal(merged.quantile(QUANTILES), sketch.quantile(QUANTILES))
+
+    restored = QuantileSketch.from_metadata(sketch.to_metadata())
+    assert np.array_equal(restored.quantile(QUANTILES), sketch.quantile(QUANTILES))
+    assert np.all(np.isnan(QuantileSketch().quantile([0.5])))
+
+
+def test_compute_region_sketches() -> None:
+    rng = np.random.default_rng(seed=5)
+    labels = rng.integers(0, 3, size=1000)
+    data = rng.normal(size=1000) + 10 * labels
+    segments = RegionSegments(labels=labels, weights=np.ones(labels.shape), region_ids=[2, 0, 7])
+    sketches = compute_region_sketches(data, segments)
+    _assert_quantiles(sketches[0], data[labels == 2])
+    _assert_quantiles(sketches[1], data[labels == 0])
+    assert sketches[2].count == 0
+
+
+def test_quantile_sketches_export() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=test_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    # standalone pass over the dataset, values on the whole mesh
+    sketches = compute_sketches(pde_dataset, variables=["cytosol::RanC_cyt"])
+    RanC_cyt = np.concatenate([pde_dataset.get_data("cytosol::RanC_cyt", time) for time in pde_dataset.times()])
+    _assert_quantiles(sketches["cytosol::RanC_cyt"], RanC_cyt)
+
+    zarr_dir = test_data_dir / "zarr_histograms"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        layout=ZarrLayout.V2,
+        compact=True,
+        region_statistics=True,
+        histograms=True,
+    )
+    zarr_dataset = ZarrDataSet(zarr_dir)
+    zarr_dataset.read()
+    # inside the domain, and per region
+    cytosol_indices = mesh.get_volume_domain_indices("cytosol")
+    RanC_cyt_domain = np.concatenate([
+        pde_dataset.get_data("cytosol::RanC_cyt", time)[cytosol_indices] for time in pde_dataset.times()
+    ])
+    expected = np.quantile(RanC_cyt_domain, QUANTILES, method="lower")
+    assert np.allclose(zarr_dataset.get_quantiles("cytosol::RanC_cyt", QUANTILES), expected, rtol=0.01)
+    region_values = np.concatenate([
+        pde_dataset.get_data("cytosol::RanC_cyt", time)[mesh.volume_region_map == 1] for time in pde_dataset.times()
+    ])
+    expected = np.quantile(region_values, QUANTILES, method="lower")
+    assert np.allclose(zarr_dataset.get_quantiles("cytosol::RanC_cyt", QUANTILES, region_index=1), expected, rtol=0.01)
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
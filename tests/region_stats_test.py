@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh, MeshMetrics
+from pyvcell.simdata.postprocessing import PostProcessing, StatisticType
+from pyvcell.simdata.region_stats import RegionReducer, RegionSegments, RegionStatistic
+from pyvcell.simdata.simdata_models import PdeDataSet
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_region_segments() -> None:
+    labels = np.array([2, 0, 2, 2, 0, 5])
+    weights = np.array([1.0, 1.0, 2.0, 1.0, 3.0, 1.0])
+    data = np.array([1.0, 4.0, 2.0, 3.0, 8.0, 100.0])
+    segments = RegionSegments(labels=labels, weights=weights, region_ids=[0, 1, 2])
+    stats = segments.reduce(data)
+
+    assert stats.shape == (3, len(RegionStatistic))
+    assert np.allclose(stats[0], [7.0, 28.0, 4.0, 8.0, 3.0])
+    # an empty region has zero total, the other statistics are undefined
+    assert stats[1, RegionStatistic.TOTAL] == 0.0
+    assert np.all(np.isnan(np.delete(stats[1], RegionStatistic.TOTAL)))
+    assert np.allclose(stats[2], [2.0, 8.0, 1.0, 3.0, 0.5])
+
+
+def test_region_reducer() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    mesh_metrics = MeshMetrics(mesh_metrics_file=test_data_dir / "SimID_946368938_0_.meshmetrics")
+    mesh_metrics.read()
+    post_processing = PostProcessing(postprocessing_hdf5_path=test_data_dir / "SimID_946368938_0_.hdf5")
+    post_processing.read()
+
+    reducer = RegionReducer(mesh, mesh_metrics)
+    results = reducer.reduce(pde_dataset, ["Nucleus::RanC_nuc", "cytosol::C_cyt"])
+    assert set(results.keys()) == {"Nucleus::RanC_nuc", "cytosol::C_cyt"}
+
+    RanC_nuc_stats = results["Nucleus::RanC_nuc"]
+    assert RanC_nuc_stats.shape == (5, len(mesh.volume_regions), len(RegionStatistic))
+    # the nucleus is a single volume region (5), its statistics agree with the solver's post processing
+    nucleus_region = 5
+    for stat in [StatisticType.AVERAGE, StatisticType.MIN, StatisticType.MAX]:
+        assert np.allclose(RanC_nuc_stats[:, nucleus_region, int(stat)], post_processing.statistics[:, 3, int(stat)])
+    assert np.all(RanC_nuc_stats[:, nucleus_region, RegionStatistic.VARIANCE] >= 0.0)
+
+    C_cyt_max = np.max(results["cytosol::C_cyt"][:, 1:5, RegionStatistic.MAX], axis=1)
+    assert np.allclose(C_cyt_max[1:], post_processing.statistics[1:, 0, int(StatisticType.MAX)])
+
+    teardown_files()
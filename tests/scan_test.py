@@ -0,0 +1,97 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.scan import ScanJob, find_job_ids, get_scan_parameters, read_scan_jobs
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
+from pyvcell.simdata.zarr_reader import ZarrDataSet
+from pyvcell.simdata.zarr_writer import write_scan_zarr
+from tests.test_fixture import ScaledPdeDataSet, setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_get_scan_parameters() -> None:
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    data_functions = DataFunctions(function_file=test_data_dir / "SimID_946368938_0_.functions")
+    parameters: list[dict[str, float]] = [
+        {"Kf": 1.0, "Kr": float("nan"), "D": 2.0, "Km": 0.5},
+        {"Kf": 3.5, "Kr": float("nan"), "D": 2.0},
+    ]
+    jobs = [
+        ScanJob(job_id, pde_dataset, data_functions, job_parameters) for job_id, job_parameters in enumerate(parameters)
+    ]
+    scan_parameters = get_scan_parameters(jobs)
+    assert list(scan_parameters) == ["Kf", "Km"]
+    assert scan_parameters["Kf"] == [1.0, 3.5]
+    assert scan_parameters["Km"][0] == 0.5 and np.isnan(scan_parameters["Km"][1])
+
+
+def test_write_scan_zarr() -> None:
+    setup_files()
+
+    # a second job sharing the mesh and data files of job 0, with a different value of constant Kf
+    for suffix in ["_.log", "_.functions", "__0.simtask.xml"]:
+        text = (test_data_dir / f"SimID_946368938_0{suffix}").read_text()
+        if suffix == "__0.simtask.xml":
+            text = text.replace('<Constant Name="Kf">1.0</Constant>', '<Constant Name="Kf">3.5</Constant>')
+        (test_data_dir / f"SimID_946368938_1{suffix}").write_text(text)
+    assert find_job_ids(test_data_dir, 946368938) == [0, 1]
+    jobs = read_scan_jobs(test_data_dir, 946368938)
+    jobs[1].pde_dataset = ScaledPdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_1_.log")
+    jobs[1].pde_dataset.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    zarr_dir = test_data_dir / "zarr_scan"
+    write_scan_zarr(
+        jobs=jobs, mesh=mesh, zarr_dir=zarr_dir, compact=True, job_workers=2, histograms=True, region_statistics=True
+    )
+
+    root = zarr.open_consolidated(str(zarr_dir), mode="r")
+    metadata = root.attrs["metadata"]
+    assert metadata["scan_parameters"] == {"Kf": [1.0, 3.5]}
+    assert [job["job_id"] for job in metadata["jobs"]] == [0, 1]
+    C_cyt = root["data/cytosol/C_cyt"]
+    assert C_cyt.shape[:2] == (2, 5)
+    assert C_cyt.chunks[0] == 1
+    assert root["completed"][:].all()
+    # shared arrays are stored once
+    assert root["domains/cytosol/volume_indices"].ndim == 1
+
+    # one element across every job and timepoint in a single read
+    cross_job = C_cyt[:, :, 100]
+    assert np.array_equal(cross_job[1], 2.0 * cross_job[0])
+    C_cyt_max = [job["channels"][0]["global_statistics"]["max"] for job in metadata["jobs"]]
+    assert C_cyt_max[1] == 2.0 * C_cyt_max[0]
+    assert metadata["channels"][0]["global_statistics"]["max"] == C_cyt_max[1]
+    assert metadata["channels"][0]["histogram"]["count"] == 2 * metadata["jobs"][0]["channels"][0]["histogram"]["count"]
+    # region histograms cover all jobs too
+    C_cyt_region_histograms = metadata["channels"][0]["region_histograms"]
+    job_region_histograms = metadata["jobs"][0]["channels"][0]["region_histograms"]
+    assert [region["region_index"] for region in C_cyt_region_histograms] == [1, 2, 3, 4]
+    for region, job_region in zip(C_cyt_region_histograms, job_region_histograms):
+        assert region["count"] == 2 * job_region["count"]
+    scan_dataset = ZarrDataSet(zarr_dir, job=0)
+    scan_dataset.read()
+    region_max = scan_dataset.get_quantiles("cytosol::C_cyt", 1.0, region_index=1)
+    assert np.isclose(region_max, C_cyt_region_histograms[0]["max"], rtol=0.02)
+
+    # each job reads like a single export
+    for job in jobs:
+        zarr_dataset = ZarrDataSet(zarr_dir, job=job.job_id)
+        zarr_dataset.read()
+        for time in job.pde_dataset.times():
+            expected = job.pde_dataset.get_data_blocks(["cytosol::RanC_cyt"], time)[0]
+            cytosol_indices = mesh.get_volume_domain_indices("cytosol")
+            data = zarr_dataset.get_data("cytosol::RanC_cyt", time)
+            assert np.array_equal(data[cytosol_indices], expected[cytosol_indices])
+        time_series = zarr_dataset.get_time_series("cytosol::RanC_cyt", cytosol_indices[:3])
+        assert time_series.shape == (5, 3)
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
@@ -0,0 +1,58 @@
+import numpy as np
+
+from pyvcell.simdata.region_stats import RegionSegments
+from pyvcell.simdata.summary_stats import (
+    SUMMARY_STATISTICS,
+    SummaryStatistics,
+    compute_region_statistics,
+    compute_statistics,
+)
+
+
+def test_compute_statistics() -> None:
+    rng = np.random.default_rng(seed=7)
+    data = rng.normal(size=(13, 17, 19))
+    data[3, 4, :5] = np.nan
+
+    # small blocks exercise the blocked pass, including blocks with NaNs
+    summary = compute_statistics(data, block_size=100)
+    assert summary.count == data.size - 5
+    assert summary.nan_count == 5
+    assert summary.min == np.nanmin(data)
+    assert summary.max == np.nanmax(data)
+    assert np.isclose(summary.mean, np.nanmean(data))
+    assert np.isclose(summary.variance, np.nanvar(data))
+
+    # merging summaries of parts gives the summary of the whole
+    parts = [compute_statistics(part) for part in np.array_split(data.ravel(), 4)]
+    merged = parts[0].merge(parts[1]).merge(parts[2]).merge(parts[3])
+    assert np.allclose(merged.to_array(), summary.to_array())
+
+    # to_array() and from_array() round trip, rows of several summaries combine along an axis
+    rows = np.stack([part.to_array() for part in parts])
+    assert rows.shape == (4, len(SUMMARY_STATISTICS))
+    assert np.allclose(SummaryStatistics.from_array(rows).combine(axis=0).to_array(), summary.to_array())
+
+
+def test_compute_statistics_all_nan() -> None:
+    summary = compute_statistics(np.full(10, np.nan))
+    assert summary.count == 0
+    assert summary.nan_count == 10
+    assert np.all(np.isnan(summary.to_array()[:3]))
+    metadata = summary.to_metadata()
+    assert metadata["min"] is None and metadata["mean"] is None and metadata["variance"] is None
+    # an unwritten (all NaN) row is an empty summary
+    assert SummaryStatistics.from_array(np.full(len(SUMMARY_STATISTICS), np.nan)).count == 0
+
+
+def test_compute_region_statistics() -> None:
+    labels = np.array([2, 0, 2, 2, 0, 5, 0])
+    data = np.array([1.0, 4.0, 2.0, np.nan, 8.0, 100.0, np.nan])
+    segments = RegionSegments(labels=labels, weights=np.ones(labels.shape), region_ids=[0, 1, 2])
+    summary = compute_region_statistics(data, segments)
+
+    assert list(summary.count) == [2, 0, 2]
+    assert list(summary.nan_count) == [1, 0, 1]
+    assert np.allclose(summary.mean, [6.0, np.nan, 1.5], equal_nan=True)
+    assert np.array_equal(summary.to_array()[:, :2], [[4.0, 8.0], [np.nan, np.nan], [1.0, 2.0]], equal_nan=True)
+    assert np.allclose(summary.sum_sq, [80.0, 0.0, 5.0])
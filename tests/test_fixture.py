@@ -1,6 +1,10 @@
 import tarfile
 from pathlib import Path
 
+import numpy as np
+
+from pyvcell.simdata.simdata_models import PdeDataSet, VariableInfo
+
 test_data_dir = (Path(__file__).parent / "test_data").absolute()
 
 
@@ -16,3 +20,11 @@ def teardown_files() -> None:
     for file in test_data_dir.iterdir():
         if file.name != "SimID_946368938_simdata.tgz":
             file.unlink()
+
+
+class ScaledPdeDataSet(PdeDataSet):
+    # stands in for the dataset of another job (of a scan or an ensemble), its data scaled by scale
+    scale: float = 2.0
+
+    def get_data_blocks(self, variables: list[VariableInfo | str], time: float) -> list[np.ndarray]:
+        return [self.scale * data for data in super().get_data_blocks(variables, time)]
@@ -2,7 +2,7 @@ from pathlib import Path
 
 import numpy as np
 
-from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.mesh import CartesianMesh, MeshMetrics
 from pyvcell.simdata.postprocessing import ImageMetadata, PostProcessing, StatisticType, VariableInfo
 from pyvcell.simdata.simdata_models import DataFunctions, NamedFunction, PdeDataSet, VariableType
 from tests.test_fixture import setup_files, teardown_files
@@ -188,6 +188,35 @@ def test_mesh_parse() -> None:
     teardown_files()
 
 
+def test_mesh_metrics_parse() -> None:
+    setup_files()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    mesh_metrics = MeshMetrics(mesh_metrics_file=test_data_dir / "SimID_946368938_0_.meshmetrics")
+    mesh_metrics.read()
+
+    assert mesh_metrics.num_membrane_elements == 7817
+    assert mesh_metrics.centroids.shape == (7817, 3)
+    assert mesh_metrics.normals.shape == (7817, 3)
+    mesh_metrics.check_alignment(mesh)
+    assert np.allclose(np.linalg.norm(mesh_metrics.normals, axis=1), 1.0)
+
+    # per-region areas agree with the membrane region surfaces reported in the .mesh file
+    expected_surfaces = [surface for _mem_reg_id, _vol_reg1, _vol_reg2, surface in mesh.membrane_regions]
+    assert np.allclose(mesh_metrics.get_membrane_region_areas(mesh), expected_surfaces)
+    assert np.allclose(mesh_metrics.integrate(np.ones(7817), mesh), expected_surfaces)
+
+    # regions without membrane elements (here the last one) still get an entry
+    envelope = mesh_metrics.membrane_region_indices == 4
+    mesh_metrics.membrane_region_indices = mesh_metrics.membrane_region_indices[~envelope]
+    mesh_metrics.areas = mesh_metrics.areas[~envelope]
+    assert np.allclose(mesh_metrics.get_membrane_region_areas(mesh), [*expected_surfaces[:4], 0.0])
+    assert np.allclose(
+        mesh_metrics.integrate(np.ones(mesh_metrics.areas.shape[0]), mesh), [*expected_surfaces[:4], 0.0]
+    )
+    teardown_files()
+
+
 def test_post_processing_parse() -> None:
     setup_files()
     post_processing = PostProcessing(postprocessing_hdf5_path=test_data_dir / "SimID_946368938_0_.hdf5")
@@ -285,3 +314,27 @@ def test_post_processing_parse() -> None:
     assert np.allclose(np.max(fluorescence_data_4), 0.7147863306841433)
 
     teardown_files()
+
+
+def test_post_processing_image_stack() -> None:
+    setup_files()
+    with PostProcessing(postprocessing_hdf5_path=test_data_dir / "SimID_946368938_0_.hdf5") as post_processing:
+        post_processing.read()
+        fluorescence = post_processing.image_metadata[0]
+        frames = [post_processing.read_image_data(fluorescence, time_index) for time_index in range(5)]
+
+        stack = post_processing.read_image_stack(fluorescence)
+        assert stack.shape == (5, 71, 71)
+        assert np.array_equal(stack, np.stack(frames))
+        assert np.array_equal(post_processing.read_image_stack(fluorescence, slice(1, 5, 2)), stack[1:5:2])
+
+        # lazy view, reading only the selection
+        image_stack = post_processing.image_stack(fluorescence)
+        assert image_stack.shape == (5, 71, 71)
+        assert len(image_stack) == 5
+        assert np.array_equal(image_stack[4], frames[4])
+        assert np.array_equal(image_stack[-1, 10:20, 35], frames[4][10:20, 35])
+        assert np.array_equal(image_stack[2:, 35], stack[2:, 35])
+    assert post_processing._file is None
+
+    teardown_files()
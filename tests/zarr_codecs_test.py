@@ -0,0 +1,97 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+from numcodecs.registry import get_codec
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
+from pyvcell.simdata.zarr_codecs import DeltaMode, TemporalDelta
+from pyvcell.simdata.zarr_storage import Compressor, ZarrStorageOptions
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_zarr
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def _slowly_varying(shape: tuple[int, ...]) -> np.ndarray:
+    rng = np.random.default_rng(seed=3)
+    data = np.cumsum(rng.normal(scale=1e-3, size=shape), axis=0) + rng.normal(size=shape[1:])
+    data[:, 0, :3] = np.nan
+    data[2, 1, 0] = np.inf
+    return data
+
+
+def test_temporal_delta_roundtrip() -> None:
+    data = _slowly_varying((6, 4, 10))
+    for dtype in ["float64", "float32"]:
+        values = data.astype(dtype)
+        codec = TemporalDelta(dtype=dtype, time_chunk=6, frame_size=40, mode="xor")
+        decoded = np.asarray(codec.decode(codec.encode(values))).view(dtype).reshape(values.shape)
+        assert np.array_equal(decoded, values, equal_nan=True)
+
+    error_bound = 1e-4
+    codec = TemporalDelta(dtype="float64", time_chunk=6, frame_size=40, mode="quantize", error_bound=error_bound)
+    decoded = np.asarray(codec.decode(codec.encode(data))).view("float64").reshape(data.shape)
+    finite = np.isfinite(data)
+    assert np.array_equal(np.isnan(decoded), np.isnan(data))
+    assert decoded[2, 1, 0] == np.inf
+    assert np.max(np.abs(decoded[finite] - data[finite])) <= error_bound * (1 + 1e-9)
+
+    # the codec is registered, its configuration restores an equal codec
+    assert get_codec(codec.get_config()) == codec
+
+
+def test_temporal_delta_compression() -> None:
+    data = _slowly_varying((32, 16, 64))
+    zarr_dir = test_data_dir / "zarr_temporal_delta"
+    nbytes_stored = {}
+    for delta_mode in [None, DeltaMode.XOR, DeltaMode.QUANTIZE]:
+        storage = ZarrStorageOptions(
+            chunks=data.shape, compressor=Compressor.ZSTD, delta_mode=delta_mode, error_bound=1e-6
+        )
+        array = storage.create_root_array(str(zarr_dir), shape=data.shape)
+        array[:] = data
+        nbytes_stored[delta_mode] = array.nbytes_stored
+        reopened = zarr.open(str(zarr_dir), mode="r")
+        if delta_mode == DeltaMode.QUANTIZE:
+            assert np.allclose(reopened[:], data, rtol=0, atol=1e-6, equal_nan=True)
+        else:
+            assert np.array_equal(reopened[:], data, equal_nan=True)
+        shutil.rmtree(zarr_dir)
+    assert nbytes_stored[DeltaMode.XOR] < nbytes_stored[None]
+    assert nbytes_stored[DeltaMode.QUANTIZE] < nbytes_stored[DeltaMode.XOR]
+
+
+def test_zarr_writer_temporal_delta() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=test_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    zarr_dir = test_data_dir / "zarr_delta"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        layout=ZarrLayout.V2,
+        storage=ZarrStorageOptions(delta_mode=DeltaMode.XOR),
+    )
+
+    root = zarr.open_consolidated(str(zarr_dir), mode="r")
+    C_cyt = root["data/cytosol/C_cyt"]
+    # chunks span timepoints (BALANCED planning) and are delta encoded
+    assert C_cyt.chunks[0] > 1
+    assert isinstance(C_cyt.filters[0], TemporalDelta)
+    for t, time in enumerate(pde_dataset.times()):
+        assert np.array_equal(C_cyt[t].ravel(), pde_dataset.get_data("cytosol::C_cyt", time))
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
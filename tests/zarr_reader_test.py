@@ -0,0 +1,67 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.probe import VolumeProbe
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet, VariableType
+from pyvcell.simdata.zarr_reader import ZarrDataSet
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_zarr
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_zarr_reader() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    volume_var_names = [
+        bh.var_info.var_name
+        for bh in pde_dataset.variables_block_headers()
+        if bh.var_info.variable_type == VariableType.VOLUME
+    ]
+
+    exports = {
+        "zarr_read_v1": {},
+        "zarr_read_pyramid": {"multiscale_levels": 1},
+        "zarr_read_v2": {"layout": ZarrLayout.V2},
+        "zarr_read_compact": {"compact": True},
+    }
+    for name, options in exports.items():
+        zarr_dir = test_data_dir / name
+        write_zarr(pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=zarr_dir, **options)
+        zarr_dataset = ZarrDataSet(zarr_dir, workers=2)
+        zarr_dataset.read()
+
+        assert zarr_dataset.times() == pde_dataset.times()
+        assert [bh.var_info.var_name for bh in zarr_dataset.variables_block_headers()] == volume_var_names
+        time = pde_dataset.times()[3]
+        for var_name, data in zip(volume_var_names, zarr_dataset.get_data_blocks(volume_var_names, time)):
+            expected = pde_dataset.get_data(var_name, time)
+            if options.get("compact", False):
+                expected = mesh.scatter(mesh.compact(expected, var_name.split("::")[0]), var_name.split("::")[0])
+            assert np.array_equal(data, expected)
+        assert zarr_dataset.get_data("cytosol::J_r0", time).shape == mesh.volume_region_map.shape
+        if "layout" in options or "compact" in options:
+            J_flux0 = zarr_dataset.get_data("Nucleus_cytosol_membrane::J_flux0", time)
+            assert J_flux0.shape == (mesh.membrane_elements.shape[0],)
+            J_flux0_series = zarr_dataset.get_time_series("Nucleus_cytosol_membrane::J_flux0", np.array([0, 7000]))
+            assert np.array_equal(J_flux0_series[3], J_flux0[[0, 7000]], equal_nan=True)
+
+        # analysis code runs unchanged on the zarr store
+        probe = VolumeProbe(mesh, np.array([[5.0, 5.0, 2.0], [3.0, 7.0, 1.0]]))
+        expected_series = probe.time_series(pde_dataset, "cytosol::Ran_cyt")
+        assert np.array_equal(probe.time_series(zarr_dataset, "cytosol::Ran_cyt"), expected_series)
+        assert np.array_equal(zarr_dataset.get_time_series("cytosol::Ran_cyt", probe.indices[:, 0]), expected_series)
+
+        shutil.rmtree(zarr_dir)
+
+    teardown_files()
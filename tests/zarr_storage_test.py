@@ -0,0 +1,114 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+import zarr  # type: ignore[import-untyped]
+
+from pyvcell.simdata.mesh import CartesianMesh
+from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
+from pyvcell.simdata.zarr_codecs import DeltaMode
+from pyvcell.simdata.zarr_storage import (
+    AccessPattern,
+    Compressor,
+    ZarrStorageOptions,
+    plan_chunks,
+    zarr_supports_sharding,
+)
+from pyvcell.simdata.zarr_writer import ZarrLayout, write_zarr
+from tests.test_fixture import setup_files, teardown_files
+
+test_data_dir = (Path(__file__).parent / "test_data").absolute()
+
+
+def test_plan_chunks() -> None:
+    shape = (100, 3, 64, 256, 256)
+    target_bytes = 4 * 1024 * 1024
+    for access_pattern in AccessPattern:
+        chunks = plan_chunks(shape, 8, access_pattern, target_bytes, time_axis=0, unit_axes=(1,))
+        assert chunks[1] == 1
+        assert int(np.prod(chunks)) * 8 <= target_bytes
+    assert plan_chunks(shape, 8, AccessPattern.SPATIAL, target_bytes, unit_axes=(1,))[0] == 1
+    assert plan_chunks(shape, 8, AccessPattern.TIME_SERIES, target_bytes, unit_axes=(1,))[0] == 100
+    balanced = plan_chunks(shape, 8, AccessPattern.BALANCED, target_bytes, unit_axes=(1,))
+    assert 1 < balanced[0] < 100
+
+    # default keeps one frame per chunk, the time extent is bounded by the write buffer
+    assert ZarrStorageOptions().plan((10, 4, 5, 6)) == ((1, 4, 5, 6), None)
+    storage = ZarrStorageOptions(access_pattern=AccessPattern.TIME_SERIES, write_buffer_bytes=3 * 4 * 5 * 6 * 8)
+    assert storage.plan((10, 4, 5, 6))[0][0] == 3
+    # three arrays buffered at the same time share the write buffer
+    assert storage.plan((10, 4, 5, 6), buffered_arrays=3)[0][0] == 1
+
+    # sharded arrays get the zarr v3 codecs of the chosen compressor and are never delta encoded
+    assert ZarrStorageOptions().make_sharded_compressors() == "auto"
+    assert ZarrStorageOptions(compressor=Compressor.NONE).make_sharded_compressors() is None
+    if zarr_supports_sharding():
+        with pytest.raises(ValueError):
+            ZarrStorageOptions(shard_bytes=1024 * 1024, delta_mode=DeltaMode.XOR)
+
+
+def test_zarr_writer_storage_options() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    default_dir = test_data_dir / "zarr_default"
+    write_zarr(pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=default_dir)
+    default = zarr.open(str(default_dir), mode="r")
+    # without a compressor choice the zarr default compressor is kept
+    assert default.compressor.codec_id == "blosc"
+    assert ZarrStorageOptions(compressor=Compressor.NONE).make_compressor() is None
+
+    storage = ZarrStorageOptions(
+        access_pattern=AccessPattern.TIME_SERIES,
+        target_chunk_bytes=256 * 1024,
+        compressor=Compressor.ZSTD,
+        compression_level=5,
+    )
+    for workers in [1, 3]:
+        planned_dir = test_data_dir / "zarr_planned"
+        write_zarr(
+            pde_dataset=pde_dataset,
+            data_functions=data_functions,
+            mesh=mesh,
+            zarr_dir=planned_dir,
+            workers=workers,
+            storage=storage,
+        )
+        planned = zarr.open(str(planned_dir), mode="r")
+        assert planned.chunks[0] == 5
+        assert planned.chunks[1] == 1
+        assert planned.compressor.codec_id == "zstd"
+        assert np.array_equal(planned[:], default[:])
+        assert planned.attrs["metadata"] == default.attrs["metadata"]
+        shutil.rmtree(planned_dir)
+
+    v2_dir = test_data_dir / "zarr_planned_v2"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=v2_dir,
+        workers=2,
+        layout=ZarrLayout.V2,
+        storage=ZarrStorageOptions(
+            access_pattern=AccessPattern.BALANCED, target_chunk_bytes=64 * 1024, dtype="float32"
+        ),
+    )
+    root = zarr.open_consolidated(str(v2_dir), mode="r")
+    C_cyt = root["data/cytosol/C_cyt"]
+    assert C_cyt.dtype == np.float32
+    assert C_cyt.chunks[0] > 1
+    assert np.array_equal(C_cyt[:], default[:, 1].astype(np.float32))
+
+    shutil.rmtree(default_dir)
+    shutil.rmtree(v2_dir)
+
+    teardown_files()
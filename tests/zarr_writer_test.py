@@ -1,9 +1,14 @@
 import shutil
 from pathlib import Path
 
+import numpy as np
+import zarr  # type: ignore[import-untyped]
+
 from pyvcell.simdata.mesh import CartesianMesh
-from pyvcell.simdata.simdata_models import DataFunctions, PdeDataSet
-from pyvcell.simdata.zarr_writer import write_zarr
+from pyvcell.simdata.postprocessing import PostProcessing
+from pyvcell.simdata.simdata_models import DataFunctions, NamedFunction, PdeDataSet, VariableType
+from pyvcell.simdata.zarr_reader import ZarrDataSet
+from pyvcell.simdata.zarr_writer import V2_STATISTICS, ZarrLayout, write_zarr
 from tests.test_fixture import setup_files, teardown_files
 
 test_data_dir = (Path(__file__).parent / "test_data").absolute()
@@ -30,3 +35,334 @@ def test_zarr_writer() -> None:
     shutil.rmtree(test_data_dir / "zarr")
 
     teardown_files()
+
+
+def test_zarr_writer_compact() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    zarr_dir = test_data_dir / "zarr_compact"
+    write_zarr(pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=zarr_dir, compact=True)
+
+    root = zarr.open_group(str(zarr_dir), mode="r")
+    assert np.array_equal(root["region_map"][:].ravel(), mesh.volume_region_map)
+    cytosol_indices = mesh.get_volume_domain_indices("cytosol")
+    assert np.array_equal(root["domains/cytosol/volume_indices"][:], cytosol_indices)
+    C_cyt = root["data/cytosol/C_cyt"]
+    assert C_cyt.shape == (5, cytosol_indices.shape[0])
+    assert root["data/cytosol/J_r0"].shape == (5, cytosol_indices.shape[0])
+    assert root["data/Nucleus/RanC_nuc"].shape == (5, mesh.get_volume_domain_indices("Nucleus").shape[0])
+
+    # scattering the compact values rebuilds the original frames (which are zero outside of the domain)
+    for t, time in enumerate(pde_dataset.times()):
+        expected = pde_dataset.get_data("cytosol::C_cyt", time)
+        assert np.array_equal(mesh.scatter(C_cyt[t], "cytosol"), expected)
+
+    # compact reads, from the simulation and straight from the compact arrays of the store
+    zarr_dataset = ZarrDataSet(zarr_dir)
+    zarr_dataset.read()
+    time = pde_dataset.times()[2]
+    compact_C_cyt = pde_dataset.get_compact_data("cytosol::C_cyt", time, cytosol_indices)
+    assert np.array_equal(compact_C_cyt, C_cyt[2])
+    assert np.array_equal(zarr_dataset.get_compact_data("cytosol::C_cyt", time, cytosol_indices), compact_C_cyt)
+    nucleus_indices = mesh.get_volume_domain_indices("Nucleus")
+    nucleus_C_cyt = pde_dataset.get_compact_data("cytosol::C_cyt", time, nucleus_indices)
+    assert np.array_equal(nucleus_C_cyt, pde_dataset.get_data("cytosol::C_cyt", time)[nucleus_indices])
+    assert np.array_equal(zarr_dataset.get_compact_data("cytosol::C_cyt", time, nucleus_indices), nucleus_C_cyt)
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
+
+
+def test_zarr_writer_parallel() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    serial_dir = test_data_dir / "zarr_serial"
+    write_zarr(pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=serial_dir)
+    serial = zarr.open(str(serial_dir), mode="r")
+    for use_processes in [False, True]:
+        parallel_dir = test_data_dir / "zarr_parallel"
+        write_zarr(
+            pde_dataset=pde_dataset,
+            data_functions=data_functions,
+            mesh=mesh,
+            zarr_dir=parallel_dir,
+            workers=3,
+            use_processes=use_processes,
+        )
+        parallel = zarr.open(str(parallel_dir), mode="r")
+        assert np.array_equal(parallel[:], serial[:])
+        assert parallel.attrs["metadata"] == serial.attrs["metadata"]
+        shutil.rmtree(parallel_dir)
+
+    shutil.rmtree(serial_dir)
+
+    teardown_files()
+
+
+def test_zarr_writer_v2() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    zarr_dir = test_data_dir / "zarr_v2"
+    write_zarr(
+        pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=zarr_dir, layout=ZarrLayout.V2
+    )
+
+    root = zarr.open_consolidated(str(zarr_dir), mode="r")
+    metadata = root.attrs["metadata"]
+    assert metadata["layout"] == "v2"
+    assert np.array_equal(root["times"][:], pde_dataset.times())
+    assert root["region_map"].dtype == np.uint16
+    assert np.array_equal(root["region_map"][:].ravel(), mesh.volume_region_map)
+    assert np.array_equal(root["mesh/membrane_elements"][:], mesh.membrane_elements)
+
+    channel_names = [channel["name"] for channel in metadata["channels"]]
+    assert channel_names == [
+        "cytosol::C_cyt",
+        "cytosol::Ran_cyt",
+        "cytosol::RanC_cyt",
+        "Nucleus::RanC_nuc",
+        "cytosol::J_r0",
+        "Nucleus_cytosol_membrane::J_flux0",
+    ]
+    assert metadata["channels"][-1]["variable_type"] == "MEMBRANE"
+    statistics = root["statistics"]
+    assert statistics.shape == (5, len(channel_names), len(V2_STATISTICS))
+    cytosol_indices = mesh.get_volume_domain_indices("cytosol")
+    for t, time in enumerate(pde_dataset.times()):
+        C_cyt = pde_dataset.get_data("cytosol::C_cyt", time)
+        assert np.array_equal(root["data/cytosol/C_cyt"][t].ravel(), C_cyt)
+        # statistics are computed inside the variable's domain
+        assert statistics[t, 0, V2_STATISTICS.index("max")] == np.max(C_cyt)
+        assert np.isclose(statistics[t, 0, V2_STATISTICS.index("mean")], np.mean(C_cyt[cytosol_indices]))
+
+        # J_flux0 = 2 * (RanC_cyt - RanC_nuc) on the membrane, from the cytosol and nucleus side of each element
+        J_flux0 = root["data/Nucleus_cytosol_membrane/J_flux0"][t]
+        assert J_flux0.shape == (mesh.membrane_elements.shape[0],)
+        RanC_cyt = pde_dataset.get_data("cytosol::RanC_cyt", time)
+        RanC_nuc = pde_dataset.get_data("Nucleus::RanC_nuc", time)
+        for m, vol1, vol2, mem_reg_id in mesh.membrane_elements[::500, [0, 1, 2, 7]]:
+            if mem_reg_id == 4:
+                # nuclear envelope, volume region 5 (Nucleus) inside region 1 (cytosol)
+                nuc, cyt = (vol1, vol2) if mesh.volume_region_map[vol1] == 5 else (vol2, vol1)
+                assert np.isclose(J_flux0[m], 2.0 * (RanC_cyt[cyt] - RanC_nuc[nuc]))
+        # the plasma membrane does not touch the nucleus
+        assert np.all(np.isnan(J_flux0[mesh.membrane_elements[:, 7] == 0]))
+        assert np.isclose(statistics[t, -1, V2_STATISTICS.index("max")], np.nanmax(J_flux0))
+    assert np.array_equal(root["mesh/membrane_region_map"][:], mesh.membrane_elements[:, 7])
+
+    # global statistics over all timepoints
+    C_cyt_global = metadata["channels"][0]["global_statistics"]
+    assert C_cyt_global["max"] == np.max(statistics[:, 0, V2_STATISTICS.index("max")])
+    assert C_cyt_global["count"] == len(pde_dataset.times()) * cytosol_indices.shape[0]
+    assert metadata["channels"][-1]["global_statistics"]["nan_count"] > 0
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
+
+
+def test_zarr_writer_v2_membrane_domain() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    assert mesh.membrane_domains == {
+        "cytosol_ec_membrane": ("cytosol", "ec"),
+        "Nucleus_cytosol_membrane": ("Nucleus", "cytosol"),
+    }
+    assert mesh.get_membrane_domain_region_ids("Nucleus_cytosol_membrane") == {4}
+    assert mesh.get_membrane_domain_region_ids("cytosol_ec_membrane") == {0, 1, 2, 3}
+
+    # the cytosol touches every membrane region, but the function only lives on the nuclear envelope
+    data_functions.named_functions.append(
+        NamedFunction(
+            name="Nucleus_cytosol_membrane::RanC_env",
+            vcell_expression="RanC_cyt",
+            variable_type=VariableType.MEMBRANE,
+        )
+    )
+    zarr_dir = test_data_dir / "zarr_v2"
+    write_zarr(
+        pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=zarr_dir, layout=ZarrLayout.V2
+    )
+
+    root = zarr.open_consolidated(str(zarr_dir), mode="r")
+    RanC_env = root["data/Nucleus_cytosol_membrane/RanC_env"][0]
+    envelope = mesh.membrane_elements[:, 7] == 4
+    assert not np.any(np.isnan(RanC_env[envelope]))
+    assert np.all(np.isnan(RanC_env[~envelope]))
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
+
+
+def test_zarr_writer_v2_resume() -> None:
+    setup_files()
+
+    sim_data_dir = test_data_dir
+    pde_dataset = PdeDataSet(base_dir=sim_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=sim_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=sim_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    zarr_dir = test_data_dir / "zarr_resume"
+    write_zarr(
+        pde_dataset=pde_dataset, data_functions=data_functions, mesh=mesh, zarr_dir=zarr_dir, layout=ZarrLayout.V2
+    )
+    expected = zarr.open_group(str(zarr_dir), mode="r")
+    expected_data = expected["data/cytosol/J_r0"][:]
+    expected_statistics = expected["statistics"][:]
+    assert np.all(expected["completed"][:])
+
+    # an export interrupted after 3 timepoints, with timepoint 2 only partially written
+    root = zarr.open_group(str(zarr_dir), mode="r+")
+    for path in ["times", "completed", "statistics", "data/cytosol/C_cyt", "data/cytosol/J_r0"]:
+        root[path].resize((3, *root[path].shape[1:]))
+    root["completed"][2] = False
+    root["data/cytosol/J_r0"][2] = 0.0
+    first_chunk = zarr_dir / "data" / "cytosol" / "J_r0" / ".".join(["0"] * 4)
+    first_chunk_mtime = first_chunk.stat().st_mtime_ns
+
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        layout=ZarrLayout.V2,
+        workers=2,
+        resume=True,
+    )
+    resumed = zarr.open_consolidated(str(zarr_dir), mode="r")
+    assert np.array_equal(resumed["times"][:], pde_dataset.times())
+    assert np.all(resumed["completed"][:])
+    assert np.array_equal(resumed["data/cytosol/J_r0"][:], expected_data)
+    assert np.array_equal(resumed["statistics"][:], expected_statistics, equal_nan=True)
+    assert first_chunk.stat().st_mtime_ns == first_chunk_mtime
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
+
+
+def test_zarr_writer_v2_region_statistics() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=test_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+
+    zarr_dir = test_data_dir / "zarr_region_statistics"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        layout=ZarrLayout.V2,
+        compact=True,
+        region_statistics=True,
+    )
+
+    root = zarr.open_consolidated(str(zarr_dir), mode="r")
+    metadata = root.attrs["metadata"]
+    C_cyt_channel = metadata["channels"][0]
+    assert C_cyt_channel["region_ids"] == [1, 2, 3, 4]
+    region_statistics = root["region_statistics/cytosol/C_cyt"]
+    assert region_statistics.shape == (5, 4, len(V2_STATISTICS))
+    assert region_statistics.attrs["region_ids"] == [1, 2, 3, 4]
+    for t, time in enumerate(pde_dataset.times()):
+        C_cyt = pde_dataset.get_data("cytosol::C_cyt", time)
+        for r, region_id in enumerate(C_cyt_channel["region_ids"]):
+            values = C_cyt[mesh.volume_region_map == region_id]
+            assert region_statistics[t, r, V2_STATISTICS.index("max")] == np.max(values)
+            assert np.isclose(region_statistics[t, r, V2_STATISTICS.index("mean")], np.mean(values))
+    C_cyt_regions = C_cyt_channel["region_statistics"]
+    assert [region["region_index"] for region in C_cyt_regions] == [1, 2, 3, 4]
+    assert sum(region["count"] for region in C_cyt_regions) == C_cyt_channel["global_statistics"]["count"]
+
+    # membrane functions are NaN on the membrane regions not touching both of their domains
+    J_flux0_regions = metadata["channels"][-1]["region_statistics"]
+    plasma_membrane = next(region for region in J_flux0_regions if region["region_index"] == 0)
+    assert plasma_membrane["count"] == 0 and plasma_membrane["max"] is None
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()
+
+
+def test_zarr_writer_v2_post_processing() -> None:
+    setup_files()
+
+    pde_dataset = PdeDataSet(base_dir=test_data_dir, log_filename="SimID_946368938_0_.log")
+    pde_dataset.read()
+    data_functions = DataFunctions(function_file=test_data_dir / "SimID_946368938_0_.functions")
+    data_functions.read()
+    mesh = CartesianMesh(mesh_file=test_data_dir / "SimID_946368938_0_.mesh")
+    mesh.read()
+    post_processing = PostProcessing(postprocessing_hdf5_path=test_data_dir / "SimID_946368938_0_.hdf5")
+    post_processing.read()
+
+    zarr_dir = test_data_dir / "zarr_post_processing"
+    write_zarr(
+        pde_dataset=pde_dataset,
+        data_functions=data_functions,
+        mesh=mesh,
+        zarr_dir=zarr_dir,
+        layout=ZarrLayout.V2,
+        compact=True,
+        workers=2,
+        post_processing=post_processing,
+    )
+
+    zarr_dataset = ZarrDataSet(zarr_dir)
+    zarr_dataset.read()
+    post_processing_metadata = zarr_dataset.metadata["post_processing"]
+    assert post_processing_metadata["variables"] == ["C_cyt", "Ran_cyt", "RanC_cyt", "RanC_nuc"]
+    assert post_processing_metadata["statistics"] == ["average", "total", "min", "max"]
+    assert post_processing_metadata["units"][0] == ["uM", "molecules", "uM", "uM"]
+    assert np.array_equal(zarr_dataset.get_post_processing_statistics(), post_processing.statistics)
+    fluor = post_processing_metadata["images"][0]
+    assert fluor["name"] == "fluor"
+    assert fluor["shape"] == [71, 71]
+    assert np.allclose(fluor["extents"], [74.24, 74.24, 26.0])
+    fluor_4 = zarr_dataset.get_post_processing_image("fluor", 1.0)
+    assert np.array_equal(fluor_4, post_processing.read_image_data(post_processing.image_metadata[0], 4))
+
+    shutil.rmtree(zarr_dir)
+
+    teardown_files()